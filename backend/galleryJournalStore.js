@@ -0,0 +1,297 @@
+/**
+ * Gallery Journal Engine
+ * Every change is one appended line in data/gallery.journal.jsonl; gallery.json is
+ * the checkpoint the journal replays over. Compaction folds the journal into a new
+ * checkpoint in the background once it grows past JOURNAL_COMPACT_BYTES.
+ *
+ * Replaying an entry twice is harmless (publish skips known ids, visibility and
+ * delete are idempotent), which keeps compaction and crash recovery simple.
+ * Appends and the journal's move aside for compaction take turns under a lockfile
+ * (withFileLock), so no worker's append can land in a journal already folded.
+ */
+
+import fs from "fs";
+import path from "path";
+import { withFileLock, writeFileAtomic, removeStaleTempFiles } from "./galleryJsonStore.js";
+
+const JOURNAL_COMPACT_BYTES = 1024 * 1024;
+// A .compacting file older than this was left by a worker that died mid-compaction
+const STALE_COMPACTION_MS = 60 * 1000;
+const NEWLINE = 0x0a;
+
+/**
+ * @returns {fs.Stats|null} Stats of a file, or null if there is none
+ */
+function statFile(file) {
+  try {
+    return fs.statSync(file);
+  } catch {
+    return null;
+  }
+}
+
+/**
+ * Whether two stats describe the same file contents
+ */
+function sameVersion(a, b) {
+  if (!a || !b) return a === b;
+  return a.ino === b.ino && a.size === b.size && a.mtimeMs === b.mtimeMs;
+}
+
+/**
+ * Complete journal lines from `offset` on. A final line without its newline is
+ * a write still in progress or torn by a crash, and is left unread.
+ * @returns {Object} { ino, entries, end (offset after the last complete line) }
+ */
+function readJournal(file, offset = 0) {
+  let fd;
+  try {
+    fd = fs.openSync(file, "r");
+  } catch (error) {
+    if (error.code === "ENOENT") return { ino: null, entries: [], end: 0 };
+    throw error;
+  }
+  try {
+    const { ino, size } = fs.fstatSync(fd);
+    const buffer = Buffer.alloc(Math.max(0, size - offset));
+    fs.readSync(fd, buffer, 0, buffer.length, offset);
+    const complete = buffer.lastIndexOf(NEWLINE) + 1;
+    const entries = [];
+    for (const line of buffer.toString("utf-8", 0, complete).split("\n")) {
+      if (!line) continue;
+      try {
+        entries.push(JSON.parse(line));
+      } catch {
+        console.warn(`⚠️ Skipping unreadable gallery journal line (torn write?): ${line.slice(0, 60)}`);
+      }
+    }
+    return { ino, entries, end: offset + complete };
+  } finally {
+    fs.closeSync(fd);
+  }
+}
+
+/**
+ * Open the journal gallery engine
+ * @param {string} checkpointFile - Path of gallery.json
+ * @param {string} journalFile - Path of the JSONL journal
+ * @param {number} compactBytes - Journal size that triggers a compaction
+ * @returns {Object} Engine with the galleryStore storage methods
+ */
+export function createJournalStore(checkpointFile, journalFile, compactBytes = JOURNAL_COMPACT_BYTES) {
+  const compactingFile = `${journalFile}.compacting`;
+  const lockFile = `${journalFile}.lock`;
+
+  // Oldest first, so a publish is a push; listings read from the end
+  let works = [];
+  let byId = new Map();
+  let shown = null; // Visible works, rebuilt lazily after a change
+  let checkpointStat = null;
+  let journal = { ino: null, offset: 0 };
+  let compacting = false;
+
+  /**
+   * Replay one journal entry over the in-memory gallery
+   */
+  function apply(entry) {
+    if (entry.op === "publish") {
+      if (!byId.has(entry.work.id)) {
+        works.push(entry.work);
+        byId.set(entry.work.id, entry.work);
+      }
+    } else if (entry.op === "visibility") {
+      const work = byId.get(entry.id);
+      if (work) work.visible = entry.visible;
+    } else if (entry.op === "delete") {
+      if (byId.delete(entry.id)) {
+        works = works.filter(w => w.id !== entry.id);
+      }
+    } else {
+      console.warn(`⚠️ Skipping unknown gallery journal entry: ${entry.op}`);
+    }
+    shown = null;
+  }
+
+  /**
+   * Rebuild everything: the checkpoint, then an interrupted compaction's journal, then the live one
+   * @returns {number} Journal entries replayed
+   */
+  function reload() {
+    checkpointStat = statFile(checkpointFile);
+    works = [];
+    if (checkpointStat) {
+      try {
+        works = JSON.parse(fs.readFileSync(checkpointFile, "utf-8")).works.slice().reverse();
+      } catch (error) {
+        console.error("Error loading gallery:", error.message);
+      }
+    }
+    byId = new Map(works.map(w => [w.id, w]));
+    shown = null;
+    const folding = readJournal(compactingFile);
+    const live = readJournal(journalFile);
+    folding.entries.forEach(apply);
+    live.entries.forEach(apply);
+    journal = { ino: live.ino, offset: live.end };
+    return folding.entries.length + live.entries.length;
+  }
+
+  /**
+   * Catch up with other workers: apply new journal lines, or reload after a compaction
+   */
+  function refresh() {
+    if (!sameVersion(statFile(checkpointFile), checkpointStat)) {
+      reload();
+      return;
+    }
+    const current = statFile(journalFile);
+    if (!current) {
+      // Rotated away by a compaction; what we had not read yet is in the .compacting file
+      if (journal.ino !== null) reload();
+      return;
+    }
+    if (current.ino !== journal.ino || current.size < journal.offset) {
+      reload();
+    } else if (current.size > journal.offset) {
+      const tail = readJournal(journalFile, journal.offset);
+      tail.entries.forEach(apply);
+      journal.offset = tail.end;
+    }
+  }
+
+  /**
+   * @returns {Array} Works not hidden by moderation, oldest first
+   */
+  function visibleWorks() {
+    if (!shown) {
+      shown = works.filter(w => w.visible !== false);
+    }
+    return shown;
+  }
+
+  /**
+   * Append one entry (a single O_APPEND write, under the lock) and pick it up in file order
+   */
+  async function append(entry) {
+    try {
+      await withFileLock(lockFile, async () => {
+        refresh();
+        // Nobody else is mid-append while we hold the lock, so bytes past the last complete
+        // line are a line torn by a crash: end it first, or this entry would run into it
+        const torn = (statFile(journalFile)?.size || 0) > journal.offset;
+        fs.appendFileSync(journalFile, (torn ? "\n" : "") + JSON.stringify(entry) + "\n");
+      });
+    } catch (error) {
+      console.error("Error saving gallery:", error.message);
+      throw new Error("Failed to save gallery data");
+    }
+    refresh();
+    const size = statFile(journalFile)?.size || 0;
+    if (size > compactBytes && !compacting) {
+      compacting = true;
+      setImmediate(() => {
+        compact()
+          .catch(error => console.error("Error compacting gallery journal:", error.message))
+          .finally(() => { compacting = false; });
+      });
+    }
+  }
+
+  /**
+   * Fold the journal into a new checkpoint. The journal is first moved aside with
+   * link + unlink (link fails if another worker got there first), so new appends
+   * start a fresh journal while the checkpoint is written. The move and the read of
+   * what was moved happen under the lock: no append is in flight then, so every line
+   * written to the old journal is in what gets folded.
+   */
+  async function compact() {
+    const startTime = Date.now();
+    const foldedBytes = await withFileLock(lockFile, async () => {
+      let rotated = true;
+      try {
+        fs.linkSync(journalFile, compactingFile);
+      } catch (error) {
+        if (error.code !== "EEXIST") throw error;
+        // ctime moved when the link was made, so this is the other compaction's age
+        const age = Date.now() - (statFile(compactingFile)?.ctimeMs ?? Date.now());
+        if (age < STALE_COMPACTION_MS) return null;
+        // Left by a crash: checkpoint over it and keep the live journal (replaying it again is harmless)
+        rotated = false;
+      }
+      if (rotated) {
+        fs.unlinkSync(journalFile);
+      }
+      reload();
+      return statFile(compactingFile)?.size || 0;
+    });
+    if (foldedBytes === null) return;
+    const snapshot = JSON.stringify({ works: works.slice().reverse() });
+    const count = works.length;
+
+    const written = await writeFileAtomic(checkpointFile, snapshot);
+    await fs.promises.unlink(compactingFile);
+    // Our state already includes the new checkpoint's contents
+    checkpointStat = written;
+
+    const duration = ((Date.now() - startTime) / 1000).toFixed(2);
+    console.log(`🗜️ Compacted gallery journal: ${(foldedBytes / 1024).toFixed(0)} KB folded into ${path.basename(checkpointFile)} (${count} works) in ${duration}s`);
+  }
+
+  removeStaleTempFiles(checkpointFile);
+  removeStaleTempFiles(lockFile);
+  const replayed = reload();
+  console.log(`🗄️  Gallery storage: journal (${works.length} works, ${replayed} journal entries replayed)`);
+
+  return {
+    name: "journal",
+
+    listWorks({ limit, offset, includeHidden }) {
+      refresh();
+      const list = includeHidden ? works : visibleWorks();
+      // Newest first: count back from the end
+      const end = list.length - offset;
+      return {
+        works: end > 0 ? list.slice(Math.max(0, end - limit), end).reverse() : [],
+        total: list.length
+      };
+    },
+
+    getWork(id) {
+      refresh();
+      return byId.get(id) || null;
+    },
+
+    allWorks() {
+      refresh();
+      return works.slice().reverse();
+    },
+
+    addWork(work) {
+      return append({ op: "publish", work });
+    },
+
+    async setVisibility(id, visible) {
+      refresh();
+      if (!byId.has(id)) return false;
+      await append({ op: "visibility", id, visible });
+      return true;
+    },
+
+    async removeWork(id) {
+      refresh();
+      const work = byId.get(id);
+      if (!work) return null;
+      await append({ op: "delete", id });
+      return work;
+    },
+
+    stats() {
+      refresh();
+      return {
+        works: works.length,
+        visibleWorks: visibleWorks().length,
+        fileBytes: (statFile(checkpointFile)?.size || 0) + (statFile(journalFile)?.size || 0)
+      };
+    }
+  };
+}
@@ -0,0 +1,417 @@
+/**
+ * Gallery JSON Engine
+ * Keeps the whole gallery in one compact data/gallery.json, with a parsed copy
+ * held in memory so reads don't re-parse the file. Changes are queued and applied
+ * in coalesced, atomic writes made under a lockfile, so several backend workers
+ * can share the file without losing each other's changes.
+ */
+
+import crypto from "crypto";
+import fs from "fs";
+import path from "path";
+
+// A burst of changes within this window shares one write
+const FLUSH_DELAY_MS = 25;
+// A holder touches its lockfile this often; one untouched for LOCK_STALE_MS belongs to a
+// stuck or dead process. Waiters give up only after a stale lock would have been broken.
+const LOCK_HEARTBEAT_MS = 2 * 1000;
+const LOCK_STALE_MS = 10 * 1000;
+const LOCK_TIMEOUT_MS = LOCK_STALE_MS + 5 * 1000;
+
+const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+/**
+ * Start time of a process in clock ticks since boot (/proc/<pid>/stat field 22), or null
+ * without /proc. With the pid, it tells a live lock holder from an unrelated process that
+ * got the same pid later (common after a container restart).
+ */
+function processStartTime(pid) {
+  try {
+    const stat = fs.readFileSync(`/proc/${pid}/stat`, "utf-8");
+    // The command name (field 2) may contain spaces; count from its closing paren
+    return stat.slice(stat.lastIndexOf(")") + 2).split(" ")[19];
+  } catch {
+    return null;
+  }
+}
+
+const OWN_START_TIME = processStartTime(process.pid);
+
+/**
+ * @returns {Object|null} The lock's { ino, mtimeMs, pid, started, token }, or null if there is none
+ */
+function readLock(lockFile) {
+  let fd;
+  try {
+    fd = fs.openSync(lockFile, "r");
+  } catch {
+    return null;
+  }
+  try {
+    // One descriptor, so the stats and the contents are of the same file
+    const { ino, mtimeMs } = fs.fstatSync(fd);
+    const [pid, started, token] = fs.readFileSync(fd, "utf-8").trim().split(" ");
+    return { ino, mtimeMs, pid: parseInt(pid, 10), started: started && started !== "-" ? started : null, token };
+  } finally {
+    fs.closeSync(fd);
+  }
+}
+
+/**
+ * Whether a lock's holder is gone: it stopped touching the lock, its pid is dead, or
+ * the pid now belongs to a process started at another time
+ */
+function lockIsStale(lock) {
+  if (Date.now() - lock.mtimeMs > LOCK_STALE_MS) {
+    return true;
+  }
+  if (!lock.pid) {
+    return false;
+  }
+  try {
+    process.kill(lock.pid, 0);
+  } catch (error) {
+    if (error.code === "ESRCH") return true;
+  }
+  const started = lock.started && processStartTime(lock.pid);
+  return Boolean(started) && started !== lock.started;
+}
+
+/**
+ * Swap a stale lock for ours (the candidate file). Breakers take turns through a second
+ * lockfile and re-check under it that the lock is still the stale one they saw; the
+ * rename then replaces it in one step, so there is no moment without a lock in which a
+ * third process could take it.
+ * @returns {boolean} Whether we now hold the lock
+ */
+function breakLock(lockFile, candidate, stale) {
+  const breakFile = `${lockFile}.break`;
+  try {
+    fs.writeFileSync(breakFile, `${process.pid}\n`, { flag: "wx" });
+  } catch (error) {
+    if (error.code !== "EEXIST") throw error;
+    // Held for a few synchronous calls; one this old was left by a breaker that died
+    const held = readLock(breakFile);
+    if (held && Date.now() - held.mtimeMs > LOCK_STALE_MS) {
+      fs.rmSync(breakFile, { force: true });
+    }
+    return false;
+  }
+  try {
+    const current = readLock(lockFile);
+    if (!current || current.ino !== stale.ino || !lockIsStale(current)) {
+      return false; // Released or already taken over meanwhile
+    }
+    console.warn(`⚠️ Taking over stale lock ${path.basename(lockFile)} (held by pid ${stale.pid || "?"})`);
+    const now = new Date();
+    fs.utimesSync(candidate, now, now);
+    fs.renameSync(candidate, lockFile);
+    return true;
+  } finally {
+    fs.rmSync(breakFile, { force: true });
+  }
+}
+
+/**
+ * Run fn while holding an advisory lock: a lockfile holding our pid, start time and a
+ * random token, created complete in one step (link). Waits with backoff for other
+ * holders and takes over locks whose holder is gone. While fn runs the lock is touched
+ * every LOCK_HEARTBEAT_MS, and afterwards it is removed only if it is still ours.
+ * @param {string} lockFile - Path of the lockfile
+ * @param {Function} fn - Async function to run under the lock
+ */
+export async function withFileLock(lockFile, fn) {
+  const token = crypto.randomBytes(8).toString("hex");
+  const candidate = `${lockFile}.${process.pid}.${token}.tmp`;
+  fs.writeFileSync(candidate, `${process.pid} ${OWN_START_TIME || "-"} ${token}\n`);
+  const ino = fs.statSync(candidate).ino;
+  try {
+    const deadline = Date.now() + LOCK_TIMEOUT_MS;
+    let delay = 1;
+    for (;;) {
+      // Fresh mtime, or a lock we get after a long wait would look stale at once
+      const now = new Date();
+      fs.utimesSync(candidate, now, now);
+      try {
+        fs.linkSync(candidate, lockFile);
+        break;
+      } catch (error) {
+        if (error.code !== "EEXIST") throw error;
+      }
+      const held = readLock(lockFile);
+      if (held && lockIsStale(held) && breakLock(lockFile, candidate, held)) {
+        break;
+      }
+      if (Date.now() > deadline) {
+        throw new Error(`Timed out waiting for ${path.basename(lockFile)}`);
+      }
+      await sleep(delay);
+      delay = Math.min(delay * 2, 50);
+    }
+  } finally {
+    fs.rmSync(candidate, { force: true });
+  }
+
+  const ours = () => {
+    const current = readLock(lockFile);
+    return Boolean(current) && current.ino === ino && current.token === token;
+  };
+  const heartbeat = setInterval(() => {
+    const now = new Date();
+    if (ours()) fs.utimesSync(lockFile, now, now);
+  }, LOCK_HEARTBEAT_MS);
+  heartbeat.unref();
+  try {
+    return await fn();
+  } finally {
+    clearInterval(heartbeat);
+    if (ours()) {
+      fs.rmSync(lockFile, { force: true });
+    } else {
+      console.warn(`⚠️ Lock ${path.basename(lockFile)} was taken over while held`);
+    }
+  }
+}
+
+/**
+ * Replace a file without ever leaving a partial one: write a temp file, fsync it,
+ * rename it over the target, then fsync the directory so the rename is durable
+ * @param {string} file - Target path
+ * @param {string} data - New contents
+ * @returns {Promise<fs.Stats>} Stats of the new file
+ */
+export async function writeFileAtomic(file, data) {
+  const tmp = `${file}.${process.pid}.tmp`;
+  let stat;
+  try {
+    const handle = await fs.promises.open(tmp, "w");
+    try {
+      await handle.writeFile(data);
+      await handle.sync();
+      stat = await handle.stat();
+    } finally {
+      await handle.close();
+    }
+    await fs.promises.rename(tmp, file);
+  } catch (error) {
+    await fs.promises.unlink(tmp).catch(() => {});
+    throw error;
+  }
+  const dir = await fs.promises.open(path.dirname(file), "r");
+  try {
+    await dir.sync();
+  } finally {
+    await dir.close();
+  }
+  return stat;
+}
+
+/**
+ * Remove temp files that writeFileAtomic left behind in processes that died mid-write
+ * @param {string} file - Target path the temp files were for
+ */
+export function removeStaleTempFiles(file) {
+  const prefix = `${path.basename(file)}.`;
+  let names = [];
+  try {
+    names = fs.readdirSync(path.dirname(file));
+  } catch {
+    return;
+  }
+  for (const name of names) {
+    // <pid>.tmp, or <pid>.<token>.tmp for lock candidates
+    const match = name.startsWith(prefix) && /^(\d+)(?:\.[0-9a-f]+)?\.tmp$/.exec(name.slice(prefix.length));
+    if (!match) continue;
+    try {
+      process.kill(Number(match[1]), 0);
+      continue; // Still running
+    } catch (error) {
+      if (error.code === "EPERM") continue;
+    }
+    fs.rmSync(path.join(path.dirname(file), name), { force: true });
+  }
+}
+
+/**
+ * Open the JSON gallery engine
+ * @param {string} file - Path of gallery.json
+ * @returns {Object} Engine with the galleryStore storage methods
+ */
+export function createJsonStore(file) {
+  const lockFile = `${file}.lock`;
+  // Parsed gallery.json with lookup indexes, kept until the file changes on disk
+  // (another worker, a manual edit) or is rewritten by a flush. Every write is a
+  // new inode (temp file + rename), so the stat check sees each one.
+  let cache = null;
+  // Changes waiting for the next flush ({ apply, resolve, reject } each)
+  let pending = [];
+  let flushTimer = null;
+  let flushing = false;
+
+  /**
+   * @returns {fs.Stats|null} Stats of the gallery file, or null if there is none
+   */
+  function statGallery() {
+    try {
+      return fs.statSync(file);
+    } catch {
+      return null;
+    }
+  }
+
+  /**
+   * Whether two stats describe the same file contents
+   */
+  function sameVersion(a, b) {
+    if (!a || !b) return a === b;
+    return a.ino === b.ino && a.size === b.size && a.mtimeMs === b.mtimeMs;
+  }
+
+  /**
+   * Cache a gallery with its visible works (in order) and an id lookup
+   * @param {Object} gallery - Gallery data with works array
+   * @param {fs.Stats|null} stat - Stats of the file it matches
+   * @returns {Object} The cache entry
+   */
+  function indexGallery(gallery, stat) {
+    cache = {
+      gallery,
+      visible: gallery.works.filter(w => w.visible !== false),
+      byId: new Map(gallery.works.map(w => [w.id, w])),
+      stat
+    };
+    return cache;
+  }
+
+  /**
+   * The cached gallery, re-read only when the file's mtime, size or inode changed
+   * @returns {Object} Cache entry: { gallery, visible, byId, stat }
+   */
+  function currentGallery() {
+    const stat = statGallery();
+    if (cache && sameVersion(cache.stat, stat)) {
+      return cache;
+    }
+    if (!stat) {
+      return indexGallery({ version: 0, works: [] }, null);
+    }
+    try {
+      return indexGallery(JSON.parse(fs.readFileSync(file, "utf-8")), stat);
+    } catch (error) {
+      console.error("Error loading gallery:", error.message);
+    }
+    // Not cached: the next read tries the file again
+    cache = null;
+    return { gallery: { version: 0, works: [] }, visible: [], byId: new Map(), stat: null };
+  }
+
+  /**
+   * Apply the queued changes to the latest gallery on disk and write it, all under
+   * the lock: whatever other workers wrote since our last read is kept
+   */
+  async function flush() {
+    flushTimer = null;
+    flushing = true;
+    const batch = pending;
+    pending = [];
+    try {
+      const results = await withFileLock(lockFile, async () => {
+        const { gallery } = currentGallery();
+        if (!cache) {
+          // Unreadable file: writing our view over it would throw its works away
+          throw new Error(`${path.basename(file)} could not be read`);
+        }
+        // Changes go to a copy (sharing the unchanged works); readers keep seeing the
+        // cached gallery until the copy is on disk, and a failed write leaves it as it was
+        const draft = { ...gallery, works: gallery.works.slice() };
+        const results = batch.map(change => change.apply(draft));
+        // Monotonic across workers: each write starts from the latest file
+        draft.version = (gallery.version || 0) + 1;
+        const stat = await writeFileAtomic(file, JSON.stringify(draft));
+        indexGallery(draft, stat);
+        return results;
+      });
+      batch.forEach((change, i) => change.resolve(results[i]));
+    } catch (error) {
+      console.error("Error saving gallery:", error.message);
+      batch.forEach(change => change.reject(new Error("Failed to save gallery data")));
+    } finally {
+      flushing = false;
+      if (pending.length) scheduleFlush();
+    }
+  }
+
+  function scheduleFlush() {
+    if (!flushTimer && !flushing) {
+      flushTimer = setTimeout(flush, FLUSH_DELAY_MS);
+    }
+  }
+
+  /**
+   * Queue a change for the next flush
+   * @param {Function} apply - Makes the change to a copy of the gallery (replacing, never
+   * modifying, the work objects it shares with the cache); its result is the promise's
+   * @returns {Promise} Settles once a write including this change is on disk
+   */
+  function change(apply) {
+    return new Promise((resolve, reject) => {
+      pending.push({ apply, resolve, reject });
+      scheduleFlush();
+    });
+  }
+
+  removeStaleTempFiles(file);
+  removeStaleTempFiles(lockFile);
+
+  return {
+    name: "json",
+
+    listWorks({ limit, offset, includeHidden }) {
+      const { gallery, visible } = currentGallery();
+      // Hidden works are left out unless admin
+      const works = includeHidden ? gallery.works : visible;
+      return { works: works.slice(offset, offset + limit), total: works.length };
+    },
+
+    getWork(id) {
+      return currentGallery().byId.get(id) || null;
+    },
+
+    allWorks() {
+      return currentGallery().gallery.works;
+    },
+
+    addWork(work) {
+      return change(gallery => {
+        gallery.works.unshift(work); // Add to beginning (newest first)
+      });
+    },
+
+    setVisibility(id, visible) {
+      return change(gallery => {
+        const index = gallery.works.findIndex(w => w.id === id);
+        if (index === -1) return false;
+        gallery.works[index] = { ...gallery.works[index], visible };
+        return true;
+      });
+    },
+
+    removeWork(id) {
+      return change(gallery => {
+        const index = gallery.works.findIndex(w => w.id === id);
+        if (index === -1) return null;
+        return gallery.works.splice(index, 1)[0];
+      });
+    },
+
+    stats() {
+      const { gallery, visible, stat } = currentGallery();
+      return {
+        version: gallery.version || 0,
+        works: gallery.works.length,
+        visibleWorks: visible.length,
+        fileBytes: stat ? stat.size : 0
+      };
+    }
+  };
+}
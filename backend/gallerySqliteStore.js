@@ -0,0 +1,272 @@
+/**
+ * Gallery SQLite Engine
+ * Works and scenes in indexed tables of data/gallery.db (WAL mode, prepared
+ * statements), imported once from gallery.json when the database is created
+ */
+
+import fs from "fs";
+import path from "path";
+
+// PRAGMA user_version once the schema exists and gallery.json has been imported
+const SCHEMA_VERSION = 1;
+
+const SCHEMA = `
+  CREATE TABLE IF NOT EXISTS works (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    user_name TEXT NOT NULL,
+    user_initials TEXT NOT NULL,
+    user_avatar TEXT,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    global_style TEXT,
+    main_characters TEXT NOT NULL DEFAULT '[]',
+    created_at TEXT NOT NULL,
+    visible INTEGER NOT NULL DEFAULT 1,
+    featured INTEGER NOT NULL DEFAULT 0
+  );
+  CREATE INDEX IF NOT EXISTS works_visible ON works (visible, seq);
+  CREATE TABLE IF NOT EXISTS scenes (
+    work_id TEXT NOT NULL REFERENCES works (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    scene_id,
+    title TEXT,
+    caption TEXT,
+    image_url TEXT,
+    original_url TEXT,
+    aspect_ratio TEXT,
+    PRIMARY KEY (work_id, position)
+  ) WITHOUT ROWID;
+`;
+
+/**
+ * Whether this Node has node:sqlite only behind --experimental-sqlite (22.5 to 22.12, 23.0 to 23.3)
+ */
+function sqliteNeedsFlag() {
+  const [major, minor] = process.versions.node.split(".").map(Number);
+  return (major === 22 && minor >= 5 && minor < 13) || (major === 23 && minor < 4);
+}
+
+/**
+ * Load a SQLite driver: Node's built-in node:sqlite (22.13+ / 23.4+, or 22.5+ with
+ * --experimental-sqlite), else the optional better-sqlite3 package
+ * @returns {Promise<Object>} { name, Database } where Database takes a file path
+ */
+async function loadDriver() {
+  try {
+    const { DatabaseSync } = await import("node:sqlite");
+    return { name: "node:sqlite", Database: DatabaseSync };
+  } catch {
+    // Older Node, or the flag is missing; try the npm package
+  }
+  try {
+    const { default: Database } = await import("better-sqlite3");
+    return { name: "better-sqlite3", Database };
+  } catch {
+    const hint = sqliteNeedsFlag()
+      ? `Node ${process.versions.node} has node:sqlite only with --experimental-sqlite (e.g. NODE_OPTIONS=--experimental-sqlite)`
+      : `Node ${process.versions.node} has no node:sqlite`;
+    throw new Error(`GALLERY_STORAGE=sqlite needs Node 22.13+ or the better-sqlite3 package: ${hint}`);
+  }
+}
+
+/**
+ * SQLite can't bind undefined or booleans
+ */
+function bindable(value) {
+  if (value === undefined) return null;
+  if (typeof value === "boolean") return value ? 1 : 0;
+  return value;
+}
+
+/**
+ * Open the SQLite gallery engine, creating the database on first use
+ * @param {string} file - Path of gallery.db
+ * @param {string} jsonFile - gallery.json to import when the database is new
+ * @returns {Promise<Object>} Engine with the galleryStore storage methods
+ */
+export async function createSqliteStore(file, jsonFile) {
+  const driver = await loadDriver();
+  const db = new driver.Database(file);
+  // First, so workers opening a new database together wait for each other (switching
+  // to WAL below takes a lock) instead of failing with SQLITE_BUSY
+  db.exec("PRAGMA busy_timeout = 5000");
+  // Readers don't block the writer (or each other) across backend workers
+  db.exec("PRAGMA journal_mode = WAL");
+  db.exec("PRAGMA synchronous = NORMAL");
+  db.exec("PRAGMA foreign_keys = ON");
+
+  /**
+   * Run fn inside a write transaction
+   */
+  function transaction(fn) {
+    db.exec("BEGIN IMMEDIATE");
+    try {
+      const result = fn();
+      db.exec("COMMIT");
+      return result;
+    } catch (error) {
+      db.exec("ROLLBACK");
+      throw error;
+    }
+  }
+
+  // Safe to repeat: workers starting together may all get here
+  db.exec(SCHEMA);
+
+  const statements = {
+    countVisible: db.prepare("SELECT COUNT(*) AS total FROM works WHERE visible = 1"),
+    countAll: db.prepare("SELECT COUNT(*) AS total FROM works"),
+    pageVisible: db.prepare("SELECT * FROM works WHERE visible = 1 ORDER BY seq DESC LIMIT ? OFFSET ?"),
+    pageAll: db.prepare("SELECT * FROM works ORDER BY seq DESC LIMIT ? OFFSET ?"),
+    allWorks: db.prepare("SELECT * FROM works ORDER BY seq DESC"),
+    workById: db.prepare("SELECT * FROM works WHERE id = ?"),
+    scenesOf: db.prepare("SELECT * FROM scenes WHERE work_id = ? ORDER BY position"),
+    insertWork: db.prepare(`
+      INSERT INTO works (id, user_name, user_initials, user_avatar, title, description,
+                         global_style, main_characters, created_at, visible, featured)
+      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)`),
+    insertScene: db.prepare(`
+      INSERT INTO scenes (work_id, position, scene_id, title, caption, image_url, original_url, aspect_ratio)
+      VALUES (?, ?, ?, ?, ?, ?, ?, ?)`),
+    setVisible: db.prepare("UPDATE works SET visible = ? WHERE id = ?"),
+    deleteWork: db.prepare("DELETE FROM works WHERE id = ?")
+  };
+
+  /**
+   * Insert a work and its scenes (inside a transaction)
+   */
+  function insert(work) {
+    statements.insertWork.run(
+      work.id, work.user.name, work.user.initials, bindable(work.user.avatar), work.title,
+      work.description || "", bindable(work.globalStyle), JSON.stringify(work.mainCharacters || []),
+      work.createdAt, work.visible !== false ? 1 : 0, work.featured ? 1 : 0
+    );
+    (work.scenes || []).forEach((scene, position) => {
+      statements.insertScene.run(
+        work.id, position, bindable(scene.id), bindable(scene.title), bindable(scene.caption),
+        bindable(scene.imageUrl), bindable(scene.originalUrl), bindable(scene.aspectRatio)
+      );
+    });
+  }
+
+  /**
+   * Work object (as the JSON engine stores it) from a works row
+   */
+  function toWork(row) {
+    return {
+      id: row.id,
+      user: {
+        name: row.user_name,
+        initials: row.user_initials,
+        avatar: row.user_avatar
+      },
+      title: row.title,
+      description: row.description,
+      globalStyle: row.global_style,
+      mainCharacters: JSON.parse(row.main_characters),
+      scenes: statements.scenesOf.all(row.id).map(scene => ({
+        id: scene.scene_id,
+        title: scene.title,
+        caption: scene.caption,
+        imageUrl: scene.image_url,
+        originalUrl: scene.original_url,
+        aspectRatio: scene.aspect_ratio
+      })),
+      createdAt: row.created_at,
+      visible: row.visible === 1,
+      featured: row.featured === 1
+    };
+  }
+
+  /**
+   * Run a change in a transaction, reporting failures like the JSON engine does
+   */
+  function write(fn) {
+    try {
+      return transaction(fn);
+    } catch (error) {
+      console.error("Error saving gallery:", error.message);
+      throw new Error("Failed to save gallery data");
+    }
+  }
+
+  // One-shot import; the version check is inside the transaction so only one worker imports
+  transaction(() => {
+    if (db.prepare("PRAGMA user_version").get().user_version >= SCHEMA_VERSION) {
+      return;
+    }
+    let works = [];
+    try {
+      if (fs.existsSync(jsonFile)) {
+        works = JSON.parse(fs.readFileSync(jsonFile, "utf-8")).works;
+      }
+    } catch (error) {
+      throw new Error(`Could not import ${path.basename(jsonFile)}: ${error.message}`);
+    }
+    // Oldest first, so seq follows publish order (gallery.json lists newest first)
+    works.slice().reverse().forEach(insert);
+    db.exec(`PRAGMA user_version = ${SCHEMA_VERSION}`);
+    if (works.length) {
+      console.log(`📦 Imported ${works.length} works from ${path.basename(jsonFile)} into ${path.basename(file)}`);
+    }
+  });
+  console.log(`🗄️  Gallery storage: SQLite (${path.basename(file)}, ${driver.name})`);
+
+  return {
+    name: "sqlite",
+
+    listWorks({ limit, offset, includeHidden }) {
+      const count = includeHidden ? statements.countAll : statements.countVisible;
+      const page = includeHidden ? statements.pageAll : statements.pageVisible;
+      return {
+        works: page.all(limit, offset).map(toWork),
+        total: count.get().total
+      };
+    },
+
+    getWork(id) {
+      const row = statements.workById.get(id);
+      return row ? toWork(row) : null;
+    },
+
+    allWorks() {
+      return statements.allWorks.all().map(toWork);
+    },
+
+    addWork(work) {
+      write(() => insert(work));
+    },
+
+    setVisibility(id, visible) {
+      return write(() => statements.setVisible.run(visible ? 1 : 0, id).changes > 0);
+    },
+
+    removeWork(id) {
+      return write(() => {
+        const row = statements.workById.get(id);
+        if (!row) return null;
+        const work = toWork(row);
+        // Scenes go with it (ON DELETE CASCADE)
+        statements.deleteWork.run(id);
+        return work;
+      });
+    },
+
+    stats() {
+      let fileBytes = 0;
+      for (const suffix of ["", "-wal"]) {
+        try {
+          fileBytes += fs.statSync(file + suffix).size;
+        } catch {
+          // No WAL right after a checkpoint
+        }
+      }
+      return {
+        works: statements.countAll.get().total,
+        visibleWorks: statements.countVisible.get().total,
+        fileBytes
+      };
+    }
+  };
+}
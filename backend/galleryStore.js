@@ -1,7 +1,9 @@
 /**
  * Gallery Store Module
  * Handles storage and retrieval of published storyboards
- * Uses JSON file storage for simplicity (can be upgraded to database later)
+ * Works are kept by a storage engine: a JSON file (galleryJsonStore.js), a
+ * SQLite database (gallerySqliteStore.js) or an append-only journal over the
+ * JSON file (galleryJournalStore.js), selected with GALLERY_STORAGE
  */
 
 import fs from "fs";
@@ -10,6 +12,13 @@ import { fileURLToPath } from "url";
 import https from "https";
 import http from "http";
 import crypto from "crypto";
+import dotenv from "dotenv";
+import { createJsonStore } from "./galleryJsonStore.js";
+import { createSqliteStore } from "./gallerySqliteStore.js";
+import { createJournalStore } from "./galleryJournalStore.js";
+
+// Before the engine is chosen (server.js loads .env only after its imports)
+dotenv.config();
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
@@ -17,6 +26,8 @@ const __dirname = path.dirname(__filename);
 // Storage paths
 const DATA_DIR = path.join(__dirname, "data");
 const GALLERY_FILE = path.join(DATA_DIR, "gallery.json");
+const GALLERY_DB = path.join(DATA_DIR, "gallery.db");
+const GALLERY_JOURNAL = path.join(DATA_DIR, "gallery.journal.jsonl");
 const IMAGES_DIR = path.join(DATA_DIR, "images");
 
 // Ensure directories exist
@@ -40,34 +51,26 @@ function ensureDirectories() {
 ensureDirectories();
 
 /**
- * Load gallery data from JSON file
- * @returns {Object} Gallery data with works array
+ * Open the storage engine chosen by GALLERY_STORAGE: "json" (default), "sqlite" or "journal"
+ * @returns {Promise<Object>} Engine: listWorks, getWork, allWorks, addWork, setVisibility, removeWork, stats
+ * (the changes may return promises that settle once the change is stored)
  */
-function loadGallery() {
-  try {
-    if (fs.existsSync(GALLERY_FILE)) {
-      const data = fs.readFileSync(GALLERY_FILE, "utf-8");
-      return JSON.parse(data);
-    }
-  } catch (error) {
-    console.error("Error loading gallery:", error.message);
+async function openStore() {
+  const storage = (process.env.GALLERY_STORAGE || "json").toLowerCase();
+  if (storage === "sqlite") {
+    return createSqliteStore(GALLERY_DB, GALLERY_FILE);
   }
-  return { works: [] };
-}
-
-/**
- * Save gallery data to JSON file
- * @param {Object} gallery - Gallery data to save
- */
-function saveGallery(gallery) {
-  try {
-    fs.writeFileSync(GALLERY_FILE, JSON.stringify(gallery, null, 2));
-  } catch (error) {
-    console.error("Error saving gallery:", error.message);
-    throw new Error("Failed to save gallery data");
+  if (storage === "journal") {
+    return createJournalStore(GALLERY_FILE, GALLERY_JOURNAL);
+  }
+  if (storage !== "json") {
+    console.warn(`⚠️ Unknown GALLERY_STORAGE "${storage}" - using json`);
   }
+  return createJsonStore(GALLERY_FILE);
 }
 
+const store = await openStore();
+
 /**
  * Generate a unique ID for a work
  * @returns {string} Unique ID
@@ -107,21 +110,24 @@ export async function downloadImage(url, workId, sceneIndex) {
     
     const file = fs.createWriteStream(filepath);
     
+    // The stream opens the file asynchronously; remove it only once it is closed
+    const discard = (then) => file.close(() => fs.rm(filepath, { force: true }, () => then()));
+    
     client.get(url, (response) => {
       // Handle redirects
       if (response.statusCode === 301 || response.statusCode === 302) {
-        file.close();
-        fs.unlinkSync(filepath);
-        downloadImage(response.headers.location, workId, sceneIndex)
-          .then(resolve)
-          .catch(reject);
+        response.resume();
+        discard(() => {
+          downloadImage(response.headers.location, workId, sceneIndex)
+            .then(resolve)
+            .catch(reject);
+        });
         return;
       }
       
       if (response.statusCode !== 200) {
-        file.close();
-        fs.unlinkSync(filepath);
-        reject(new Error(`Failed to download image: HTTP ${response.statusCode}`));
+        response.resume();
+        discard(() => reject(new Error(`Failed to download image: HTTP ${response.statusCode}`)));
         return;
       }
       
@@ -129,21 +135,14 @@ export async function downloadImage(url, workId, sceneIndex) {
       
       file.on("finish", () => {
         file.close();
-        console.log(`   💾 Saved: ${filename}`);
         resolve(`/images/${filename}`);
       });
       
       file.on("error", (err) => {
-        file.close();
-        fs.unlinkSync(filepath);
-        reject(err);
+        discard(() => reject(err));
       });
     }).on("error", (err) => {
-      file.close();
-      if (fs.existsSync(filepath)) {
-        fs.unlinkSync(filepath);
-      }
-      reject(err);
+      discard(() => reject(err));
     });
   });
 }
@@ -156,6 +155,7 @@ export async function downloadImage(url, workId, sceneIndex) {
  */
 export async function downloadAllImages(scenes, workId) {
   console.log(`\n📥 Downloading ${scenes.length} images for permanent storage...`);
+  const startTime = Date.now();
   
   const results = await Promise.all(
     scenes.map(async (scene, index) => {
@@ -163,18 +163,23 @@ export async function downloadAllImages(scenes, workId) {
         return { ...scene, local_image_url: null };
       }
       
+      const startTime = Date.now();
       try {
         const localPath = await downloadImage(scene.image_url, workId, index + 1);
+        const duration = ((Date.now() - startTime) / 1000).toFixed(2);
+        console.log(`   💾 Saved: ${path.basename(localPath)} in ${duration}s`);
         return { ...scene, local_image_url: localPath };
       } catch (error) {
-        console.error(`   ❌ Failed to download scene ${index + 1}:`, error.message);
+        const duration = ((Date.now() - startTime) / 1000).toFixed(2);
+        console.error(`   ❌ Failed to download scene ${index + 1} after ${duration}s:`, error.message);
         return { ...scene, local_image_url: null };
       }
     })
   );
   
   const successCount = results.filter(r => r.local_image_url).length;
-  console.log(`✅ Downloaded ${successCount}/${scenes.length} images`);
+  const duration = ((Date.now() - startTime) / 1000).toFixed(2);
+  console.log(`✅ Downloaded ${successCount}/${scenes.length} images in ${duration}s`);
   
   return results;
 }
@@ -235,10 +240,7 @@ export async function publishToGallery({
     featured: false
   };
   
-  // Load existing gallery and add new work
-  const gallery = loadGallery();
-  gallery.works.unshift(work); // Add to beginning (newest first)
-  saveGallery(gallery);
+  await store.addWork(work);
   
   console.log(`✅ Published to gallery: ${work.id}`);
   
@@ -254,20 +256,11 @@ export async function publishToGallery({
  * @returns {Object} Gallery data with works array and total count
  */
 export function getGalleryWorks({ limit = 20, offset = 0, includeHidden = false } = {}) {
-  const gallery = loadGallery();
-  
-  let works = gallery.works;
-  
-  // Filter hidden works unless admin
-  if (!includeHidden) {
-    works = works.filter(w => w.visible !== false);
-  }
-  
-  const total = works.length;
-  const paginatedWorks = works.slice(offset, offset + limit);
+  // Hidden works are left out unless admin
+  const { works, total } = store.listWorks({ limit, offset, includeHidden });
   
   return {
-    works: paginatedWorks,
+    works,
     total,
     limit,
     offset,
@@ -282,8 +275,7 @@ export function getGalleryWorks({ limit = 20, offset = 0, includeHidden = false
  * @returns {Object|null} Work object or null if not found
  */
 export function getWorkById(id, includeHidden = false) {
-  const gallery = loadGallery();
-  const work = gallery.works.find(w => w.id === id);
+  const work = store.getWork(id);
   
   if (!work) return null;
   if (!includeHidden && work.visible === false) return null;
@@ -295,16 +287,10 @@ export function getWorkById(id, includeHidden = false) {
  * Update work visibility (for moderation)
  * @param {string} id - Work ID
  * @param {boolean} visible - New visibility state
- * @returns {boolean} Success
+ * @returns {Promise<boolean>} Success
  */
-export function setWorkVisibility(id, visible) {
-  const gallery = loadGallery();
-  const work = gallery.works.find(w => w.id === id);
-  
-  if (!work) return false;
-  
-  work.visible = visible;
-  saveGallery(gallery);
+export async function setWorkVisibility(id, visible) {
+  if (!(await store.setVisibility(id, visible))) return false;
   
   console.log(`${visible ? "👁️" : "🙈"} Work ${id} visibility set to ${visible}`);
   return true;
@@ -313,15 +299,12 @@ export function setWorkVisibility(id, visible) {
 /**
  * Delete a work from the gallery
  * @param {string} id - Work ID
- * @returns {boolean} Success
+ * @returns {Promise<boolean>} Success
  */
-export function deleteWork(id) {
-  const gallery = loadGallery();
-  const index = gallery.works.findIndex(w => w.id === id);
-  
-  if (index === -1) return false;
+export async function deleteWork(id) {
+  const work = await store.removeWork(id);
   
-  const work = gallery.works[index];
+  if (!work) return false;
   
   // Delete associated images
   work.scenes.forEach(scene => {
@@ -333,14 +316,19 @@ export function deleteWork(id) {
     }
   });
   
-  // Remove from gallery
-  gallery.works.splice(index, 1);
-  saveGallery(gallery);
-  
   console.log(`🗑️ Deleted work ${id}`);
   return true;
 }
 
+/**
+ * Every work, hidden ones included, as pretty-printed JSON in the gallery.json layout
+ * (the stores themselves keep a compact encoding)
+ * @returns {string} Export document
+ */
+export function exportGallery() {
+  return JSON.stringify({ works: store.allWorks() }, null, 2);
+}
+
 /**
  * Get the absolute path to the images directory
  * @returns {string} Images directory path
@@ -349,3 +337,35 @@ export function getImagesDir() {
   return IMAGES_DIR;
 }
 
+
+/**
+ * Size of the gallery store, for the metrics endpoint
+ * @returns {Object} Work counts and on-disk sizes
+ */
+export function getGalleryStats() {
+  return {
+    storage: store.name,
+    ...store.stats(),
+    images: countImages()
+  };
+}
+
+// Image count, with the directory mtime it was taken at
+let imageCount = { mtimeMs: null, count: 0 };
+
+/**
+ * Number of stored images, re-counted only when the directory changed (any worker's
+ * publish or delete moves its mtime), so metric scrapes don't list it every time
+ * @returns {number} Files in the images directory
+ */
+function countImages() {
+  try {
+    const { mtimeMs } = fs.statSync(IMAGES_DIR);
+    if (mtimeMs !== imageCount.mtimeMs) {
+      imageCount = { mtimeMs, count: fs.readdirSync(IMAGES_DIR).length };
+    }
+    return imageCount.count;
+  } catch {
+    return 0; // Images directory missing
+  }
+}
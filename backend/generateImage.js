@@ -116,6 +116,7 @@ ${scene.dalle_prompt}
   console.log(fullPrompt.split('\n').map(line => `   ${line}`).join('\n'));
   console.log("   " + "-".repeat(50));
   
+  const startTime = Date.now();
   try {
     const response = await openai.images.generate({
       model: "dall-e-3",
@@ -127,11 +128,13 @@ ${scene.dalle_prompt}
     });
     
     const imageUrl = response.data[0].url;
-    console.log(`✅ Image generated successfully`);
+    const duration = ((Date.now() - startTime) / 1000).toFixed(2);
+    console.log(`✅ Image generated for scene ${scene.id} in ${duration}s`);
     
     return imageUrl;
   } catch (error) {
-    console.error(`❌ Error generating image for scene ${scene.id}:`, error.message);
+    const duration = ((Date.now() - startTime) / 1000).toFixed(2);
+    console.error(`❌ Error generating image for scene ${scene.id} after ${duration}s:`, error.message);
     console.error(`   💡 Prompt that failed:`);
     console.error(fullPrompt.split('\n').map(line => `      ${line}`).join('\n'));
     throw new Error(`Image generation failed for scene ${scene.id}: ${error.message}`);
@@ -0,0 +1,171 @@
+/**
+ * Logging Module
+ * Tags console output so interleaved logs from several backend processes and
+ * concurrent requests stay attributable (and searchable with `run.py logs`)
+ */
+
+import { AsyncLocalStorage } from "async_hooks";
+import crypto from "crypto";
+import fs from "fs";
+import util from "util";
+
+// Per-request context: { id, stage }
+const requestContext = new AsyncLocalStorage();
+
+// Set by run.py in multi-worker mode
+const workerTag = process.env.WORKER_ID ? `[w${process.env.WORKER_ID}] ` : "";
+
+// Incoming X-Request-Id values are reused only if they look like ids
+const REQUEST_ID = /^[0-9A-Za-z_-]{1,64}$/;
+
+// Lines below the current level are dropped; run.py sets it with LOG_LEVEL and changes it at runtime
+export const LOG_LEVELS = ["info", "warn", "error"];
+let minimumLevel = LOG_LEVELS.includes(process.env.LOG_LEVEL) ? process.env.LOG_LEVEL : "info";
+
+/**
+ * Tag for the current line: worker, request id and stage, and level for warnings/errors
+ * @param {string} level - "warn", "error" or null
+ * @returns {string} Prefix such as "[w2] [r:1a2b3c4d/plan] [error] "
+ */
+function linePrefix(level) {
+  let prefix = workerTag;
+  const context = requestContext.getStore();
+  if (context) {
+    prefix += context.stage ? `[r:${context.id}/${context.stage}] ` : `[r:${context.id}] `;
+  }
+  if (level) {
+    prefix += `[${level}] `;
+  }
+  return prefix;
+}
+
+/**
+ * Prefix every line written through console.log/info/warn/error
+ */
+function installConsoleTagging() {
+  const levels = { log: null, info: null, warn: "warn", error: "error" };
+  for (const [method, level] of Object.entries(levels)) {
+    const original = console[method].bind(console);
+    const severity = LOG_LEVELS.indexOf(level || "info");
+    console[method] = (...args) => {
+      if (severity < LOG_LEVELS.indexOf(minimumLevel)) {
+        return;
+      }
+      const prefix = linePrefix(level);
+      if (!prefix) {
+        return original(...args);
+      }
+      const text = util.format(...args);
+      original(text.split("\n").map(line => `${prefix}${line}`).join("\n"));
+    };
+  }
+}
+
+/**
+ * Express middleware: give each request an id (echoed as X-Request-Id) that is
+ * attached to every line it logs
+ */
+export function requestLogging(req, res, next) {
+  const incoming = req.get("x-request-id");
+  const id = incoming && REQUEST_ID.test(incoming) ? incoming : crypto.randomBytes(4).toString("hex");
+  res.set("X-Request-Id", id);
+  requestContext.run({ id, stage: null }, next);
+}
+
+/**
+ * Name the processing stage of the current request (e.g. "plan", "images")
+ * @param {string} stage - Short stage name
+ */
+export function setLogStage(stage) {
+  const context = requestContext.getStore();
+  if (context) {
+    context.stage = stage;
+  }
+}
+
+/**
+ * Change the minimum level written to the log
+ * @param {string} level - "info", "warn" or "error"
+ * @returns {boolean} False if the level is not one of LOG_LEVELS
+ */
+export function setLogLevel(level) {
+  if (!LOG_LEVELS.includes(level)) {
+    return false;
+  }
+  minimumLevel = level;
+  return true;
+}
+
+/**
+ * @returns {string} The current minimum level
+ */
+export function getLogLevel() {
+  return minimumLevel;
+}
+
+/**
+ * "2024-05-01 12:34:56.789 " in local time, the stamp run.py's log pump puts on each line
+ */
+function arrivalStamp(date) {
+  const pad = (n, width = 2) => String(n).padStart(width, "0");
+  return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())} ` +
+    `${pad(date.getHours())}:${pad(date.getMinutes())}:${pad(date.getSeconds())}.${pad(date.getMilliseconds(), 3)} `;
+}
+
+/**
+ * Outlive the log pump: when stdout/stderr is its FIFO and the pump goes away, writes
+ * fail with EPIPE (or EAGAIN), which would otherwise crash the process. From then on
+ * output is appended straight to LOG_FALLBACK_FILE (set by run.py), stamped the way
+ * the pump does it, or dropped if there is no such file.
+ */
+function installPipeFallback() {
+  const file = process.env.LOG_FALLBACK_FILE;
+  let atLineStart = true;
+  let fallenBack = false;
+
+  function appendToFile(chunk, encoding, callback) {
+    if (typeof encoding === "function") {
+      callback = encoding;
+    }
+    if (file) {
+      const stamp = arrivalStamp(new Date());
+      const lines = String(chunk).split("\n");
+      let text = "";
+      lines.forEach((line, i) => {
+        const last = i === lines.length - 1;
+        if (last && !line) return; // The chunk ended with a complete line
+        text += (atLineStart ? stamp : "") + line + (last ? "" : "\n");
+        atLineStart = !last;
+      });
+      try {
+        // Opened per write, so the pump's rotations (if it comes back) are followed
+        fs.appendFileSync(file, text);
+      } catch {
+        // Nowhere left to log
+      }
+    }
+    if (typeof callback === "function") {
+      process.nextTick(callback);
+    }
+    return true;
+  }
+
+  for (const stream of [process.stdout, process.stderr]) {
+    stream.on("error", error => {
+      if (error.code !== "EPIPE" && error.code !== "EAGAIN") {
+        throw error;
+      }
+      // The stream is destroyed after an error; both go to the file from now on
+      process.stdout.write = appendToFile;
+      process.stderr.write = appendToFile;
+      if (!fallenBack) {
+        fallenBack = true;
+        console.warn(`Log pump went away (${error.code}) - writing ${file || "nothing"} directly`);
+      }
+    });
+  }
+}
+
+// Installed on import so messages logged while other modules load are tagged too
+installConsoleTagging();
+installPipeFallback();
@@ -10,8 +10,11 @@ import dotenv from "dotenv";
 // On Railway/cloud, env vars are injected automatically
 dotenv.config();
 
+// Any OpenAI-compatible server, e.g. the offline mock from `python run.py mock-openai`
+const baseURL = process.env.OPENAI_BASE_URL || undefined;
+
 // Check for API key - warn but don't crash (allows server to start for health checks)
-if (!process.env.OPENAI_API_KEY) {
+if (!process.env.OPENAI_API_KEY && !baseURL) {
   console.warn("⚠️  WARNING: OPENAI_API_KEY is not set in environment variables");
   console.warn("   Storyboard generation will fail until API key is configured");
   console.warn("   For local dev: create backend/.env with OPENAI_API_KEY=sk-...");
@@ -21,8 +24,13 @@ if (!process.env.OPENAI_API_KEY) {
 // Initialize OpenAI client (will fail gracefully on API calls if no key)
 export const openai = new OpenAI({
   apiKey: process.env.OPENAI_API_KEY || "missing-key",
+  baseURL,
 });
 
+if (baseURL) {
+  console.log(`🧪 OpenAI requests go to ${baseURL}`);
+}
+
 // Export for testing/verification
 export function testConnection() {
   if (process.env.OPENAI_API_KEY) {
@@ -132,6 +132,7 @@ Constraints:
 - Do NOT add any extra keys, comments, or explanations.`;
 
   console.log(`\n📝 Planning ${numScenes} scenes for story (${story.length} chars)...`);
+  const startTime = Date.now();
   
   try {
     const completion = await openai.chat.completions.create({
@@ -151,12 +152,14 @@ Constraints:
       throw new Error("Invalid JSON structure from GPT");
     }
     
-    console.log(`✅ Generated ${plan.scenes.length} scenes`);
+    const duration = ((Date.now() - startTime) / 1000).toFixed(2);
+    console.log(`✅ Generated ${plan.scenes.length} scenes in ${duration}s`);
     console.log(`🎨 Style: ${plan.global_style}`);
     
     return plan;
   } catch (error) {
-    console.error("❌ Error planning scenes:", error.message);
+    const duration = ((Date.now() - startTime) / 1000).toFixed(2);
+    console.error(`❌ Error planning scenes after ${duration}s:`, error.message);
     throw new Error(`Scene planning failed: ${error.message}`);
   }
 }
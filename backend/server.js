@@ -3,10 +3,13 @@
  * Main Express server with /api/storyboard and /api/gallery endpoints
  */
 
+import { requestLogging, setLogStage, setLogLevel, getLogLevel, LOG_LEVELS } from "./logging.js"; // First, so log tagging covers every module's output
 import express from "express";
 import cors from "cors";
 import dotenv from "dotenv";
+import fs from "fs";
 import path from "path";
+import { monitorEventLoopDelay } from "perf_hooks";
 import { fileURLToPath } from "url";
 import { planScenes } from "./planScenes.js";
 import { generateAllImages } from "./generateImage.js";
@@ -16,31 +19,88 @@ import {
   getWorkById, 
   setWorkVisibility,
   deleteWork,
-  getImagesDir 
+  getImagesDir,
+  getGalleryStats,
+  exportGallery
 } from "./galleryStore.js";
 
 // Load environment variables
 dotenv.config();
 
+// Set by run.py in multi-worker mode
+const WORKER_ID = process.env.WORKER_ID;
+
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
 const app = express();
 const PORT = process.env.PORT || 3001;
 
+// How long in-flight requests get to finish after SIGTERM before they are cut off
+const SHUTDOWN_GRACE_MS = parseInt(process.env.SHUTDOWN_GRACE_MS || "60000", 10);
+
+// Runtime metrics, served to run.py on GET /api/metrics
+const startedAt = Date.now();
+const LOOP_LAG_RESOLUTION_MS = 10;
+const eventLoopDelay = monitorEventLoopDelay({ resolution: LOOP_LAG_RESOLUTION_MS });
+eventLoopDelay.enable();
+const storyboardJobs = { active: 0, completed: 0, failed: 0 };
+
+// Graceful shutdown state
+let draining = false;
+const inFlight = new Set();
+let completedWhileDraining = 0;
+
 // Middleware
+app.use((req, res, next) => {
+  inFlight.add(res);
+  res.on("close", () => {
+    inFlight.delete(res);
+    if (draining) {
+      completedWhileDraining++;
+      maybeFinishShutdown();
+    }
+  });
+  // Requests that arrive on a kept-alive connection during a drain are served, then the connection closes
+  if (draining) {
+    res.set("Connection", "close");
+  }
+  next();
+});
 app.use(cors()); // Enable CORS for frontend
 app.use(express.json({ limit: "10mb" })); // Parse JSON bodies
+app.use(requestLogging); // Request id on every log line (and X-Request-Id header)
 
 // Serve static images from the gallery
 app.use("/images", express.static(getImagesDir()));
 
-// Serve frontend static files (HTML, CSS, JS)
-const frontendDir = path.join(__dirname, "..", "frontend");
-app.use(express.static(frontendDir));
+// Serve frontend static files (HTML, CSS, JS).
+// Prefer the `python run.py build` output, whose content-hashed assets can be cached forever.
+const frontendSourceDir = path.join(__dirname, "..", "frontend");
+const frontendBuildDir = path.join(frontendSourceDir, "dist");
+const frontendDir = fs.existsSync(path.join(frontendBuildDir, "index.html"))
+  ? frontendBuildDir
+  : frontendSourceDir;
+const HASHED_ASSET = /\.[0-9a-f]{10}\.(?:js|css)$/;
+
+app.use(express.static(frontendDir, {
+  setHeaders: (res, filePath) => {
+    if (HASHED_ASSET.test(filePath)) {
+      res.setHeader("Cache-Control", "public, max-age=31536000, immutable");
+    }
+  }
+}));
 
 // Health check endpoint (API info)
 app.get("/api", (req, res) => {
+  // Readiness: a draining server must not be handed new work
+  if (draining) {
+    return res.status(503).json({
+      status: "draining",
+      message: "Server is shutting down",
+      inFlight: inFlight.size - 1
+    });
+  }
   res.json({
     status: "ok",
     message: "STORYBRD API",
@@ -53,9 +113,71 @@ app.get("/api", (req, res) => {
   });
 });
 
+/**
+ * Only local callers that did not come through the proxy (which always adds X-Forwarded-For)
+ */
+function isLocalRequest(req) {
+  const address = req.socket.remoteAddress;
+  const loopback = address === "127.0.0.1" || address === "::1" || address === "::ffff:127.0.0.1";
+  return loopback && !req.headers["x-forwarded-for"];
+}
+
+/**
+ * Middleware for operator endpoints: anyone else gets the usual 404
+ */
+function localOnly(req, res, next) {
+  if (!isLocalRequest(req)) {
+    return res.status(404).json({
+      error: "NOT_FOUND",
+      message: `Endpoint ${req.method} ${req.path} not found`
+    });
+  }
+  next();
+}
+
+// Process metrics for `python run.py status` / `top` (local only)
+app.get("/api/metrics", localOnly, (req, res) => {
+  // The histogram samples include the timer's own resolution; report only the lag beyond it
+  const lagMs = ns => Math.max(0, Math.round((ns / 1e6 - LOOP_LAG_RESOLUTION_MS) * 100) / 100);
+  const memory = process.memoryUsage();
+  res.json({
+    pid: process.pid,
+    worker: WORKER_ID || null,
+    uptimeSeconds: Math.round((Date.now() - startedAt) / 1000),
+    draining,
+    eventLoopLagMs: {
+      mean: lagMs(eventLoopDelay.mean),
+      p99: lagMs(eventLoopDelay.percentile(99)),
+      max: lagMs(eventLoopDelay.max)
+    },
+    inFlightRequests: inFlight.size - 1,
+    storyboards: storyboardJobs,
+    heapUsedBytes: memory.heapUsed,
+    gallery: getGalleryStats()
+  });
+  // Each read reports the lag since the previous one
+  eventLoopDelay.reset();
+});
+
+// Runtime log level for `python run.py log-level` (local only)
+app.get("/api/log-level", localOnly, (req, res) => {
+  res.json({ level: getLogLevel() });
+});
+
+app.put("/api/log-level", localOnly, (req, res) => {
+  if (!setLogLevel(req.body?.level)) {
+    return res.status(400).json({
+      error: "INVALID_LEVEL",
+      message: `level must be one of: ${LOG_LEVELS.join(", ")}`
+    });
+  }
+  res.json({ level: getLogLevel() });
+});
+
 // Main storyboard generation endpoint
 app.post("/api/storyboard", async (req, res) => {
   const startTime = Date.now();
+  storyboardJobs.active++;
   
   try {
     const { story, numScenes = 8, style = "" } = req.body;
@@ -90,14 +212,17 @@ app.post("/api/storyboard", async (req, res) => {
     console.log("=".repeat(60));
 
     // Step 1: Plan scenes with GPT
+    setLogStage("plan");
     console.log("\n🤖 Step 1: Planning scenes with GPT...");
     const plan = await planScenes({ story, numScenes, style });
 
     // Step 2: Generate images with DALL-E 3
+    setLogStage("images");
     console.log("\n🎨 Step 2: Generating images with DALL-E 3...");
     const scenesWithImages = await generateAllImages(plan.scenes, plan.global_style, plan.main_characters || []);
 
     // Step 3: Prepare response
+    setLogStage("respond");
     const duration = ((Date.now() - startTime) / 1000).toFixed(2);
     const successCount = scenesWithImages.filter(s => s.image_url).length;
     
@@ -106,6 +231,8 @@ app.post("/api/storyboard", async (req, res) => {
     console.log(`   ${successCount}/${scenesWithImages.length} images generated successfully`);
     console.log("=".repeat(60) + "\n");
 
+    storyboardJobs.completed++;
+
     // Return the storyboard
     res.json({
       success: true,
@@ -123,7 +250,8 @@ app.post("/api/storyboard", async (req, res) => {
   } catch (error) {
     const duration = ((Date.now() - startTime) / 1000).toFixed(2);
     
-    console.error("\n❌ Error processing storyboard request:", error.message);
+    storyboardJobs.failed++;
+    console.error(`\n❌ Error processing storyboard request after ${duration}s:`, error.message);
     console.error("Stack:", error.stack);
 
     // Determine error type
@@ -146,6 +274,8 @@ app.post("/api/storyboard", async (req, res) => {
         duration_seconds: parseFloat(duration)
       }
     });
+  } finally {
+    storyboardJobs.active--;
   }
 });
 
@@ -178,6 +308,24 @@ app.get("/api/gallery", (req, res) => {
   }
 });
 
+/**
+ * GET /api/gallery/export - Download the whole gallery as pretty-printed JSON
+ * (local only: `python run.py gallery-export`)
+ */
+app.get("/api/gallery/export", localOnly, (req, res) => {
+  try {
+    res.set("Content-Disposition", 'attachment; filename="gallery.json"');
+    res.type("application/json").send(exportGallery());
+  } catch (error) {
+    console.error("Error exporting gallery:", error.message);
+    res.status(500).json({
+      success: false,
+      error: "GALLERY_ERROR",
+      message: error.message
+    });
+  }
+});
+
 /**
  * GET /api/gallery/:id - Get a single work by ID
  */
@@ -250,6 +398,7 @@ app.post("/api/gallery/publish", async (req, res) => {
     }
     
     console.log("\n" + "=".repeat(60));
+    setLogStage("publish");
     console.log("📤 Publishing to gallery...");
     console.log(`   User: ${userName}`);
     console.log(`   Title: ${title || "Untitled"}`);
@@ -290,7 +439,7 @@ app.post("/api/gallery/publish", async (req, res) => {
 /**
  * PATCH /api/gallery/:id/visibility - Update work visibility (moderation)
  */
-app.patch("/api/gallery/:id/visibility", (req, res) => {
+app.patch("/api/gallery/:id/visibility", async (req, res) => {
   try {
     const { visible } = req.body;
     
@@ -302,7 +451,7 @@ app.patch("/api/gallery/:id/visibility", (req, res) => {
       });
     }
     
-    const success = setWorkVisibility(req.params.id, visible);
+    const success = await setWorkVisibility(req.params.id, visible);
     
     if (!success) {
       return res.status(404).json({
@@ -329,9 +478,9 @@ app.patch("/api/gallery/:id/visibility", (req, res) => {
 /**
  * DELETE /api/gallery/:id - Delete a work from the gallery
  */
-app.delete("/api/gallery/:id", (req, res) => {
+app.delete("/api/gallery/:id", async (req, res) => {
   try {
-    const success = deleteWork(req.params.id);
+    const success = await deleteWork(req.params.id);
     
     if (!success) {
       return res.status(404).json({
@@ -368,14 +517,68 @@ app.get("*", (req, res) => {
   res.sendFile(path.join(frontendDir, "index.html"));
 });
 
-// Start server - bind to 0.0.0.0 for Railway/cloud hosting
-app.listen(PORT, "0.0.0.0", () => {
+// Start server - bind to 0.0.0.0 for Railway/cloud hosting.
+// run.py binds each worker's port itself and hands the socket over as LISTEN_FD.
+const listenTarget = process.env.LISTEN_FD
+  ? { fd: parseInt(process.env.LISTEN_FD, 10) }
+  : { port: PORT, host: "0.0.0.0" };
+
+const server = app.listen(listenTarget, () => {
   console.log("\n" + "=".repeat(60));
   console.log("🚀 Storyboard Generator API Server");
+  if (WORKER_ID) {
+    console.log(`👷 Worker ${WORKER_ID} (PID ${process.pid})`);
+  }
   console.log(`📍 Server running on port ${PORT}`);
   console.log(`🔑 API Key configured: ${process.env.OPENAI_API_KEY ? "✅ Yes" : "❌ No"}`);
   console.log("=".repeat(60) + "\n");
 });
 
-export default app;
+let shutdownStartedAt = null;
+let shutdownTimer = null;
 
+/**
+ * Stop accepting connections and let in-flight requests finish.
+ * Requests still running after SHUTDOWN_GRACE_MS are aborted.
+ */
+function beginShutdown(signal) {
+  if (draining) {
+    // A second Ctrl+C means "now"
+    if (signal === "SIGINT") {
+      finishShutdown(inFlight.size);
+    }
+    return;
+  }
+  draining = true;
+  shutdownStartedAt = Date.now();
+  // Shutdown progress is logged whatever the level: run.py reads the summary line
+  setLogLevel("info");
+  console.log(`🛑 ${signal} received - draining ${inFlight.size} in-flight request(s), grace ${SHUTDOWN_GRACE_MS / 1000}s`);
+  server.close();
+  server.closeIdleConnections();
+  shutdownTimer = setTimeout(() => finishShutdown(inFlight.size), SHUTDOWN_GRACE_MS);
+  maybeFinishShutdown();
+}
+
+function maybeFinishShutdown() {
+  if (draining && inFlight.size === 0) {
+    finishShutdown(0);
+  }
+}
+
+function finishShutdown(aborted) {
+  clearTimeout(shutdownTimer);
+  if (aborted > 0) {
+    console.warn(`⚠️  Grace period over - aborting ${aborted} request(s)`);
+    server.closeAllConnections();
+  }
+  const seconds = ((Date.now() - shutdownStartedAt) / 1000).toFixed(2);
+  // run.py parses this line to report the drain
+  console.log(`🛑 Shutdown complete in ${seconds}s: ${completedWhileDraining} finished, ${aborted} aborted (PID ${process.pid})`);
+  process.exit(0);
+}
+
+process.on("SIGTERM", () => beginShutdown("SIGTERM"));
+process.on("SIGINT", () => beginShutdown("SIGINT"));
+
+export default app;
@@ -0,0 +1,151 @@
+/**
+ * Journal gallery engine: replay over the checkpoint, torn writes and compaction
+ */
+
+import { test } from "node:test";
+import assert from "node:assert/strict";
+import { execFile } from "child_process";
+import fs from "fs";
+import path from "path";
+import { fileURLToPath } from "url";
+import { promisify } from "util";
+import { createJournalStore } from "../galleryJournalStore.js";
+import { tempDir, makeWork, writeGallery } from "./helpers.js";
+
+const line = entry => JSON.stringify(entry) + "\n";
+const ids = store => store.allWorks().map(w => w.id);
+
+test("replays the journal over the checkpoint", async t => {
+  const dir = tempDir(t);
+  const checkpoint = writeGallery(dir, [makeWork("b"), makeWork("a")]);
+  const journal = path.join(dir, "gallery.journal.jsonl");
+  fs.writeFileSync(journal, [
+    line({ op: "publish", work: makeWork("c") }),
+    line({ op: "visibility", id: "a", visible: false }),
+    line({ op: "delete", id: "b" })
+  ].join(""));
+
+  const store = createJournalStore(checkpoint, journal);
+  assert.deepEqual(ids(store), ["c", "a"]);
+  assert.deepEqual(store.listWorks({ limit: 10, offset: 0 }), { works: [makeWork("c")], total: 1 });
+  assert.equal(store.getWork("a").visible, false);
+});
+
+test("replaying entries twice changes nothing", async t => {
+  const dir = tempDir(t);
+  const checkpoint = writeGallery(dir, [makeWork("a")]);
+  const journal = path.join(dir, "gallery.journal.jsonl");
+  const entries = [
+    line({ op: "publish", work: makeWork("a") }),
+    line({ op: "publish", work: makeWork("b") }),
+    line({ op: "delete", id: "a" }),
+    line({ op: "delete", id: "a" })
+  ].join("");
+  // As after a compaction that crashed before removing the folded journal
+  fs.writeFileSync(`${journal}.compacting`, entries);
+  fs.writeFileSync(journal, entries);
+
+  assert.deepEqual(ids(createJournalStore(checkpoint, journal)), ["b"]);
+});
+
+test("skips a torn last line and ends it before the next append", async t => {
+  const dir = tempDir(t);
+  const checkpoint = writeGallery(dir, []);
+  const journal = path.join(dir, "gallery.journal.jsonl");
+  const torn = line({ op: "publish", work: makeWork("b") }).slice(0, 40);
+  fs.writeFileSync(journal, line({ op: "publish", work: makeWork("a") }) + torn);
+
+  const store = createJournalStore(checkpoint, journal);
+  assert.deepEqual(ids(store), ["a"]);
+  // Opening the store leaves the shared file alone; another worker may be mid-append
+  assert.ok(fs.readFileSync(journal, "utf-8").endsWith(torn));
+
+  await store.addWork(makeWork("c"));
+  assert.deepEqual(ids(store), ["c", "a"]);
+  assert.ok(fs.readFileSync(journal, "utf-8").includes(torn + "\n"));
+  // A fresh start sees the same gallery, stepping over the garbled line
+  assert.deepEqual(ids(createJournalStore(checkpoint, journal)), ["c", "a"]);
+});
+
+test("an incomplete last line is left for later, not skipped", async t => {
+  const dir = tempDir(t);
+  const checkpoint = writeGallery(dir, []);
+  const journal = path.join(dir, "gallery.journal.jsonl");
+  const store = createJournalStore(checkpoint, journal);
+
+  // Another worker's append, seen half-written
+  const entry = line({ op: "publish", work: makeWork("a") });
+  fs.appendFileSync(journal, entry.slice(0, 30));
+  assert.deepEqual(ids(store), []);
+  fs.appendFileSync(journal, entry.slice(30));
+  assert.deepEqual(ids(store), ["a"]);
+});
+
+test("follows changes other workers append", async t => {
+  const dir = tempDir(t);
+  const checkpoint = writeGallery(dir, [makeWork("a")]);
+  const journal = path.join(dir, "gallery.journal.jsonl");
+  const one = createJournalStore(checkpoint, journal);
+  const two = createJournalStore(checkpoint, journal);
+
+  await one.addWork(makeWork("b"));
+  assert.equal(await two.setVisibility("b", false), true);
+  assert.deepEqual(await one.removeWork("a"), makeWork("a"));
+  assert.equal(await two.removeWork("a"), null);
+  assert.deepEqual(two.allWorks(), [makeWork("b", { visible: false })]);
+  assert.deepEqual(one.stats().visibleWorks, 0);
+});
+
+test("compaction folds a large journal into the checkpoint", async t => {
+  const dir = tempDir(t);
+  const checkpoint = writeGallery(dir, []);
+  const journal = path.join(dir, "gallery.journal.jsonl");
+  const store = createJournalStore(checkpoint, journal, 64 * 1024);
+  const reader = createJournalStore(checkpoint, journal);
+
+  // Toggling one work back and forth grows the journal past the threshold
+  await store.addWork(makeWork("a", { description: "x".repeat(2000) }));
+  for (let i = 0; fs.statSync(journal).size <= 64 * 1024; i++) {
+    await store.setVisibility("a", i % 2 === 0);
+  }
+  await store.addWork(makeWork("b"));
+  // Done once the journal was moved aside and the folded copy removed
+  for (let i = 0; i < 200 && (fs.existsSync(journal) || fs.existsSync(`${journal}.compacting`)); i++) {
+    await new Promise(resolve => setTimeout(resolve, 10));
+  }
+
+  assert.equal(fs.existsSync(journal), false);
+  assert.equal(fs.existsSync(`${journal}.compacting`), false);
+  const folded = JSON.parse(fs.readFileSync(checkpoint, "utf-8"));
+  assert.deepEqual(folded.works.map(w => w.id), ["b", "a"]);
+  assert.deepEqual(ids(reader), ["b", "a"]);
+  assert.equal(reader.getWork("a").visible, store.getWork("a").visible);
+  await store.addWork(makeWork("c"));
+  assert.deepEqual(ids(createJournalStore(checkpoint, journal)), ["c", "b", "a"]);
+});
+
+test("appends from several processes survive compactions running meanwhile", async t => {
+  const dir = tempDir(t);
+  const checkpoint = writeGallery(dir, []);
+  const journal = path.join(dir, "gallery.journal.jsonl");
+  const module = fileURLToPath(new URL("../galleryJournalStore.js", import.meta.url));
+  const helpers = fileURLToPath(new URL("./helpers.js", import.meta.url));
+  // A small threshold, so every worker keeps compacting while the others append
+  const script = worker => `
+    const { createJournalStore } = await import(${JSON.stringify(module)});
+    const { makeWork } = await import(${JSON.stringify(helpers)});
+    const store = createJournalStore(${JSON.stringify(checkpoint)}, ${JSON.stringify(journal)}, 4096);
+    for (let i = 0; i < 60; i++) {
+      await store.addWork(makeWork("w${worker}-" + i));
+    }
+  `;
+  const run = promisify(execFile);
+  await Promise.all(Array.from({ length: 4 }, (_, worker) =>
+    run(process.execPath, ["--input-type=module", "-e", script(worker)])
+  ));
+
+  const works = createJournalStore(checkpoint, journal).allWorks();
+  assert.equal(works.length, 4 * 60);
+  assert.equal(new Set(works.map(w => w.id)).size, 4 * 60);
+  assert.equal(fs.existsSync(`${journal}.lock`), false);
+});
@@ -0,0 +1,202 @@
+/**
+ * JSON gallery engine: coalesced atomic flushes, the cached copy and the cross-process lock
+ */
+
+import { test } from "node:test";
+import assert from "node:assert/strict";
+import { execFile, spawnSync } from "child_process";
+import fs from "fs";
+import path from "path";
+import { fileURLToPath } from "url";
+import { promisify } from "util";
+import { createJsonStore, withFileLock } from "../galleryJsonStore.js";
+import { tempDir, makeWork, writeGallery } from "./helpers.js";
+
+const readGallery = file => JSON.parse(fs.readFileSync(file, "utf-8"));
+
+test("a burst of changes is one compact, versioned write", async t => {
+  const file = writeGallery(tempDir(t), [makeWork("a")]);
+  const store = createJsonStore(file);
+
+  const results = await Promise.all([
+    store.addWork(makeWork("b")),
+    store.setVisibility("a", false),
+    store.setVisibility("nope", false),
+    store.removeWork("nope")
+  ]);
+  assert.deepEqual(results, [undefined, true, false, null]);
+
+  const onDisk = readGallery(file);
+  assert.equal(onDisk.version, 1);
+  assert.deepEqual(onDisk.works.map(w => [w.id, w.visible]), [["b", true], ["a", false]]);
+  assert.ok(!fs.readFileSync(file, "utf-8").includes("\n"));
+  assert.deepEqual(store.listWorks({ limit: 10, offset: 0 }).works.map(w => w.id), ["b"]);
+  assert.equal(store.stats().version, 1);
+});
+
+test("changes are invisible until written, and a failed write leaves the gallery as it was", async t => {
+  const file = writeGallery(tempDir(t), [makeWork("a")]);
+  const store = createJsonStore(file);
+  const before = store.getWork("a");
+
+  // The temp file writeFileAtomic uses can't be created while a directory has its name
+  const tmp = `${file}.${process.pid}.tmp`;
+  fs.mkdirSync(tmp);
+  const hiding = store.setVisibility("a", false);
+  const adding = store.addWork(makeWork("b"));
+  assert.equal(store.getWork("a").visible, true);
+  assert.equal(store.getWork("b"), null);
+  await assert.rejects(hiding, /Failed to save gallery data/);
+  await assert.rejects(adding, /Failed to save gallery data/);
+
+  assert.equal(store.getWork("a"), before);
+  assert.equal(before.visible, true); // Work objects handed to readers are never modified
+  assert.equal(store.getWork("b"), null);
+  assert.equal(store.stats().version, 0);
+
+  fs.rmdirSync(tmp);
+  assert.equal(await store.setVisibility("a", false), true);
+  assert.equal(store.getWork("a").visible, false);
+  assert.equal(before.visible, true);
+});
+
+test("picks up changes another process wrote", async t => {
+  const file = writeGallery(tempDir(t), [makeWork("a")]);
+  const store = createJsonStore(file);
+  assert.equal(store.stats().works, 1);
+
+  const other = createJsonStore(file);
+  await other.addWork(makeWork("b"));
+  assert.deepEqual(store.allWorks().map(w => w.id), ["b", "a"]);
+
+  // A hand edit in place is seen too
+  fs.writeFileSync(file, JSON.stringify({ version: 7, works: [makeWork("c")] }));
+  assert.deepEqual(store.allWorks().map(w => w.id), ["c"]);
+  await store.removeWork("c");
+  assert.deepEqual(readGallery(file), { version: 8, works: [] });
+});
+
+test("leftover temp files of dead processes are removed on open", async t => {
+  const dir = tempDir(t);
+  const file = writeGallery(dir, []);
+  const dead = `${file}.999999999.tmp`;
+  const live = `${file}.${process.pid}.tmp`;
+  fs.writeFileSync(dead, "partial");
+  fs.writeFileSync(live, "in progress");
+  createJsonStore(file);
+  assert.equal(fs.existsSync(dead), false);
+  assert.equal(fs.existsSync(live), true);
+});
+
+/**
+ * Start time of a process as /proc has it, or null without /proc
+ */
+function startTime(pid) {
+  try {
+    const stat = fs.readFileSync(`/proc/${pid}/stat`, "utf-8");
+    return stat.slice(stat.lastIndexOf(")") + 2).split(" ")[19];
+  } catch {
+    return null;
+  }
+}
+
+test("the lock lets one holder in at a time, across processes too", async t => {
+  const dir = tempDir(t);
+  const lockFile = path.join(dir, "gallery.json.lock");
+  const counter = path.join(dir, "counter");
+  fs.writeFileSync(counter, "0");
+  let inside = 0;
+  // Read, yield, write: without the lock these lose increments
+  const increment = () => withFileLock(lockFile, async () => {
+    inside++;
+    assert.equal(inside, 1);
+    const value = Number(fs.readFileSync(counter, "utf-8"));
+    await new Promise(resolve => setTimeout(resolve, 1));
+    fs.writeFileSync(counter, String(value + 1));
+    inside--;
+  });
+  const module = fileURLToPath(new URL("../galleryJsonStore.js", import.meta.url));
+  const script = `
+    const { withFileLock } = await import(${JSON.stringify(module)});
+    const fs = await import("fs");
+    for (let i = 0; i < 20; i++) {
+      await withFileLock(${JSON.stringify(lockFile)}, async () => {
+        const value = Number(fs.readFileSync(${JSON.stringify(counter)}, "utf-8"));
+        await new Promise(resolve => setTimeout(resolve, 1));
+        fs.writeFileSync(${JSON.stringify(counter)}, String(value + 1));
+      });
+    }
+  `;
+  const run = promisify(execFile);
+  await Promise.all([
+    ...Array.from({ length: 20 }, increment),
+    ...Array.from({ length: 3 }, () => run(process.execPath, ["--input-type=module", "-e", script]))
+  ]);
+  assert.equal(fs.readFileSync(counter, "utf-8"), "80");
+  assert.deepEqual(fs.readdirSync(dir).sort(), ["counter"]);
+});
+
+test("a lock left by a dead process is taken over at once", async t => {
+  const lockFile = path.join(tempDir(t), "gallery.json.lock");
+  const { pid } = spawnSync(process.execPath, ["-e", ""]);
+  fs.writeFileSync(lockFile, `${pid} - deadbeef\n`);
+  const started = Date.now();
+  assert.equal(await withFileLock(lockFile, async () => "ran"), "ran");
+  assert.ok(Date.now() - started < 1000);
+  assert.equal(fs.existsSync(lockFile), false);
+});
+
+test("a lock whose pid was reused by another process is taken over at once", { skip: !startTime(process.pid) && "no /proc" }, async t => {
+  const lockFile = path.join(tempDir(t), "gallery.json.lock");
+  // Our own pid, but recorded with a start time that isn't ours: an earlier process's lock
+  fs.writeFileSync(lockFile, `${process.pid} 1 deadbeef\n`);
+  const started = Date.now();
+  await withFileLock(lockFile, async () => {});
+  assert.ok(Date.now() - started < 1000);
+});
+
+test("a live holder's lock is waited for, and an untouched one is broken", async t => {
+  const lockFile = path.join(tempDir(t), "gallery.json.lock");
+  let release;
+  const holding = withFileLock(lockFile, () => new Promise(resolve => { release = resolve; }));
+  await new Promise(resolve => setTimeout(resolve, 20));
+  let waited = false;
+  const waiting = withFileLock(lockFile, async () => { waited = true; });
+  await new Promise(resolve => setTimeout(resolve, 100));
+  assert.equal(waited, false);
+  release();
+  await Promise.all([holding, waiting]);
+  assert.equal(waited, true);
+
+  // Live pid and start time, but not touched for a minute: a stuck holder
+  fs.writeFileSync(lockFile, `${process.pid} ${startTime(process.pid) || "-"} deadbeef\n`);
+  const old = new Date(Date.now() - 60 * 1000);
+  fs.utimesSync(lockFile, old, old);
+  await withFileLock(lockFile, async () => {});
+});
+
+test("racing breakers of one stale lock still admit one holder at a time", async t => {
+  const lockFile = path.join(tempDir(t), "gallery.json.lock");
+  const { pid } = spawnSync(process.execPath, ["-e", ""]);
+  fs.writeFileSync(lockFile, `${pid} - deadbeef\n`);
+  let inside = 0;
+  let runs = 0;
+  await Promise.all(Array.from({ length: 10 }, () => withFileLock(lockFile, async () => {
+    inside++;
+    assert.equal(inside, 1);
+    await new Promise(resolve => setTimeout(resolve, 2));
+    inside--;
+    runs++;
+  })));
+  assert.equal(runs, 10);
+});
+
+test("a holder never removes a lock that is no longer its own", async t => {
+  const lockFile = path.join(tempDir(t), "gallery.json.lock");
+  await withFileLock(lockFile, async () => {
+    // Taken over meanwhile (as if we had stalled past LOCK_STALE_MS)
+    fs.writeFileSync(`${lockFile}.other`, `${process.pid} - cafebabe\n`);
+    fs.renameSync(`${lockFile}.other`, lockFile);
+  });
+  assert.equal(fs.readFileSync(lockFile, "utf-8"), `${process.pid} - cafebabe\n`);
+});
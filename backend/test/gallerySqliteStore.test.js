@@ -0,0 +1,88 @@
+/**
+ * SQLite gallery engine: import, queries and changes (skipped without a SQLite driver)
+ */
+
+import { test } from "node:test";
+import assert from "node:assert/strict";
+import { execFile } from "child_process";
+import path from "path";
+import { fileURLToPath } from "url";
+import { promisify } from "util";
+import { createSqliteStore } from "../gallerySqliteStore.js";
+import { tempDir, makeWork, writeGallery } from "./helpers.js";
+
+let driverError = null;
+try {
+  await import("node:sqlite");
+} catch {
+  try {
+    await import("better-sqlite3");
+  } catch (error) {
+    driverError = error;
+  }
+}
+const skip = driverError ? "no SQLite driver (node:sqlite or better-sqlite3) in this Node" : false;
+
+test("imports gallery.json once, keeping newest-first order", { skip }, async t => {
+  const dir = tempDir(t);
+  const jsonFile = writeGallery(dir, [makeWork("b"), makeWork("a")]);
+  const dbFile = path.join(dir, "gallery.db");
+
+  const store = await createSqliteStore(dbFile, jsonFile);
+  assert.deepEqual(store.listWorks({ limit: 10, offset: 0 }).works.map(w => w.id), ["b", "a"]);
+  assert.deepEqual(store.getWork("a"), makeWork("a"));
+
+  // A second open (another worker, a restart) must not import again
+  writeGallery(dir, [makeWork("c"), makeWork("b"), makeWork("a")]);
+  const again = await createSqliteStore(dbFile, jsonFile);
+  assert.equal(again.stats().works, 2);
+});
+
+test("publishes, hides and deletes works", { skip }, async t => {
+  const dir = tempDir(t);
+  const store = await createSqliteStore(path.join(dir, "gallery.db"), path.join(dir, "missing.json"));
+
+  store.addWork(makeWork("a"));
+  store.addWork(makeWork("b"));
+  assert.deepEqual(store.listWorks({ limit: 10, offset: 0 }).works.map(w => w.id), ["b", "a"]);
+  assert.deepEqual(store.listWorks({ limit: 1, offset: 1 }), { works: [makeWork("a")], total: 2 });
+
+  assert.equal(store.setVisibility("a", false), true);
+  assert.equal(store.setVisibility("nope", false), false);
+  assert.deepEqual(store.listWorks({ limit: 10, offset: 0 }).works.map(w => w.id), ["b"]);
+  assert.equal(store.listWorks({ limit: 10, offset: 0, includeHidden: true }).total, 2);
+  const { works, visibleWorks } = store.stats();
+  assert.deepEqual({ works, visibleWorks }, { works: 2, visibleWorks: 1 });
+
+  assert.deepEqual(store.removeWork("b"), makeWork("b"));
+  assert.equal(store.removeWork("b"), null);
+  assert.equal(store.getWork("b"), null);
+  assert.deepEqual(store.allWorks().map(w => w.id), ["a"]);
+});
+
+test("rejects a duplicate id without half-writing it", { skip }, async t => {
+  const dir = tempDir(t);
+  const store = await createSqliteStore(path.join(dir, "gallery.db"), path.join(dir, "missing.json"));
+  store.addWork(makeWork("a"));
+  assert.throws(() => store.addWork(makeWork("a", { title: "Again" })), /Failed to save gallery data/);
+  assert.equal(store.getWork("a").title, "Work a");
+  assert.equal(store.getWork("a").scenes.length, 2);
+});
+
+test("workers opening a new database together all start", { skip }, async t => {
+  const dir = tempDir(t);
+  const jsonFile = writeGallery(dir, [makeWork("a")]);
+  const dbFile = path.join(dir, "gallery.db");
+  const module = fileURLToPath(new URL("../gallerySqliteStore.js", import.meta.url));
+  const script = `
+    const { createSqliteStore } = await import(${JSON.stringify(module)});
+    const store = await createSqliteStore(${JSON.stringify(dbFile)}, ${JSON.stringify(jsonFile)});
+    store.addWork({ ...store.getWork("a"), id: String(process.pid) });
+  `;
+  const run = promisify(execFile);
+  await Promise.all(Array.from({ length: 6 }, () =>
+    run(process.execPath, [...process.execArgv, "--input-type=module", "-e", script])
+  ));
+  const store = await createSqliteStore(dbFile, jsonFile);
+  assert.equal(store.stats().works, 7); // Imported once, plus one work per process
+});
@@ -0,0 +1,53 @@
+/**
+ * Shared fixtures for the backend tests
+ */
+
+import fs from "fs";
+import os from "os";
+import path from "path";
+
+/**
+ * A fresh temporary directory, removed when the test finishes
+ * @param {Object} t - node:test context
+ * @returns {string} Directory path
+ */
+export function tempDir(t) {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), "storyboard-test-"));
+  t.after(() => fs.rmSync(dir, { recursive: true, force: true }));
+  return dir;
+}
+
+/**
+ * A gallery work shaped like publishToGallery makes them
+ * @param {string} id - Work ID
+ * @param {Object} overrides - Fields to replace
+ * @returns {Object} Work object
+ */
+export function makeWork(id, overrides = {}) {
+  return {
+    id,
+    user: { name: "Test User", initials: "TU", avatar: null },
+    title: `Work ${id}`,
+    description: "",
+    globalStyle: "watercolor",
+    mainCharacters: [{ name: "Luna", description: "a girl with a golden key" }],
+    scenes: [
+      { id: 1, title: "Start", caption: "It begins", imageUrl: `/images/${id}_scene_1.png`, originalUrl: null, aspectRatio: "square" },
+      { id: 2, title: "End", caption: "It ends", imageUrl: `/images/${id}_scene_2.png`, originalUrl: null, aspectRatio: "square" }
+    ],
+    createdAt: "2024-01-01T00:00:00.000Z",
+    visible: true,
+    featured: false,
+    ...overrides
+  };
+}
+
+/**
+ * Write a gallery.json holding these works (newest first, as the JSON engine keeps them)
+ * @returns {string} Path of the file
+ */
+export function writeGallery(dir, works) {
+  const file = path.join(dir, "gallery.json");
+  fs.writeFileSync(file, JSON.stringify({ works }));
+  return file;
+}
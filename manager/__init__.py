@@ -0,0 +1,5 @@
+"""
+Parts of the run.py server manager that also stand on their own: the frontend
+build, the reverse proxy, the log pump and log search, the load generator and
+the mock OpenAI server. run.py wires them into its commands.
+"""
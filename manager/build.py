@@ -0,0 +1,269 @@
+"""
+Frontend build: minify, content-hash and precompress frontend/ into frontend/dist
+('python run.py build'). The proxy serves the hashed names as immutable.
+"""
+
+import gzip
+import hashlib
+import json
+import re
+import shutil
+import subprocess
+import time
+
+from manager.config import FRONTEND_DIR, FRONTEND_DIST
+
+HASHED_ASSET_RE = re.compile(r'\.[0-9a-f]{10}\.(?:js|css)$')
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+COMPRESSIBLE_SUFFIXES = ('.html', '.css', '.js', '.json', '.svg', '.txt')
+
+
+def minify_css(source):
+    """Strip comments and insignificant whitespace from CSS, leaving strings untouched"""
+    out = []
+    i, n = 0, len(source)
+    pending_space = False
+    while i < n:
+        c = source[i]
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+            pending_space = True
+            continue
+        if c in '"\'':
+            j = i + 1
+            while j < n and source[j] != c:
+                j += 2 if source[j] == '\\' else 1
+            if pending_space and out and out[-1] not in '{};,>(':
+                out.append(' ')
+            pending_space = False
+            out.append(source[i:j + 1])
+            i = j + 1
+            continue
+        if c.isspace():
+            pending_space = True
+            i += 1
+            continue
+        if c in '{};,>)':
+            if c == '}' and out and out[-1] == ';':
+                out.pop()  # Last declaration in a block needs no semicolon
+            out.append(c)
+        else:
+            if pending_space and out and out[-1] not in '{};,>(:':
+                out.append(' ')
+            out.append(c)
+        pending_space = False
+        i += 1
+    return ''.join(out).strip()
+
+
+def _skip_js_string(source, i):
+    """Index just past the quoted string starting at source[i]"""
+    quote = source[i]
+    i += 1
+    while i < len(source) and source[i] != quote:
+        i += 2 if source[i] == '\\' else 1
+    return i + 1
+
+
+def _skip_js_regex(source, i):
+    """Index just past the regex literal starting at source[i] (including flags)"""
+    i += 1
+    in_class = False
+    while i < len(source):
+        c = source[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '[':
+            in_class = True
+        elif c == ']':
+            in_class = False
+        elif c == '/' and not in_class:
+            i += 1
+            break
+        i += 1
+    while i < len(source) and (source[i].isalnum() or source[i] == '_'):
+        i += 1
+    return i
+
+
+def _skip_js_template(source, i):
+    """Index just past the template literal starting at source[i], following ${} nesting"""
+    i += 1
+    while i < len(source):
+        c = source[i]
+        if c == '\\':
+            i += 2
+        elif c == '`':
+            return i + 1
+        elif source.startswith('${', i):
+            i = _scan_js_code(source, i + 2, None, stop_at_brace=True) + 1
+        else:
+            i += 1
+    return i
+
+
+def _scan_js_code(source, i, out, stop_at_brace=False):
+    """
+    Walk JavaScript code from i, appending minified text to out (when not None).
+    Returns the index where scanning stopped (the closing brace when stop_at_brace).
+    """
+    depth = 0
+    last_significant = ''
+    line_start = True
+    while i < len(source):
+        c = source[i]
+        if source.startswith('//', i):
+            end = source.find('\n', i)
+            i = len(source) if end == -1 else end
+            continue
+        if source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = len(source) if end == -1 else end + 2
+            continue
+        if c == '\n':
+            if out is not None and out and out[-1] != '\n':
+                while out and out[-1] == ' ':
+                    out.pop()
+                out.append('\n')
+            line_start = True
+            i += 1
+            continue
+        if c in ' \t\r':
+            if out is not None and not line_start and out and out[-1] not in ' \n':
+                out.append(' ')
+            i += 1
+            continue
+        line_start = False
+        if c in '"\'':
+            end = _skip_js_string(source, i)
+        elif c == '`':
+            end = _skip_js_template(source, i)
+        elif c == '/' and (not last_significant or last_significant in '(,=:[!&|?{};+-*%<>~^\n'):
+            end = _skip_js_regex(source, i)
+        elif c.isalnum() or c in '_$':
+            # A whole identifier/number/keyword at once, so the keyword check below sees it
+            end = i + 1
+            while end < len(source) and (source[end].isalnum() or source[end] in '_$'):
+                end += 1
+        else:
+            if c == '{':
+                depth += 1
+            elif c == '}':
+                if stop_at_brace and depth == 0:
+                    return i
+                depth -= 1
+            end = i + 1
+        if out is not None:
+            out.append(source[i:end])
+        last_significant = source[end - 1]
+        if c.isalnum() or c in '_$':
+            # Identifier/number/keyword: a following '/' is division unless the word is a keyword
+            word = source[i:end]
+            last_significant = '(' if word in ('return', 'typeof', 'case', 'do', 'else', 'in', 'of') else 'a'
+        i = end
+    return i
+
+
+def minify_js(source):
+    """
+    Conservative JS minifier: drops comments, indentation and blank lines but keeps
+    line breaks so automatic semicolon insertion behaves exactly as in the source.
+    """
+    out = []
+    _scan_js_code(source, 0, out)
+    return ''.join(out).strip() + '\n'
+
+
+def brotli_compress(data):
+    """Brotli-compress with the optional Python module, falling back to Node's zlib"""
+    try:
+        import brotli
+        return brotli.compress(data, quality=11)
+    except ImportError:
+        pass
+    script = (
+        "const zlib = require('zlib');"
+        "process.stdout.write(zlib.brotliCompressSync(require('fs').readFileSync(0),"
+        " {params: {[zlib.constants.BROTLI_PARAM_QUALITY]: 11}}));"
+    )
+    try:
+        result = subprocess.run(["node", "-e", script], input=data, capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout
+
+
+def write_precompressed(path, data):
+    """Write .gz and .br siblings next to a built file; returns the sizes written"""
+    sizes = {}
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    path.with_name(path.name + '.gz').write_bytes(gz)
+    sizes['gz'] = len(gz)
+    br = brotli_compress(data)
+    if br is not None:
+        path.with_name(path.name + '.br').write_bytes(br)
+        sizes['br'] = len(br)
+    return sizes
+
+
+def frontend_static_root():
+    """Serve the build output when there is one, otherwise the sources"""
+    if (FRONTEND_DIST / "index.html").exists():
+        manifest = FRONTEND_DIST / "manifest.json"
+        built_at = manifest.stat().st_mtime if manifest.exists() else 0
+        if any(p.stat().st_mtime > built_at for p in FRONTEND_DIR.iterdir() if p.is_file()):
+            print("⚠️  frontend/dist is older than frontend/ sources - run: python run.py build")
+        return FRONTEND_DIST
+    return FRONTEND_DIR
+
+
+def cmd_build(args=None):
+    """Minify, content-hash and precompress the frontend into frontend/dist"""
+    print("\n" + "="*50)
+    print("🏗️  Building frontend")
+    print("="*50 + "\n")
+    
+    started = time.monotonic()
+    staging = FRONTEND_DIST.with_name(FRONTEND_DIST.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    
+    manifest = {}
+    minifiers = {'.js': minify_js, '.css': minify_css}
+    sources = sorted(p for p in FRONTEND_DIR.iterdir() if p.is_file() and not p.name.startswith('.'))
+    for source in sources:
+        if source.suffix not in minifiers:
+            continue
+        original = source.read_text(encoding='utf-8')
+        minified = minifiers[source.suffix](original).encode('utf-8')
+        digest = hashlib.sha256(minified).hexdigest()[:10]
+        hashed_name = f"{source.stem}.{digest}{source.suffix}"
+        (staging / hashed_name).write_bytes(minified)
+        sizes = write_precompressed(staging / hashed_name, minified)
+        manifest[source.name] = hashed_name
+        compressed = ", ".join(f"{k} {v:,}" for k, v in sizes.items())
+        print(f"   {source.name:<12} → {hashed_name:<24} {len(original.encode()):>7,} → {len(minified):>7,} bytes ({compressed})")
+    
+    # Point the pages at the hashed names; everything else is copied as-is
+    asset_ref = re.compile(r'(\b(?:href|src)=")([^"]+)(")')
+    for source in sources:
+        if source.suffix in minifiers:
+            continue
+        data = source.read_bytes()
+        if source.suffix == '.html':
+            html = asset_ref.sub(lambda m: m.group(1) + manifest.get(m.group(2), m.group(2)) + m.group(3),
+                                 data.decode('utf-8'))
+            data = html.encode('utf-8')
+        (staging / source.name).write_bytes(data)
+        if source.suffix in COMPRESSIBLE_SUFFIXES:
+            write_precompressed(staging / source.name, data)
+    
+    (staging / "manifest.json").write_text(json.dumps(manifest, indent=2) + "\n")
+    shutil.rmtree(FRONTEND_DIST, ignore_errors=True)
+    staging.rename(FRONTEND_DIST)
+    
+    print(f"\n✅ Built {len(manifest)} assets into {FRONTEND_DIST} in {time.monotonic() - started:.2f}s")
+    print("="*50 + "\n")
+
@@ -0,0 +1,29 @@
+"""Paths, ports and timeouts shared by run.py and the manager modules"""
+
+import os
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+BACKEND_DIR = PROJECT_ROOT / "backend"
+FRONTEND_DIR = PROJECT_ROOT / "frontend"
+FRONTEND_DIST = FRONTEND_DIR / "dist"
+IMAGES_DIR = BACKEND_DIR / "data" / "images"
+PID_FILE = PROJECT_ROOT / ".server_pids"
+SUPERVISOR_STATE_FILE = PROJECT_ROOT / ".supervisor_state.json"
+UPSTREAMS_FILE = PROJECT_ROOT / ".proxy_upstreams.json"
+CONTROL_SOCKET = PROJECT_ROOT / ".run.sock"
+DEPENDENCY_FILES = ("package.json", "package-lock.json")
+DEPENDENCY_STAMP = BACKEND_DIR / "node_modules" / ".run-deps-hash"
+LOG_FILE = PROJECT_ROOT / "backend.log"
+LOG_FIFO = PROJECT_ROOT / ".backend.log.fifo"
+FRONTEND_LOG_FILE = PROJECT_ROOT / "frontend.log"
+MOCK_OPENAI_LOG_FILE = PROJECT_ROOT / "mock-openai.log"
+
+BACKEND_PORT = 3001
+FRONTEND_PORT = 8080
+MOCK_OPENAI_PORT = 8090
+
+# How long to wait for a server to become ready before giving up (seconds)
+STARTUP_TIMEOUT = float(os.environ.get("STARTUP_TIMEOUT", "15"))
+READY_POLL_INTERVAL = 0.05
+SHUTDOWN_GRACE = float(os.environ.get("SHUTDOWN_GRACE", "60"))
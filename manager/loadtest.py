@@ -0,0 +1,482 @@
+"""
+Load generator ('python run.py loadtest'): closed- or open-loop gallery, detail,
+publish and storyboard requests over keep-alive connections, with latencies
+kept in HDR-style histograms
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import sys
+import time
+import urllib.parse
+
+from manager.config import FRONTEND_DIR, MOCK_OPENAI_PORT
+from manager.proxy import PROXY_CONNECT_TIMEOUT, body_framing, header_value, read_http_head, relay_body
+
+SAMPLE_STORY_FILE = FRONTEND_DIR / "sample-story.txt"
+SAMPLE_STORY_RE = re.compile(
+    r'^Story \d+: .*?\((\d+) scenes recommended\)\n-+\n(.+?)\n\nStyle suggestions: "([^"]+)"',
+    re.M | re.S,
+)
+LOADTEST_OPERATIONS = ('gallery', 'detail', 'publish', 'storyboard')
+# Read-only by default: publish writes to the gallery and storyboard spends OpenAI credits
+LOADTEST_DEFAULT_MIX = "gallery=80,detail=20"
+LOADTEST_TIMEOUT = 60.0
+LOADTEST_IMAGE_PROBES = 5  # Gallery images tried as the publish payload's source
+LOADTEST_PERCENTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p99.9', 0.999))
+HISTOGRAM_SUB_BUCKET_BITS = 7  # Exact below 128us, then 64 sub-buckets per power of two
+HISTOGRAM_TABLE_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+
+def parse_mix(value):
+    """'gallery=80,detail=20' -> {'gallery': 80.0, 'detail': 20.0}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in LOADTEST_OPERATIONS:
+            raise argparse.ArgumentTypeError(
+                f"unknown operation {name!r} (choose from {', '.join(LOADTEST_OPERATIONS)})")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad weight for {name}: {weight!r}")
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs at least one positive weight")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def sample_stories():
+    """Storyboard payloads from frontend/sample-story.txt"""
+    return [
+        {"story": " ".join(story.split()), "numScenes": int(scenes), "style": style}
+        for scenes, story, style in SAMPLE_STORY_RE.findall(SAMPLE_STORY_FILE.read_text())
+    ]
+
+
+class LatencyHistogram:
+    """
+    HDR-style latency histogram in microseconds: log-linear buckets keep every
+    value within 1.6% in constant memory, however many requests are recorded.
+    """
+    
+    def __init__(self):
+        self.counts = {}  # Bucket lower bound (us) -> count
+        self.total = 0
+        self.max = 0
+    
+    @staticmethod
+    def bucket_bounds(value):
+        shift = max(0, value.bit_length() - HISTOGRAM_SUB_BUCKET_BITS)
+        lower = value >> shift << shift
+        return lower, lower + (1 << shift) - 1
+    
+    def record(self, seconds):
+        value = max(0, int(seconds * 1_000_000))
+        lower, _ = self.bucket_bounds(value)
+        self.counts[lower] = self.counts.get(lower, 0) + 1
+        self.total += 1
+        self.max = max(self.max, value)
+    
+    def merge(self, other):
+        for lower, count in other.counts.items():
+            self.counts[lower] = self.counts.get(lower, 0) + count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+    
+    def percentile(self, fraction):
+        """Milliseconds within which `fraction` of the recorded requests finished, or None"""
+        if not self.total:
+            return None
+        rank = max(1, math.ceil(fraction * self.total))
+        seen = 0
+        for lower in sorted(self.counts):
+            seen += self.counts[lower]
+            if seen >= rank:
+                return min(self.bucket_bounds(lower)[1], self.max) / 1000
+    
+    def table(self):
+        """Counts per display bucket: [(upper bound ms or None for the overflow row, count)]"""
+        rows = [[bound, 0] for bound in HISTOGRAM_TABLE_BOUNDS_MS] + [[None, 0]]
+        for lower, count in self.counts.items():
+            row = next((row for row in rows[:-1] if lower < row[0] * 1000), rows[-1])
+            row[1] += count
+        return [tuple(row) for row in rows]
+
+
+class OperationStats:
+    """Outcome of one operation type: latencies of successes, errors by kind"""
+    
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.ok = 0
+        self.errors = {}
+    
+    def record(self, seconds, error=None):
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        else:
+            self.ok += 1
+            self.histogram.record(seconds)
+    
+    def summary(self, elapsed):
+        failed = sum(self.errors.values())
+        latency = {name: self.histogram.percentile(fraction) for name, fraction in LOADTEST_PERCENTILES}
+        latency["max"] = self.histogram.max / 1000 if self.histogram.total else None
+        return {
+            "requests": self.ok + failed,
+            "ok": self.ok,
+            "failed": failed,
+            "errors": dict(sorted(self.errors.items(), key=lambda item: -item[1])),
+            "throughput": round(self.ok / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": latency,
+            "histogram_us": {str(lower): count for lower, count in sorted(self.histogram.counts.items())},
+        }
+
+
+class BodySink:
+    """Write target for relay_body that keeps the bytes"""
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data):
+        self.chunks.append(data)
+    
+    async def drain(self):
+        pass
+    
+    def getvalue(self):
+        return b"".join(self.chunks)
+
+
+class LoadConnection:
+    """One keep-alive HTTP/1.1 connection to the server under test"""
+    
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+    
+    async def request(self, method, path, body=None):
+        """Send one request and read the whole response; returns (status, body bytes)"""
+        reused = self.writer is not None
+        if not reused:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        if body is not None:
+            lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + (body or b""))
+        try:
+            await self.writer.drain()
+            response = await read_http_head(self.reader)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            response = None
+        if response is None:
+            self.close()
+            if reused and method == 'GET':
+                # The server closed the idle connection as we reused it; safe to send again
+                return await self.request(method, path, body)
+            raise ConnectionResetError("connection closed before a response")
+        start_line, headers = response
+        status = int(start_line.split()[1])
+        framing = body_framing(headers, method, status)
+        sink = BodySink()
+        await relay_body(framing, self.reader, sink, decode_chunks=True)
+        if framing[0] == 'eof' or (header_value(headers, 'connection') or '').lower() == 'close':
+            self.close()
+        return status, sink.getvalue()
+    
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def describe_load_error(error):
+    """Error-breakdown key for a failed request"""
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    if isinstance(error, ConnectionRefusedError):
+        return "connection refused"
+    if isinstance(error, (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError)):
+        return "connection reset"
+    return type(error).__name__
+
+
+def http_error(status, body):
+    """Error-breakdown key for an error response, with the backend's error code when it sent one"""
+    try:
+        code = json.loads(body).get("error")
+    except (ValueError, AttributeError):
+        code = None
+    return f"HTTP {status} {code}" if isinstance(code, str) else f"HTTP {status}"
+
+
+class LoadTest:
+    """
+    One load-test run. Closed loop: `concurrency` users each send their next request
+    as soon as the previous one is answered. Open loop: requests arrive at `rate`
+    per second (Poisson) whether or not earlier ones finished, sharing `concurrency`
+    connections; latency counts from the scheduled arrival, so time spent queueing
+    for a connection is not hidden (no coordinated omission).
+    """
+    
+    def __init__(self, args):
+        target = urllib.parse.urlsplit(args.target if '//' in args.target else f"http://{args.target}")
+        self.host = target.hostname or '127.0.0.1'
+        self.port = target.port or 80
+        self.base_url = f"http://{self.host}:{self.port}"
+        self.args = args
+        self.names = list(args.mix)
+        self.weights = list(args.mix.values())
+        self.stats = {name: OperationStats() for name in self.names}
+        self.stories = sample_stories() if 'storyboard' in args.mix else []
+        self.work_ids = []
+        self.image_url = None
+        self.published = []
+        self.elapsed = 0.0
+    
+    async def prepare(self):
+        """Gallery ids for detail requests and an image URL for publish payloads"""
+        if not {'detail', 'publish'} & set(self.names):
+            return
+        connection = LoadConnection(self.host, self.port)
+        try:
+            status, body = await connection.request("GET", "/api/gallery?limit=50")
+        finally:
+            connection.close()
+        if status != 200:
+            raise RuntimeError(f"GET /api/gallery returned {http_error(status, body)}")
+        works = json.loads(body)["works"]
+        self.work_ids = [work["id"] for work in works]
+        if 'detail' in self.names and not self.work_ids:
+            raise RuntimeError("the gallery is empty - 'detail' needs published works (drop it from --mix)")
+        if 'publish' in self.names:
+            self.image_url = await self.find_publish_image(works)
+            if not self.image_url:
+                if len(self.names) == 1:
+                    raise RuntimeError("no image to publish - the gallery's images are missing and the "
+                                       "mock OpenAI server is not running (start with --mock-openai)")
+                print("⚠️  No image to publish (gallery images missing, mock OpenAI server not running) "
+                      "- leaving 'publish' out of the mix", file=sys.stderr)
+                index = self.names.index('publish')
+                del self.names[index], self.weights[index]
+                del self.stats['publish']
+    
+    async def find_publish_image(self, works):
+        """
+        A URL the backend can really download for publish payloads, checked with HEAD
+        (a broken one would only measure the failed-download path): one of the
+        gallery's own images, else one from the mock OpenAI server
+        """
+        candidates = []
+        for work in works:
+            for scene in work.get("scenes", []):
+                if scene.get("imageUrl") and scene["imageUrl"] not in candidates:
+                    candidates.append(scene["imageUrl"])
+        probes = [(self.host, self.port, path) for path in candidates[:LOADTEST_IMAGE_PROBES]]
+        probes.append(('127.0.0.1', MOCK_OPENAI_PORT, "/images/512x512/4a7bd0/1.png"))
+        for host, port, path in probes:
+            connection = LoadConnection(host, port)
+            try:
+                status, _ = await asyncio.wait_for(connection.request("HEAD", path), PROXY_CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                continue
+            finally:
+                connection.close()
+            if status == 200:
+                return f"http://{host}:{port}{path}"
+        return None
+    
+    def build_request(self, name):
+        """(method, path, body) for one operation"""
+        if name == 'gallery':
+            return "GET", "/api/gallery?limit=20", None
+        if name == 'detail':
+            return "GET", f"/api/gallery/{random.choice(self.work_ids)}", None
+        if name == 'storyboard':
+            return "POST", "/api/storyboard", json.dumps(random.choice(self.stories)).encode()
+        payload = {
+            "userName": "loadtest",
+            "title": "Load test",
+            "description": "Published by run.py loadtest",
+            "scenes": [{"id": 1, "title": "Scene 1", "image_url": self.image_url}],
+        }
+        return "POST", "/api/gallery/publish", json.dumps(payload).encode()
+    
+    async def execute(self, connection, started):
+        """Run one operation; latency counts from `started`"""
+        name = random.choices(self.names, self.weights)[0]
+        method, path, body = self.build_request(name)
+        try:
+            status, payload = await asyncio.wait_for(connection.request(method, path, body), self.args.timeout)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            connection.close()
+            self.stats[name].record(0, describe_load_error(e))
+            return
+        if status >= 400:
+            self.stats[name].record(0, http_error(status, payload))
+            return
+        self.stats[name].record(time.monotonic() - started)
+        if name == 'publish':
+            try:
+                self.published.append(json.loads(payload)["work"]["id"])
+            except (ValueError, KeyError, TypeError):
+                pass
+    
+    async def closed_loop(self, deadline):
+        async def user():
+            connection = LoadConnection(self.host, self.port)
+            try:
+                while time.monotonic() < deadline:
+                    await self.execute(connection, time.monotonic())
+            finally:
+                connection.close()
+        await asyncio.gather(*(user() for _ in range(self.args.concurrency)))
+    
+    async def open_loop(self, deadline):
+        pool = asyncio.Queue()
+        for _ in range(self.args.concurrency):
+            pool.put_nowait(LoadConnection(self.host, self.port))
+        
+        async def arrival(scheduled):
+            connection = await pool.get()
+            try:
+                await self.execute(connection, scheduled)
+            finally:
+                pool.put_nowait(connection)
+        
+        tasks = set()
+        next_arrival = time.monotonic()
+        while next_arrival < deadline:
+            delay = next_arrival - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(arrival(next_arrival))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_arrival += random.expovariate(self.args.rate)
+        if tasks:
+            await asyncio.gather(*tasks)
+        while not pool.empty():
+            pool.get_nowait().close()
+    
+    async def cleanup(self):
+        """Delete what the publish operations added to the gallery"""
+        connection = LoadConnection(self.host, self.port)
+        try:
+            for work_id in self.published:
+                await connection.request("DELETE", f"/api/gallery/{work_id}")
+        except OSError as e:
+            print(f"⚠️  Could not delete every published test work: {e}")
+        finally:
+            connection.close()
+    
+    async def run(self):
+        await self.prepare()
+        started = time.monotonic()
+        deadline = started + self.args.duration
+        if self.args.rate:
+            await self.open_loop(deadline)
+        else:
+            await self.closed_loop(deadline)
+        self.elapsed = time.monotonic() - started
+        if self.published and not self.args.keep:
+            await self.cleanup()
+    
+    def results(self):
+        total = OperationStats()
+        for stats in self.stats.values():
+            total.histogram.merge(stats.histogram)
+            total.ok += stats.ok
+            for error, count in stats.errors.items():
+                total.errors[error] = total.errors.get(error, 0) + count
+        return {
+            "target": self.base_url,
+            "mode": "open" if self.args.rate else "closed",
+            "concurrency": self.args.concurrency,
+            "rate": self.args.rate,
+            "duration": self.args.duration,
+            "elapsed": round(self.elapsed, 2),
+            "mix": dict(zip(self.names, self.weights)),
+            "operations": {name: stats.summary(self.elapsed) for name, stats in self.stats.items()},
+            "total": total.summary(self.elapsed),
+            "histogram": total.histogram.table(),
+            "published_kept": len(self.published) if self.args.keep else 0,
+        }
+
+
+def format_latency(value):
+    """Milliseconds as '12.3ms' or '1.23s'; '-' for None"""
+    if value is None:
+        return "-"
+    return f"{value:.1f}ms" if value < 1000 else f"{value / 1000:.2f}s"
+
+
+def print_loadtest(results):
+    """Terminal tables for `loadtest`"""
+    print("\n" + "="*50)
+    print("🔥 Load Test Results")
+    print("="*50 + "\n")
+    if results["mode"] == "open":
+        shape = f"open loop, {results['rate']:g} req/s arrivals over {results['concurrency']} connections"
+    else:
+        shape = f"closed loop, {results['concurrency']} concurrent users"
+    print(f"Target: {results['target']}  ({shape}, {results['elapsed']:.1f}s)\n")
+    
+    columns = [name for name, _ in LOADTEST_PERCENTILES] + ["max"]
+    print(f"{'OPERATION':<12}{'REQS':>7}{'OK':>7}{'FAIL':>6}{'REQ/S':>8}" + "".join(f"{c.upper():>9}" for c in columns))
+    rows = list(results["operations"].items())
+    if len(rows) > 1:
+        rows.append(("all", results["total"]))
+    for name, row in rows:
+        print(f"{name:<12}{row['requests']:>7}{row['ok']:>7}{row['failed']:>6}{row['throughput']:>8.1f}"
+              + "".join(f"{format_latency(row['latency_ms'][c]):>9}" for c in columns))
+    
+    errors = [(name, error, n) for name, row in results["operations"].items() for error, n in row["errors"].items()]
+    if errors:
+        print(f"\n{'ERRORS':<12}{'KIND':<32}{'COUNT':>6}{'SHARE':>8}")
+        for name, error, n in errors:
+            share = n / results["operations"][name]["requests"] * 100
+            print(f"{name:<12}{error:<32}{n:>6}{share:>7.1f}%")
+    
+    counts = [count for _, count in results["histogram"]]
+    if any(counts):
+        print(f"\n{'LATENCY':<12}{'COUNT':>7}")
+        peak = max(counts)
+        for bound, count in results["histogram"]:
+            if count:
+                label = f"≤ {format_latency(bound)}" if bound else f"> {format_latency(HISTOGRAM_TABLE_BOUNDS_MS[-1])}"
+                print(f"{label:<12}{count:>7}  {'█' * max(1, round(30 * count / peak))}")
+    if results["published_kept"]:
+        print(f"\nℹ️  Kept {results['published_kept']} published test works in the gallery (--keep)")
+    print("\n" + "="*50 + "\n")
+
+
+def cmd_loadtest(args):
+    """Load the running servers with a mix of gallery/publish/storyboard requests"""
+    if 'storyboard' in args.mix and not args.json:
+        print("⚠️  The mix includes storyboard requests - each one calls the OpenAI API")
+    if not args.json:
+        print(f"🔥 Load testing {args.target} for {args.duration:g}s...")
+    test = LoadTest(args)
+    try:
+        asyncio.run(test.run())
+    except (RuntimeError, OSError) as e:
+        print(f"❌ Load test could not start: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Load test interrupted")
+        sys.exit(130)
+    results = test.results()
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_loadtest(results)
+
@@ -0,0 +1,399 @@
+"""
+Backend logs: the log pump that copies worker output into a rotating, gzipped
+backend.log without ever blocking the workers ('python run.py logpump'), and
+reading it back, live (follow_log) or searched across rotated segments
+"""
+
+import argparse
+import gzip
+import mmap
+import os
+import re
+import select
+import shutil
+import signal
+import stat
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from manager.config import LOG_FIFO, LOG_FILE
+
+LOG_MAX_BYTES = int(float(os.environ.get("LOG_MAX_MB", "10")) * 1024 * 1024)
+LOG_MAX_AGE = float(os.environ.get("LOG_MAX_AGE_HOURS", "24")) * 3600
+LOG_RETENTION_BYTES = int(float(os.environ.get("LOG_RETENTION_MB", "100")) * 1024 * 1024)
+LOG_READ_SIZE = 64 * 1024  # One pipe buffer per read
+LOG_BUFFER_LIMIT = 8 * 1024 * 1024  # Output held in memory while the disk catches up
+LOG_TAIL_BYTES = 256 * 1024
+BACKEND_FAILURE_LOG_LINES = 40
+
+
+class LogPump:
+    """
+    Copies backend output from LOG_FIFO into LOG_FILE without ever blocking the
+    writers: a reader thread drains the FIFO into memory (dropping, and saying so,
+    if the disk falls too far behind) and a writer thread appends to the log,
+    rotating by size and age. Rotated segments are gzipped in the background and
+    the oldest are deleted to stay within the retention budget.
+    """
+    
+    def __init__(self, path=LOG_FILE, fifo=LOG_FIFO):
+        self.path = Path(path)
+        self.fifo = Path(fifo)
+        self.chunks = deque()
+        self.buffered = 0
+        self.dropped = 0
+        self.closing = False
+        self.reader_done = False
+        self.at_line_start = True
+        self.wakeup = threading.Condition()
+        self.compressor = ThreadPoolExecutor(max_workers=1)
+        self.threads = []
+    
+    def start(self):
+        """Create the FIFO and start pumping"""
+        if self.fifo.exists() and not stat.S_ISFIFO(self.fifo.stat().st_mode):
+            self.fifo.unlink()
+        if not self.fifo.exists():
+            os.mkfifo(self.fifo, 0o600)
+        # Opened read-write: holding a writer ourselves means no EOF between worker generations
+        self.fd = os.open(self.fifo, os.O_RDWR | os.O_NONBLOCK)
+        for leftover in self.segments(compressed=False):
+            self.compressor.submit(self.compress, leftover)
+        self.threads = [
+            threading.Thread(target=self.read_loop, name="log-reader", daemon=True),
+            threading.Thread(target=self.write_loop, name="log-writer", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+    
+    def stop(self):
+        """Drain what the FIFO still holds, flush it to disk and wait for compression"""
+        self.closing = True
+        with self.wakeup:
+            self.wakeup.notify()
+        for thread in self.threads:
+            thread.join()
+        os.close(self.fd)
+        self.fifo.unlink(missing_ok=True)
+        self.compressor.shutdown(wait=True)
+    
+    def read_loop(self):
+        poller = select.poll()
+        poller.register(self.fd, select.POLLIN)
+        while True:
+            ready = poller.poll(200)
+            try:
+                data = os.read(self.fd, LOG_READ_SIZE) if ready or self.closing else None
+            except BlockingIOError:
+                data = b''
+            if not data:
+                if self.closing:
+                    break
+                continue
+            with self.wakeup:
+                if self.buffered + len(data) > LOG_BUFFER_LIMIT:
+                    self.dropped += data.count(b'\n') or 1
+                    continue
+                self.chunks.append((time.time(), data))
+                self.buffered += len(data)
+                self.wakeup.notify()
+        with self.wakeup:
+            self.reader_done = True  # Tell the writer nothing more is coming
+            self.wakeup.notify()
+    
+    def write_loop(self):
+        log = open(self.path, 'ab')
+        opened_at = time.monotonic()
+        while True:
+            with self.wakeup:
+                while not self.chunks and not self.reader_done:
+                    self.wakeup.wait(timeout=1.0)
+                    if not self.chunks and self.rotation_due(log, opened_at, 0):
+                        break
+                chunks = list(self.chunks)
+                self.chunks.clear()
+                self.buffered = 0
+                dropped, self.dropped = self.dropped, 0
+                finished = self.reader_done
+            if dropped:
+                chunks.insert(0, (time.time(), f"[warn] Log pump fell behind - dropped {dropped} lines\n".encode()))
+            data = b''.join(self.stamp(received_at, chunk) for received_at, chunk in chunks)
+            if self.rotation_due(log, opened_at, 0):
+                log = self.rotate(log)
+                opened_at = time.monotonic()
+            while log.tell() + len(data) > LOG_MAX_BYTES:
+                # Fill the segment up to the last whole line that fits; lines never straddle segments
+                cut = data.rfind(b'\n', 0, LOG_MAX_BYTES - log.tell()) + 1
+                if not cut and log.tell() == 0:
+                    cut = data.find(b'\n') + 1 or len(data)  # A single line longer than a segment
+                log.write(data[:cut])
+                data = data[cut:]
+                log = self.rotate(log)
+                opened_at = time.monotonic()
+            log.write(data)
+            log.flush()
+            if finished:
+                break
+        log.close()
+    
+    def stamp(self, received_at, data):
+        """Put the arrival time in front of every line that starts in this chunk"""
+        prefix = (time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(received_at))
+                  + f".{int(received_at * 1000) % 1000:03d} ").encode()
+        out = bytearray()
+        lines = data.split(b'\n')
+        for i, line in enumerate(lines):
+            last = i == len(lines) - 1
+            if last and not line:
+                break  # The chunk ended with a complete line
+            if self.at_line_start:
+                out += prefix
+            out += line
+            if not last:
+                out += b'\n'
+            self.at_line_start = not last
+        return bytes(out)
+    
+    def rotation_due(self, log, opened_at, incoming):
+        size = log.tell()
+        return size > 0 and (size + incoming > LOG_MAX_BYTES or time.monotonic() - opened_at > LOG_MAX_AGE)
+    
+    def rotate(self, log):
+        """Move the current log aside as a timestamped segment and start a fresh one"""
+        log.close()
+        segment = self.path.with_name(f"{self.path.name}.{time.strftime('%Y%m%d-%H%M%S')}")
+        n = 1
+        while segment.exists() or segment.with_name(segment.name + ".gz").exists():
+            segment = self.path.with_name(f"{self.path.name}.{time.strftime('%Y%m%d-%H%M%S')}-{n:02d}")
+            n += 1
+        self.path.rename(segment)
+        self.compressor.submit(self.compress, segment)
+        return open(self.path, 'ab')
+    
+    def segments(self, compressed=True):
+        """Rotated segments, oldest first"""
+        return [p for p in log_segments(self.path) if p.name.endswith('.gz') == compressed]
+    
+    def compress(self, segment):
+        gz = segment.with_name(segment.name + ".gz")
+        tmp = gz.with_name(gz.name + ".tmp")
+        with open(segment, 'rb') as src, gzip.open(tmp, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        tmp.replace(gz)
+        segment.unlink()
+        self.enforce_retention()
+    
+    def enforce_retention(self):
+        segments = self.segments()
+        total = sum(p.stat().st_size for p in segments)
+        while segments and total > LOG_RETENTION_BYTES:
+            oldest = segments.pop(0)
+            total -= oldest.stat().st_size
+            oldest.unlink()
+
+
+# ".20260131-101000", then "-01", "-02"... for more rotations within that second
+SEGMENT_SUFFIX_RE = re.compile(r'\.(?P<stamp>\d{8}-\d{6})(?:-(?P<n>\d+))?(?:\.gz)?')
+
+
+def log_segments(path=LOG_FILE):
+    """Rotated segments of a log (gzipped or still waiting for compression), oldest first"""
+    path = Path(path)
+    segments = []
+    for p in path.parent.glob(f"{path.name}.*"):
+        match = SEGMENT_SUFFIX_RE.fullmatch(p.name[len(path.name):])
+        if match:
+            segments.append(((match['stamp'], int(match['n'] or 0)), p))
+    # By the rotation time in the name: mtimes change when a segment is gzipped, which can
+    # happen after a newer one was already rotated (e.g. leftovers compressed at startup)
+    return [p for _, p in sorted(segments)]
+
+
+def open_log_writer():
+    """Where backend output goes: the log pump's FIFO, or the log file itself without a pump"""
+    try:
+        # Non-blocking open fails (ENXIO) instead of hanging when nothing reads the FIFO
+        fd = os.open(LOG_FIFO, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError:
+        return open(LOG_FILE, 'ab')
+    os.set_blocking(fd, True)
+    return os.fdopen(fd, 'wb')
+
+
+def read_log_tail(max_lines=None, path=LOG_FILE):
+    """The end of the current backend log as text"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(max(0, f.seek(0, os.SEEK_END) - LOG_TAIL_BYTES))
+            tail = f.read().decode('utf-8', 'replace')
+    except OSError:
+        return ""
+    if max_lines:
+        tail = "".join(tail.splitlines(keepends=True)[-max_lines:])
+    return tail
+
+
+def follow_log(path, initial_lines=10):
+    """Yield lines from a log as they are written (tail -F), reopening it after each rotation"""
+    f = open(path, 'rb')
+    f.seek(max(0, f.seek(0, os.SEEK_END) - LOG_TAIL_BYTES))
+    lines = f.read().split(b'\n')
+    partial_line = lines.pop()
+    for line in lines[-initial_lines:]:
+        yield line.decode('utf-8', 'replace') + '\n'
+    while True:
+        data = f.read()
+        if data:
+            lines = (partial_line + data).split(b'\n')
+            partial_line = lines.pop()
+            for line in lines:
+                yield line.decode('utf-8', 'replace') + '\n'
+            continue
+        try:
+            current = os.stat(path)
+        except FileNotFoundError:
+            time.sleep(0.2)
+            continue
+        if current.st_ino != os.fstat(f.fileno()).st_ino:
+            # Rotated: everything in the old segment has been read, continue with the new file
+            f.close()
+            f = open(path, 'rb')
+        elif current.st_size < f.tell():
+            f.seek(0)  # Truncated
+        else:
+            time.sleep(0.2)
+
+
+LOG_RECORD_RE = re.compile(
+    r'^(?:(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d{3}) )?'
+    r'(?:\[w(?P<worker>\d+)\] )?'
+    r'(?:\[r:(?P<request>[\w-]+)(?:/(?P<stage>[\w-]+))?\] )?'
+    r'(?:\[(?P<level>warn|error)\] )?'
+    r'(?P<message>.*)$'
+)
+LOG_LEVELS = ('info', 'warn', 'error')
+LOG_SEARCH_LIMIT = 500
+REQUEST_SEARCH_WINDOW = 3600  # How far past a request's earliest line to keep looking for more
+
+
+def log_timestamp(epoch):
+    """Epoch seconds in the pump's timestamp format (which sorts as text)"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(epoch)) + f".{int(epoch * 1000) % 1000:03d}"
+
+
+def parse_time_arg(value):
+    """--since/--until: '15m', '2h', '1d', '2026-01-31 14:00', '14:00' -> log timestamp"""
+    relative = re.fullmatch(r'(\d+(?:\.\d+)?)([smhd])', value.strip())
+    if relative:
+        seconds = float(relative.group(1)) * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[relative.group(2)]
+        return log_timestamp(time.time() - seconds)
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d', '%H:%M:%S', '%H:%M'):
+        try:
+            parsed = time.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+        if fmt.startswith('%H'):
+            return time.strftime('%Y-%m-%d ') + time.strftime('%H:%M:%S', parsed) + '.000'
+        return time.strftime('%Y-%m-%d %H:%M:%S', parsed) + '.000'
+    raise argparse.ArgumentTypeError(f"can't read time {value!r} (use e.g. 15m, 2h, 14:30 or 2026-01-31 14:30)")
+
+
+def parse_log_record(line):
+    """Split a log line into time, worker, request id, stage, level and message"""
+    record = LOG_RECORD_RE.match(line).groupdict()
+    if not record['level']:
+        # console.log lines are untagged; the repo's emoji conventions tell the rest
+        message = record['message']
+        record['level'] = 'error' if '❌' in message else 'warn' if '⚠️' in message else 'info'
+    return record
+
+
+def record_matches(record, args):
+    """Whether a parsed line passes the `logs` filters"""
+    if args.worker and record['worker'] != str(args.worker):
+        return False
+    if args.request and record['request'] != args.request:
+        return False
+    if args.stage and record['stage'] != args.stage:
+        return False
+    if args.level and LOG_LEVELS.index(record['level']) < LOG_LEVELS.index(args.level):
+        return False
+    if args.since and (record['time'] is None or record['time'] < args.since):
+        return False
+    if args.until and (record['time'] is None or record['time'] > args.until):
+        return False
+    return not args.grep or args.grep.search(record['message'])
+
+
+def reverse_lines(segment):
+    """
+    Lines of a log segment, newest first. Plain files are memory-mapped and scanned
+    backwards, so only the tail that is actually needed gets paged in; gzipped
+    segments (at most LOG_MAX_MB each) are decompressed in memory.
+    """
+    if segment.name.endswith('.gz'):
+        with gzip.open(segment, 'rb') as f:
+            data = f.read()
+        view = None
+    else:
+        with open(segment, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            data = view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        end = len(data)
+        if data[end - 1:end] == b'\n':
+            end -= 1
+        while end > 0:
+            start = data.rfind(b'\n', 0, end) + 1
+            yield data[start:end].decode('utf-8', 'replace')
+            end = start - 1
+    finally:
+        if view is not None:
+            view.close()
+
+
+def search_logs(args, path=LOG_FILE):
+    """Matching records, newest segments first, stopping as soon as older lines can't match"""
+    path = Path(path)
+    matches = []
+    request_floor = None
+    segments = [path] + list(reversed(log_segments(path)))
+    for segment in segments:
+        try:
+            last_write = log_timestamp(segment.stat().st_mtime)
+        except FileNotFoundError:
+            continue  # Compressed or pruned while we were scanning
+        if args.since and last_write < args.since:
+            break
+        for line in reverse_lines(segment):
+            record = parse_log_record(line)
+            stamp = record['time']
+            if stamp and args.since and stamp < args.since:
+                return matches[::-1]
+            if stamp and request_floor and stamp < request_floor:
+                return matches[::-1]
+            if record_matches(record, args):
+                matches.append(line)
+                if len(matches) >= args.limit:
+                    return matches[::-1]
+                if args.request and stamp:
+                    earliest = time.mktime(time.strptime(stamp[:19], '%Y-%m-%d %H:%M:%S'))
+                    request_floor = log_timestamp(earliest - REQUEST_SEARCH_WINDOW)
+    return matches[::-1]
+
+
+def cmd_logpump(args):
+    """Run the log pump in the foreground until SIGTERM (started by 'start')"""
+    pump = LogPump()
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    pump.start()
+    stop.wait()
+    pump.stop()
+
@@ -0,0 +1,312 @@
+"""
+Offline OpenAI stand-in ('python run.py mock-openai'): chat completions that
+plan scenes from the story in the prompt and DALL-E-style image URLs served
+as generated PNGs, with configurable latency and failure rates
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import signal
+import struct
+import sys
+import time
+import zlib
+from collections import OrderedDict
+
+from manager.loadtest import BodySink
+from manager.proxy import body_framing, header_value, read_http_head, relay_body, send_response
+
+MOCK_CHAT_LATENCY = "lognormal:2,0.4"    # Median 2s, like a gpt-4o-mini scene plan
+MOCK_IMAGE_LATENCY = "lognormal:6,0.3"   # Median 6s, like a DALL-E 3 image
+MOCK_IMAGE_CACHE = 32                    # Rendered PNGs kept in memory
+MOCK_SCENES_RE = re.compile(r'Create exactly (\d+) scenes')
+MOCK_STYLE_RE = re.compile(r'Preferred style: "([^"]*)"')
+MOCK_STORY_RE = re.compile(r'Story:\n"""\n(.*?)\n"""', re.S)
+MOCK_IMAGE_PATH_RE = re.compile(r'^/images/(\d+)x(\d+)/([0-9a-f]{6})/\d+\.png$')
+# (status, code, type, message) in OpenAI's error shape
+MOCK_ERRORS = {
+    'rate_limit': (429, "rate_limit_exceeded", "requests",
+                   "Rate limit reached for requests (mock). Please try again in 1s."),
+    'server_error': (500, "server_error", "server_error",
+                     "The server had an error while processing your request (mock)."),
+    'content_filter': (400, "content_policy_violation", "invalid_request_error",
+                       "Your request was rejected as a result of our safety system (mock)."),
+}
+
+
+class LatencyDistribution:
+    """Mock response delay: fixed:S, uniform:MIN,MAX, normal:MEAN,SD or lognormal:MEDIAN,SIGMA (seconds)"""
+    
+    SHAPES = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2}
+    
+    def __init__(self, spec):
+        kind, _, params = spec.partition(':')
+        try:
+            values = [float(value) for value in params.split(',')] if params else []
+        except ValueError:
+            values = None
+        if kind not in self.SHAPES or values is None or len(values) != self.SHAPES[kind] or min(values) < 0:
+            raise argparse.ArgumentTypeError(
+                f"bad latency {spec!r} (use fixed:S, uniform:MIN,MAX, normal:MEAN,SD or lognormal:MEDIAN,SIGMA)")
+        if kind == 'lognormal' and values[0] == 0:
+            raise argparse.ArgumentTypeError("lognormal median must be above 0")
+        self.kind = kind
+        self.values = values
+        self.spec = spec
+    
+    def sample(self, rng):
+        if self.kind == 'fixed':
+            return self.values[0]
+        if self.kind == 'uniform':
+            return rng.uniform(*self.values)
+        if self.kind == 'normal':
+            return max(0.0, rng.gauss(*self.values))
+        median, sigma = self.values
+        return rng.lognormvariate(math.log(median), sigma)
+    
+    def __str__(self):
+        return self.spec
+
+
+def render_png(width, height, rgb):
+    """A vertical gradient PNG, built with zlib alone (no imaging library needed)"""
+    raw = bytearray()
+    for y in range(height):
+        shade = y / max(1, height - 1) * 0.6
+        pixel = bytes(round(c + (255 - c) * shade) for c in rgb)
+        raw += b'\x00' + pixel * width  # Filter type 0 per scanline
+    
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)  # 8-bit RGB
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(bytes(raw), 6)) + chunk(b'IEND', b'')
+
+
+def mock_scene_plan(prompt, rng):
+    """A scene plan in the exact shape planScenes asks GPT for"""
+    match = MOCK_SCENES_RE.search(prompt)
+    count = int(match.group(1)) if match else 8
+    match = MOCK_STYLE_RE.search(prompt)
+    style = (match.group(1) if match else "") or "soft watercolor storybook illustration"
+    match = MOCK_STORY_RE.search(prompt)
+    words = re.findall(r"[A-Za-z']+", match.group(1)) if match else []
+    names = [word for word in words if word[0].isupper() and len(word) > 3] or ["Luna"]
+    hero = rng.choice(names)
+    character = (f"{hero}, about 12 years old, slim build, warm brown skin, round face with freckles, "
+                 f"curly black hair, green cloak over a cream tunic, carries a small brass lantern")
+    scenes = []
+    for scene_id in range(1, count + 1):
+        place = rng.choice(["a misty forest", "a quiet village square", "a windswept hilltop",
+                            "a candlelit attic", "a river crossing", "an ancient stone gate"])
+        light = rng.choice(["warm sunset light", "cold moonlight", "soft morning haze", "golden lantern glow"])
+        scenes.append({
+            "id": scene_id,
+            "title": f"{hero} reaches {place.split(' ', 1)[1]}",
+            "short_caption": f"{hero} pauses in {place} as the journey continues.",
+            "dalle_prompt": f"{character} stands in {place} under {light}. Wide shot, calm mood, "
+                            f"rendered as {style}.",
+            "aspect_ratio": "landscape" if scene_id % 4 == 0 else "square",
+        })
+    return {
+        "global_style": style,
+        "main_characters": [{"name": hero, "description": character}],
+        "scenes": scenes,
+    }
+
+
+class MockOpenAI:
+    """
+    Offline stand-in for the two OpenAI endpoints the backend uses. Responses are
+    delayed by the configured latency distributions and can fail at configured
+    rates with 429s, 500s or content-policy rejections, in OpenAI's error format.
+    Generated image URLs point back at this server.
+    """
+    
+    def __init__(self, args):
+        self.chat_latency = args.chat_latency
+        self.image_latency = args.image_latency
+        self.failure_rates = {
+            'rate_limit': args.rate_limit_rate,
+            'server_error': args.error_rate,
+            'content_filter': args.content_filter_rate,
+        }
+        self.rng = random.Random(args.seed)
+        self.images = OrderedDict()  # (width, height, rgb) -> PNG bytes
+        self.counter = 0
+    
+    def injected_failure(self, kinds):
+        """Pick a failure for this request, if any, according to the configured rates"""
+        roll = self.rng.random()
+        for kind in kinds:
+            roll -= self.failure_rates[kind]
+            if roll < 0:
+                return kind
+        return None
+    
+    async def send_json(self, writer, status, payload, keep_alive, headers=()):
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests",
+                  500: "Internal Server Error"}[status]
+        body = json.dumps(payload).encode()
+        await send_response(writer, status, reason, body, [("Content-Type", "application/json"), *headers], keep_alive)
+    
+    async def send_failure(self, writer, kind, keep_alive):
+        status, code, error_type, message = MOCK_ERRORS[kind]
+        headers = [("Retry-After", "1")] if status == 429 else []
+        error = {"message": message, "type": error_type, "param": None, "code": code}
+        await self.send_json(writer, status, {"error": error}, keep_alive, headers)
+        return status
+    
+    async def chat_completion(self, request, writer, keep_alive):
+        failure = self.injected_failure(['rate_limit', 'server_error'])
+        if failure == 'rate_limit':
+            return await self.send_failure(writer, failure, keep_alive)
+        await asyncio.sleep(self.chat_latency.sample(self.rng))
+        if failure:
+            return await self.send_failure(writer, failure, keep_alive)
+        prompt = "".join(
+            message.get("content") or "" for message in request.get("messages", []) if isinstance(message, dict)
+        )
+        content = json.dumps(mock_scene_plan(prompt, self.rng))
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+        self.counter += 1
+        await self.send_json(writer, 200, {
+            "id": f"chatcmpl-mock{self.counter}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }, keep_alive)
+        return 200
+    
+    async def image_generation(self, request, headers, writer, keep_alive):
+        failure = self.injected_failure(['rate_limit', 'server_error', 'content_filter'])
+        if failure == 'rate_limit':
+            return await self.send_failure(writer, failure, keep_alive)
+        latency = self.image_latency.sample(self.rng)
+        # Safety rejections come back well before an image would
+        await asyncio.sleep(latency / 5 if failure == 'content_filter' else latency)
+        if failure:
+            return await self.send_failure(writer, failure, keep_alive)
+        width, _, height = str(request.get("size", "1024x1024")).partition('x')
+        if not (width.isdigit() and height.isdigit()) or not (0 < int(width) <= 4096 and 0 < int(height) <= 4096):
+            width, height = "1024", "1024"
+        color = hashlib.md5(str(request.get("prompt", "")).encode()).hexdigest()[:6]
+        self.counter += 1
+        host = header_value(headers, 'host') or "127.0.0.1"
+        await self.send_json(writer, 200, {
+            "created": int(time.time()),
+            "data": [{
+                "url": f"http://{host}/images/{width}x{height}/{color}/{self.counter}.png",
+                "revised_prompt": request.get("prompt", ""),
+            }],
+        }, keep_alive)
+        return 200
+    
+    async def serve_image(self, path, writer, keep_alive, head=False):
+        match = MOCK_IMAGE_PATH_RE.match(path)
+        if not match:
+            error = {"message": "Unknown image", "type": "invalid_request_error", "param": None, "code": None}
+            await self.send_json(writer, 404, {"error": error}, keep_alive)
+            return 404
+        width, height = int(match.group(1)), int(match.group(2))
+        key = (width, height, match.group(3))
+        png = self.images.get(key)
+        if png is None:
+            rgb = bytes.fromhex(match.group(3))
+            png = await asyncio.get_running_loop().run_in_executor(None, render_png, width, height, rgb)
+            self.images[key] = png
+            if len(self.images) > MOCK_IMAGE_CACHE:
+                self.images.popitem(last=False)
+        else:
+            self.images.move_to_end(key)
+        if head:
+            headers = [("Content-Type", "image/png"), ("Content-Length", len(png))]
+            await send_response(writer, 200, "OK", headers=headers, keep_alive=keep_alive, bodyless=True)
+        else:
+            await send_response(writer, 200, "OK", png, [("Content-Type", "image/png")], keep_alive)
+        return 200
+    
+    async def dispatch(self, method, path, headers, body, writer, keep_alive):
+        if method in ('GET', 'HEAD') and path.startswith('/images/'):
+            return await self.serve_image(path, writer, keep_alive, head=method == 'HEAD')
+        route = (method, path.rstrip('/'))
+        if route not in (('POST', '/v1/chat/completions'), ('POST', '/v1/images/generations')):
+            error = {"message": f"Unknown request URL: {method} {path} (mock)",
+                     "type": "invalid_request_error", "param": None, "code": "unknown_url"}
+            await self.send_json(writer, 404, {"error": error}, keep_alive)
+            return 404
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            error = {"message": f"Invalid JSON body: {e}", "type": "invalid_request_error", "param": None, "code": None}
+            await self.send_json(writer, 400, {"error": error}, keep_alive)
+            return 400
+        if route[1] == '/v1/chat/completions':
+            return await self.chat_completion(request, writer, keep_alive)
+        return await self.image_generation(request, headers, writer, keep_alive)
+    
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                head = await read_http_head(reader)
+                if head is None:
+                    break
+                start_line, headers = head
+                method, target, _ = start_line.split(' ', 2)
+                body = BodySink()
+                await relay_body(body_framing(headers), reader, body, decode_chunks=True)
+                keep_alive = (header_value(headers, 'connection') or '').lower() != 'close'
+                started = time.monotonic()
+                path = target.split('?', 1)[0]
+                status = await self.dispatch(method, path, headers, body.getvalue(), writer, keep_alive)
+                print(f"[{time.strftime('%H:%M:%S')}] {method} {path} {status} {time.monotonic() - started:.2f}s", flush=True)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def serve(self, port):
+        """Listen on localhost until SIGTERM/SIGINT"""
+        server = await asyncio.start_server(self.handle_client, '127.0.0.1', port, reuse_address=True)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        rates = ", ".join(f"{kind.replace('_', ' ')} {rate:.0%}" for kind, rate in self.failure_rates.items() if rate)
+        print(f"🧪 Mock OpenAI listening on http://127.0.0.1:{port}/v1", flush=True)
+        print(f"   Latency: chat {self.chat_latency}, images {self.image_latency}", flush=True)
+        print(f"   Injected failures: {rates or 'none'}", flush=True)
+        async with server:
+            await stop.wait()
+
+
+def cmd_mock_openai(args):
+    """Run the mock OpenAI server in the foreground"""
+    for name in ('rate_limit_rate', 'error_rate', 'content_filter_rate'):
+        if not 0 <= getattr(args, name) <= 1:
+            print(f"❌ --{name.replace('_', '-')} must be between 0 and 1")
+            sys.exit(1)
+    if args.rate_limit_rate + args.error_rate + args.content_filter_rate > 1:
+        print("❌ The failure rates add up to more than 1")
+        sys.exit(1)
+    asyncio.run(MockOpenAI(args).serve(args.port))
+
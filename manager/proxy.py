@@ -0,0 +1,693 @@
+"""
+Frontend proxy: serves frontend/ (and optionally the gallery images) from an
+in-memory cache and forwards /api to the backend workers, least-connections
+balanced, over pooled keep-alive connections ('python run.py proxy' / 'static')
+"""
+
+import asyncio
+import hashlib
+import json
+import mimetypes
+import os
+import signal
+import time
+import urllib.parse
+from collections import OrderedDict, deque
+from email.utils import formatdate
+from pathlib import Path
+
+from manager.build import COMPRESSIBLE_SUFFIXES, HASHED_ASSET_RE, IMMUTABLE_CACHE_CONTROL
+from manager.config import READY_POLL_INTERVAL, SHUTDOWN_GRACE, UPSTREAMS_FILE
+
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'trailers', 'transfer-encoding', 'upgrade', 'expect',
+}
+PROXIED_PREFIXES = ('/api', '/images')
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+PROXY_CONNECT_TIMEOUT = 2.0
+PROXY_CLIENT_IDLE_TIMEOUT = 15.0
+UPSTREAM_POOL_IDLE = 4.0  # Below Node's default 5s keepAliveTimeout so pooled sockets aren't stale
+UPSTREAM_POOL_SIZE = 32
+HEALTH_CHECK_INTERVAL = 2.0
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def header_value(headers, name):
+    """Case-insensitive lookup of the first header with this name"""
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+async def read_http_head(reader):
+    """
+    Read a request or response head.
+    Returns (start_line, [(name, value), ...]), or None if the peer closed cleanly first.
+    """
+    try:
+        data = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise
+    lines = data[:-4].decode('latin-1').split("\r\n")
+    headers = []
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers.append((name.strip(), value.strip()))
+    return lines[0], headers
+
+
+def body_framing(headers, method=None, status=None):
+    """
+    Work out how a message body is delimited: ('none', 0), ('length', n),
+    ('chunked', None), or ('eof', None) for responses that end on close.
+    """
+    if method == 'HEAD' or status in (204, 304) or (status is not None and status < 200):
+        return ('none', 0)
+    transfer_encoding = header_value(headers, 'transfer-encoding')
+    if transfer_encoding and 'chunked' in transfer_encoding.lower():
+        return ('chunked', None)
+    content_length = header_value(headers, 'content-length')
+    if content_length is not None:
+        return ('length', int(content_length))
+    if status is None:
+        return ('none', 0)
+    return ('eof', None)
+
+
+async def copy_exact(reader, writer, remaining):
+    """Stream exactly `remaining` bytes from reader to writer"""
+    while remaining > 0:
+        data = await reader.read(min(remaining, COPY_CHUNK_SIZE))
+        if not data:
+            raise asyncio.IncompleteReadError(b'', remaining)
+        writer.write(data)
+        remaining -= len(data)
+        await writer.drain()
+
+
+async def copy_chunked(reader, writer, decode=False):
+    """Relay a chunked body as chunks arrive; decode=True strips the chunk framing"""
+    while True:
+        size_line = await reader.readuntil(b"\r\n")
+        size = int(size_line.split(b";")[0].strip(), 16)
+        if not decode:
+            writer.write(size_line)
+        if size == 0:
+            # Trailer section ends with an empty line
+            while True:
+                line = await reader.readuntil(b"\r\n")
+                if not decode:
+                    writer.write(line)
+                if line == b"\r\n":
+                    break
+            await writer.drain()
+            return
+        if decode:
+            await copy_exact(reader, writer, size)
+            await reader.readexactly(2)
+        else:
+            await copy_exact(reader, writer, size + 2)
+
+
+async def relay_body(framing, reader, writer, decode_chunks=False):
+    """Stream a message body without buffering it"""
+    kind, length = framing
+    if kind == 'length':
+        await copy_exact(reader, writer, length)
+    elif kind == 'chunked':
+        await copy_chunked(reader, writer, decode=decode_chunks)
+    elif kind == 'eof':
+        while data := await reader.read(COPY_CHUNK_SIZE):
+            writer.write(data)
+            await writer.drain()
+
+
+async def send_response(writer, status, reason, body=b"", headers=(), keep_alive=True, bodyless=False):
+    """Write a complete, small response (bodyless=True for 304s, which carry no Content-Length)"""
+    lines = [f"HTTP/1.1 {status} {reason}"]
+    lines += [f"{name}: {value}" for name, value in headers]
+    if not bodyless:
+        lines.append(f"Content-Length: {len(body)}")
+    lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+
+async def send_error(writer, status, reason, message, keep_alive=True):
+    """Write a JSON error in the same shape the backend uses"""
+    body = json.dumps({"error": reason.upper().replace(' ', '_'), "message": message}).encode()
+    await send_response(writer, status, reason, body, [("Content-Type", "application/json")], keep_alive)
+
+
+STATIC_CACHE_MAX_FILE = 256 * 1024       # Files up to this size are kept in memory
+STATIC_CACHE_BUDGET = 32 * 1024 * 1024   # Total bytes of file bodies held in memory
+STATIC_ENTRY_LIMIT = 4096                # Metadata entries (etag etc.) kept for large files
+PRECOMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def file_digest(path):
+    """Strong ETag value: content hash of the file"""
+    digest = hashlib.blake2b(digest_size=12)
+    with open(path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def accepted_encodings(headers):
+    """Content codings the client accepts (ignoring q=0 exclusions)"""
+    accepted = set()
+    for item in (header_value(headers, 'accept-encoding') or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if coding and params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def parse_range(range_header, size):
+    """
+    Parse a single 'bytes=' range against a body of `size` bytes.
+    Returns (start, end) inclusive, None to ignore the header, or 'unsatisfiable'.
+    """
+    unit, _, spec = range_header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None  # Multipart ranges are answered with the full body
+    first, _, last = spec.strip().partition('-')
+    try:
+        if not first:
+            length = int(last)
+            if length == 0:
+                return 'unsatisfiable'
+            return (max(0, size - length), size - 1)
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return 'unsatisfiable'
+    return (start, min(end, size - 1))
+
+
+class StaticEntry:
+    """What we know about one file on disk, valid while its mtime and size are unchanged"""
+    
+    __slots__ = ('path', 'mtime_ns', 'size', 'etag', 'body', 'last_modified', 'missing_variants')
+    
+    def __init__(self, path, stat, etag, body):
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.etag = etag
+        self.body = body
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.missing_variants = set()  # Codings with no .br/.gz sibling, as of this version
+
+
+def load_static_entry(path):
+    """Read a file into a StaticEntry (body kept only if small); None if it vanished. Blocking."""
+    try:
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size <= STATIC_CACHE_MAX_FILE:
+                body = f.read()
+                etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+            else:
+                body = None
+                etag = file_digest(path)
+    except OSError:
+        return None
+    return StaticEntry(path, stat, f'"{etag}"', body)
+
+
+class StaticFiles:
+    """
+    Static file engine: small files are served from an in-memory cache invalidated
+    by mtime, large ones go out with zero-copy sendfile. Supports strong ETags,
+    conditional requests, single byte ranges and precompressed .br/.gz siblings.
+    """
+    
+    def __init__(self, root):
+        self.root = Path(root).resolve()
+        self.entries = OrderedDict()  # LRU of path -> StaticEntry
+        self.cached_bytes = 0
+        self.resolved = {}  # URL path -> file, for paths that resolved to one
+    
+    def resolve(self, path):
+        """Map a URL path to a file under the root, refusing traversal"""
+        candidate = (self.root / urllib.parse.unquote(path).lstrip('/')).resolve()
+        if candidate != self.root and self.root not in candidate.parents:
+            return None
+        if candidate.is_dir():
+            candidate = candidate / "index.html"
+        return candidate if candidate.is_file() else None
+    
+    def _evict(self, key):
+        entry = self.entries.pop(key, None)
+        if entry and entry.body is not None:
+            self.cached_bytes -= len(entry.body)
+    
+    async def entry_for(self, path):
+        """Return a fresh StaticEntry for path, or None if it vanished"""
+        key = str(path)
+        entry = self.entries.get(key)
+        if entry:
+            # Its inode was stat'ed recently, so this is a cheap cache-hot check
+            try:
+                stat = os.stat(path)
+            except OSError:
+                self._evict(key)
+                return None
+            if entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                self.entries.move_to_end(key)
+                return entry
+        
+        # Opening, reading and hashing a cold file can take a while; keep it off the event loop
+        entry = await asyncio.get_running_loop().run_in_executor(None, load_static_entry, path)
+        self._evict(key)  # Stale, or loaded by another request meanwhile
+        if entry is None:
+            return None
+        self.entries[key] = entry
+        if entry.body is not None:
+            self.cached_bytes += len(entry.body)
+        while self.entries and (self.cached_bytes > STATIC_CACHE_BUDGET or len(self.entries) > STATIC_ENTRY_LIMIT):
+            self._evict(next(iter(self.entries)))
+        return entry
+    
+    async def select_variant(self, path, entry, headers):
+        """
+        Pick a precompressed sibling the client accepts; returns (entry, coding or None).
+        A missing sibling is remembered on the file's entry, so unbuilt sources cost no
+        lookups until the file changes ('run.py build' replaces them all).
+        """
+        accepted = accepted_encodings(headers)
+        for coding, suffix in PRECOMPRESSED_VARIANTS:
+            if coding not in accepted or coding in entry.missing_variants:
+                continue
+            variant = await self.entry_for(path.with_name(path.name + suffix))
+            if variant is None:
+                entry.missing_variants.add(coding)
+            elif variant.mtime_ns >= entry.mtime_ns:
+                return variant, coding
+        return entry, None
+    
+    async def serve(self, method, path, headers, writer):
+        """Answer a GET/HEAD for a URL path under this root; returns client keep-alive"""
+        if method not in ('GET', 'HEAD'):
+            await send_error(writer, 405, "Method Not Allowed", f"{method} is not supported here")
+            return True
+        file_path = self.resolved.get(path)
+        if file_path is None:
+            # Resolving walks (and stats) the path; a cold lookup shouldn't stall the loop
+            file_path = await asyncio.get_running_loop().run_in_executor(None, self.resolve, path)
+            if file_path and len(self.resolved) < STATIC_ENTRY_LIMIT:
+                self.resolved[path] = file_path
+        entry = await self.entry_for(file_path) if file_path else None
+        if entry is None:
+            self.resolved.pop(path, None)
+            await send_error(writer, 404, "Not Found", f"{path} not found")
+            return True
+        
+        has_variants = file_path.suffix in COMPRESSIBLE_SUFFIXES
+        entry, coding = await self.select_variant(file_path, entry, headers)
+        etag = entry.etag
+        # Content-hashed build output never changes under the same name
+        cache_control = IMMUTABLE_CACHE_CONTROL if HASHED_ASSET_RE.search(file_path.name) else "no-cache"
+        response_headers = [
+            ("Content-Type", mimetypes.guess_type(file_path.name)[0] or 'application/octet-stream'),
+            ("ETag", etag),
+            ("Last-Modified", entry.last_modified),
+            ("Cache-Control", cache_control),
+            ("Accept-Ranges", "bytes"),
+        ]
+        if coding:
+            response_headers.append(("Content-Encoding", coding))
+        if has_variants:
+            response_headers.append(("Vary", "Accept-Encoding"))
+        
+        if_none_match = header_value(headers, 'if-none-match')
+        if if_none_match and (if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]):
+            await send_response(writer, 304, "Not Modified", headers=response_headers, bodyless=True)
+            return True
+        
+        status, reason = 200, "OK"
+        start, end = 0, entry.size - 1
+        range_header = header_value(headers, 'range')
+        if_range = header_value(headers, 'if-range')
+        if range_header and (if_range is None or if_range.strip() == etag):
+            byte_range = parse_range(range_header, entry.size)
+            if byte_range == 'unsatisfiable':
+                await send_response(writer, 416, "Range Not Satisfiable",
+                                    headers=[("Content-Range", f"bytes */{entry.size}")])
+                return True
+            if byte_range:
+                start, end = byte_range
+                status, reason = 206, "Partial Content"
+                response_headers.append(("Content-Range", f"bytes {start}-{end}/{entry.size}"))
+        
+        length = end - start + 1
+        lines = [f"HTTP/1.1 {status} {reason}"]
+        lines += [f"{name}: {value}" for name, value in response_headers]
+        lines.append(f"Content-Length: {length}")
+        lines.append("Connection: keep-alive")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+        if method == 'HEAD' or length <= 0:
+            await writer.drain()
+        elif entry.body is not None:
+            writer.write(entry.body[start:end + 1])
+            await writer.drain()
+        else:
+            # Large file: hand the kernel the file descriptor instead of copying through Python
+            await writer.drain()
+            with open(entry.path, 'rb') as f:
+                await asyncio.get_running_loop().sendfile(writer.transport, f, start, length)
+        return True
+
+
+def write_upstreams(ports, path=None):
+    """Record the live backend worker ports (read by the proxy on start and SIGHUP)"""
+    path = Path(path or UPSTREAMS_FILE)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"ports": list(ports)}))
+    tmp.replace(path)
+
+
+def read_upstreams(path=None):
+    """Live backend worker ports; raises OSError/ValueError if the file is missing or bad"""
+    return [int(port) for port in json.loads(Path(path or UPSTREAMS_FILE).read_text())["ports"]]
+
+
+class Upstream:
+    """One backend worker port: keep-alive connection pool, in-flight count and health"""
+    
+    def __init__(self, port):
+        self.port = port
+        self.active = 0
+        self.healthy = True
+        self.draining = False
+        self.idle = deque()
+    
+    async def connect(self):
+        """Reuse a pooled keep-alive connection or open a new one; returns (reader, writer, reused)"""
+        now = time.monotonic()
+        while self.idle:
+            reader, writer, idle_since = self.idle.pop()
+            if now - idle_since < UPSTREAM_POOL_IDLE and not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection('127.0.0.1', self.port), PROXY_CONNECT_TIMEOUT
+        )
+        return reader, writer, False
+    
+    def release(self, reader, writer, reusable):
+        """Return a connection to the pool, or close it"""
+        if (reusable and self.healthy and not self.draining
+                and len(self.idle) < UPSTREAM_POOL_SIZE and not writer.is_closing()):
+            self.idle.append((reader, writer, time.monotonic()))
+        else:
+            writer.close()
+    
+    def close_idle(self):
+        """Drop every pooled connection"""
+        while self.idle:
+            self.idle.pop()[1].close()
+    
+    def set_healthy(self, healthy):
+        """Record a health transition; ejected workers lose their pooled connections"""
+        if healthy == self.healthy:
+            return
+        self.healthy = healthy
+        if healthy:
+            print(f"✅ Upstream :{self.port} is healthy again", flush=True)
+        else:
+            print(f"⚠️  Upstream :{self.port} ejected (failed health check)", flush=True)
+            self.close_idle()
+
+
+class ReverseProxy:
+    """
+    Public entry point: serves the frontend/ tree (and gallery images, when mounted)
+    directly and forwards API traffic to the least-loaded healthy backend worker.
+    """
+    
+    def __init__(self, upstream_ports, static_root, images_root=None, upstreams_file=None):
+        self.upstreams_file = upstreams_file
+        if upstreams_file:
+            upstream_ports = read_upstreams(upstreams_file)
+        self.upstreams = [Upstream(port) for port in upstream_ports]
+        self.draining = []  # Workers removed by a reload that still have requests in flight
+        self.static = StaticFiles(static_root)
+        self.images = StaticFiles(images_root) if images_root else None
+        self._rotation = 0
+        self.in_flight = 0            # Client requests being served right now
+        self.stopping = False
+    
+    def reload_upstreams(self):
+        """SIGHUP: switch to the port list in the upstreams file; removed workers drain"""
+        try:
+            ports = read_upstreams(self.upstreams_file)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not reload upstreams: {e}", flush=True)
+            return
+        current = {u.port: u for u in self.upstreams}
+        self.upstreams = [current.pop(port, None) or Upstream(port) for port in ports]
+        for upstream in current.values():
+            upstream.draining = True
+            upstream.close_idle()
+            self.draining.append(upstream)
+        upstream_list = ", ".join(f":{u.port}" for u in self.upstreams)
+        retired = ", ".join(f":{u.port}" for u in current.values()) or "none"
+        print(f"🔁 Upstreams switched to {upstream_list} (draining: {retired})", flush=True)
+    
+    def status(self):
+        """Snapshot for GET /__proxy/status"""
+        def describe(u):
+            return {"port": u.port, "active": u.active, "healthy": u.healthy, "pooled": len(u.idle)}
+        return {
+            "pid": os.getpid(),
+            "upstreams": [describe(u) for u in self.upstreams],
+            "draining": [describe(u) for u in self.draining],
+        }
+    
+    def pick_upstream(self, exclude=()):
+        """Least-connections choice; the starting point rotates so ties spread evenly"""
+        candidates = [u for u in self.upstreams if u.healthy and u not in exclude]
+        if not candidates:
+            return None
+        self._rotation = (self._rotation + 1) % len(candidates)
+        rotated = candidates[self._rotation:] + candidates[:self._rotation]
+        return min(rotated, key=lambda u: u.active)
+    
+    async def handle_client(self, reader, writer):
+        """Serve requests on one client connection until it closes or idles out"""
+        peer = (writer.get_extra_info('peername') or ('unknown',))[0]
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(read_http_head(reader), PROXY_CLIENT_IDLE_TIMEOUT)
+                except asyncio.LimitOverrunError:
+                    await send_error(writer, 431, "Request Header Fields Too Large", "Headers too large", False)
+                    break
+                if head is None:
+                    break
+                start_line, headers = head
+                try:
+                    method, target, version = start_line.split(' ', 2)
+                except ValueError:
+                    await send_error(writer, 400, "Bad Request", "Malformed request line", False)
+                    break
+                connection = (header_value(headers, 'connection') or '').lower()
+                keep_alive = version == 'HTTP/1.1' and 'close' not in connection and not self.stopping
+                
+                path = target.split('?', 1)[0]
+                self.in_flight += 1
+                try:
+                    if path == '/__proxy/status' and peer in LOOPBACK_ADDRESSES:
+                        body = json.dumps(self.status()).encode()
+                        await send_response(writer, 200, "OK", body, [("Content-Type", "application/json")], keep_alive)
+                        served = True
+                    elif self.images and path.startswith('/images/'):
+                        served = await self.images.serve(method, path[len('/images'):], headers, writer)
+                    elif self.upstreams and path.startswith(PROXIED_PREFIXES):
+                        served = await self.forward(method, target, version, headers, peer, reader, writer)
+                    else:
+                        served = await self.static.serve(method, path, headers, writer)
+                finally:
+                    self.in_flight -= 1
+                keep_alive = served and keep_alive
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            pass  # Aborted at the end of a shutdown drain
+        finally:
+            writer.close()
+    
+    def upstream_request_head(self, method, target, headers, peer):
+        """Rebuild the request head for the upstream hop"""
+        lines = [f"{method} {target} HTTP/1.1"]
+        forwarded_for = peer
+        for name, value in headers:
+            lowered = name.lower()
+            if lowered == 'x-forwarded-for':
+                forwarded_for = f"{value}, {peer}"
+            elif lowered not in HOP_BY_HOP_HEADERS:
+                lines.append(f"{name}: {value}")
+        if body_framing(headers)[0] == 'chunked':
+            lines.append("Transfer-Encoding: chunked")
+        lines.append(f"X-Forwarded-For: {forwarded_for}")
+        lines.append("Connection: keep-alive")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1')
+    
+    async def forward(self, method, target, version, headers, peer, client_reader, client_writer):
+        """
+        Proxy one request, streaming both bodies.
+        Returns whether the client connection can be kept open.
+        """
+        request_framing = body_framing(headers)
+        has_body = request_framing[0] != 'none'
+        request_head = self.upstream_request_head(method, target, headers, peer)
+        if has_body and (header_value(headers, 'expect') or '').lower() == '100-continue':
+            client_writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        
+        tried = set()
+        while True:
+            upstream = self.pick_upstream(exclude=tried)
+            if upstream is None:
+                await send_error(client_writer, 502, "Bad Gateway", "No healthy backend available", not has_body)
+                return not has_body
+            tried.add(upstream)
+            try:
+                reader, writer, reused = await upstream.connect()
+            except (OSError, asyncio.TimeoutError):
+                upstream.set_healthy(False)
+                continue
+            
+            upstream.active += 1
+            try:
+                writer.write(request_head)
+                await relay_body(request_framing, client_reader, writer)
+                await writer.drain()
+                response = await read_http_head(reader)
+                while response and response[0].split(' ', 2)[1] == '100':
+                    response = await read_http_head(reader)
+            except (OSError, asyncio.IncompleteReadError):
+                response = None
+            if response is None:
+                upstream.active -= 1
+                writer.close()
+                if reused and not has_body:
+                    # A pooled connection went stale under us; safe to retry a body-less request
+                    tried.discard(upstream)
+                    continue
+                await send_error(client_writer, 502, "Bad Gateway", "Backend closed the connection", False)
+                return False
+            
+            try:
+                return await self.relay_response(method, version, response, upstream, reader, writer, client_writer)
+            finally:
+                upstream.active -= 1
+    
+    async def relay_response(self, method, version, response, upstream, reader, writer, client_writer):
+        """Stream an upstream response back to the client; returns client keep-alive"""
+        status_line, headers = response
+        status = int(status_line.split(' ', 2)[1])
+        framing = body_framing(headers, method=method, status=status)
+        upstream_connection = (header_value(headers, 'connection') or '').lower()
+        reusable = framing[0] != 'eof' and 'close' not in upstream_connection
+        # HTTP/1.0 clients can't take chunked bodies: decode and close instead
+        decode_chunks = framing[0] == 'chunked' and version != 'HTTP/1.1'
+        keep_alive = framing[0] != 'eof' and not decode_chunks
+        
+        lines = [f"HTTP/1.1 {status_line.split(' ', 1)[1]}"]
+        lines += [f"{name}: {value}" for name, value in headers if name.lower() not in HOP_BY_HOP_HEADERS]
+        if framing[0] == 'chunked' and not decode_chunks:
+            lines.append("Transfer-Encoding: chunked")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        try:
+            client_writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+            await relay_body(framing, reader, client_writer, decode_chunks=decode_chunks)
+            await client_writer.drain()
+        except BaseException:
+            writer.close()
+            raise
+        upstream.release(reader, writer, reusable)
+        return keep_alive
+    
+    async def check_upstream(self, upstream):
+        """One health probe: GET /api on a fresh connection must answer 200"""
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection('127.0.0.1', upstream.port), PROXY_CONNECT_TIMEOUT
+            )
+            writer.write(b"GET /api HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n")
+            response = await asyncio.wait_for(read_http_head(reader), PROXY_CONNECT_TIMEOUT)
+            healthy = response is not None and response[0].split(' ', 2)[1] == '200'
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, IndexError):
+            healthy = False
+        finally:
+            if writer:
+                writer.close()
+        upstream.set_healthy(healthy)
+    
+    async def health_loop(self):
+        """Probe every upstream periodically, ejecting and restoring workers"""
+        while True:
+            await asyncio.gather(*(self.check_upstream(u) for u in self.upstreams))
+            # Retired workers are forgotten once their last request has finished
+            self.draining = [u for u in self.draining if u.active]
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+    
+    async def serve(self, port):
+        """Listen on the public port until SIGTERM/SIGINT"""
+        server = await asyncio.start_server(
+            self.handle_client, '0.0.0.0', port, reuse_address=True, backlog=1024
+        )
+        health = asyncio.create_task(self.health_loop()) if self.upstreams or self.upstreams_file else None
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        if self.upstreams_file:
+            loop.add_signal_handler(signal.SIGHUP, self.reload_upstreams)
+        
+        upstream_list = ", ".join(f":{u.port}" for u in self.upstreams) or "none"
+        print(f"🔀 Proxy listening on port {port} (upstreams: {upstream_list})", flush=True)
+        print(f"   Static: {self.static.root}", flush=True)
+        if self.images:
+            print(f"   Images: {self.images.root}", flush=True)
+        async with server:
+            await stop.wait()
+            # Drain: stop accepting, let in-flight requests finish (the backends get the same grace)
+            self.stopping = True
+            server.close()
+            deadline = loop.time() + SHUTDOWN_GRACE + PROXY_CONNECT_TIMEOUT
+            if self.in_flight:
+                print(f"🛑 Draining {self.in_flight} in-flight request(s)...", flush=True)
+            while self.in_flight and loop.time() < deadline:
+                await asyncio.sleep(READY_POLL_INTERVAL)
+            if self.in_flight:
+                print(f"⚠️  Grace period over - aborting {self.in_flight} request(s)", flush=True)
+        if health:
+            health.cancel()
+
+
+def cmd_proxy(args):
+    """Run the reverse proxy in the foreground"""
+    upstream_ports = [int(p) for p in args.upstreams.split(',') if p] if args.upstreams else []
+    proxy = ReverseProxy(upstream_ports, args.static, args.images, args.upstreams_file)
+    asyncio.run(proxy.serve(args.port))
+
+
+def cmd_static(args):
+    """Run the static file server on its own (no backend forwarding) in the foreground"""
+    asyncio.run(ReverseProxy([], args.root, args.images).serve(args.port))
+
@@ -1,35 +1,117 @@
 #!/usr/bin/env python3
 """
 Storyboard Generator - Server Manager
-Starts and stops both backend (Node.js) and frontend (Python HTTP server)
+Starts and stops both backend (Node.js) and frontend (Python asyncio proxy)
+
+The frontend proxy serves frontend/ and the gallery images directly and forwards
+/api to the backend workers, least-connections balanced, over pooled keep-alive
+connections.
 
 Usage:
     python run.py start    - Start both servers
+        --workers [N]      - Run N backend processes behind the proxy (bare flag: one per CPU core)
+        --mock-openai      - Also run the mock OpenAI server and point the backend at it (also restart/supervise)
     python run.py stop     - Stop both servers
-    python run.py restart  - Restart both servers
-    python run.py status   - Check if servers are running
-    python run.py logs     - View backend logs (tail -f)
-    python run.py dev      - Start backend in foreground (shows logs directly)
+    python run.py restart  - Restart both servers (keeps the current worker count)
+    python run.py reload   - Zero-downtime backend swap: start new workers, switch the proxy, drain the old ones
+        --workers [N]      - Change the worker count while reloading
+        --drain-timeout S  - Max seconds to wait for in-flight requests on old workers (default: 120)
+    python run.py status   - Check if servers are running, with memory/CPU/fds and backend metrics
+    python run.py log-level [info|warn|error] - Show or change the backend log level on the fly
+    python run.py gallery-export [-o FILE] - Save the whole gallery as pretty-printed JSON ('-' for stdout)
+    python run.py report   - Latency percentiles per stage, error classes and throughput from the logs
+        --since T --until T --bucket 1h --json
+    python run.py loadtest - Concurrent gallery/publish/storyboard load against the running servers
+        -c N -d SECONDS [--rate R] --mix gallery=80,detail=20[,publish=N,storyboard=N] [--json]
+                           - Closed loop by default; --rate switches to open-loop arrivals
+    python run.py capacity - Step up the open-loop rate until an SLO breaks; reports the max sustainable throughput
+        --slo gallery:p99<100 [--slo ...] --max-error-rate PCT --start R --step R --max-rate R
+        --step-duration S --mix ... -c N [--json]
+    python run.py top      - Live metrics dashboard, refreshed every second
+        --json [--count N] - Print JSON snapshots instead (e.g. top --json --count 1)
+    python run.py logs     - Follow the backend log, or filter it by worker, request, time or level
+        --worker N         - Only show lines from backend worker N
+        --request ID --since 15m --until T --stage S --level L --grep RE
+                           - Search current and rotated logs instead (add -f to keep following)
+    python run.py dev      - Start backend in foreground (shows logs directly), restarting it when
+                             backend/ files change (Linux inotify)
+    python run.py supervise - Run everything in the foreground, restarting crashed processes;
+                             status/stop/reload/top/log-level then ask it over a UNIX socket (.run.sock)
+        --workers [N]      - Same as start
+    python run.py build    - Minify, content-hash and precompress frontend/ into frontend/dist
+    python run.py proxy    - Run the frontend proxy in the foreground (used by start)
+        --port P (--upstreams 3001,3002 | --upstreams-file F) --static DIR [--images DIR]
+    python run.py mock-openai - Offline OpenAI stand-in (chat completions + images) on port 8090
+        --chat-latency lognormal:2,0.4 --image-latency fixed:0.5 (also uniform:A,B, normal:MEAN,SD)
+        --rate-limit-rate P --error-rate P --content-filter-rate P [--seed N]
+    python run.py logpump  - Copy backend output into a rotating backend.log (used by start)
+    python run.py static   - Serve frontend/ only (cached, ETag/Range, precompressed, sendfile)
+        --port P --root DIR [--images DIR]
+
+Environment:
+    STARTUP_TIMEOUT        - Seconds to wait for each server to become ready (default: 15)
+    SHUTDOWN_GRACE         - Seconds in-flight requests get to finish on stop/reload (default: 60)
+    LOG_MAX_MB             - Rotate backend.log at this size (default: 10)
+    LOG_MAX_AGE_HOURS      - Rotate backend.log at this age (default: 24)
+    LOG_RETENTION_MB       - Keep at most this much of gzipped old logs (default: 100)
+    LOG_LEVEL              - Initial backend log level: info, warn or error (default: info)
+    OPENAI_BASE_URL        - OpenAI-compatible server for the backend (--mock-openai sets it to the mock)
+    GALLERY_STORAGE        - Backend gallery engine: json (default), sqlite or journal
 """
 
+import argparse
+import asyncio
+import ctypes
+import gzip
+import hashlib
+import json
+import math
+import re
+import select
 import subprocess
 import sys
 import os
 import signal
+import struct
 import time
 import socket
+import urllib.parse
+import urllib.request
+import urllib.error
 import webbrowser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from pathlib import Path
 
-# Configuration
-PROJECT_ROOT = Path(__file__).parent.absolute()
-BACKEND_DIR = PROJECT_ROOT / "backend"
-FRONTEND_DIR = PROJECT_ROOT / "frontend"
-PID_FILE = PROJECT_ROOT / ".server_pids"
-LOG_FILE = PROJECT_ROOT / "backend.log"
+from manager.build import cmd_build, frontend_static_root
+from manager.config import (
+    BACKEND_DIR, BACKEND_PORT, CONTROL_SOCKET, DEPENDENCY_FILES, DEPENDENCY_STAMP, FRONTEND_DIR,
+    FRONTEND_LOG_FILE, FRONTEND_PORT, IMAGES_DIR, LOG_FIFO, LOG_FILE, MOCK_OPENAI_LOG_FILE,
+    MOCK_OPENAI_PORT, PID_FILE, PROJECT_ROOT, READY_POLL_INTERVAL, SHUTDOWN_GRACE, STARTUP_TIMEOUT,
+    SUPERVISOR_STATE_FILE, UPSTREAMS_FILE
+)
+from manager.loadtest import (
+    LOADTEST_DEFAULT_MIX, LOADTEST_OPERATIONS, LOADTEST_PERCENTILES, LOADTEST_TIMEOUT, LoadTest,
+    cmd_loadtest, format_latency, parse_mix
+)
+from manager.logs import (
+    BACKEND_FAILURE_LOG_LINES, LOG_LEVELS, LOG_SEARCH_LIMIT, LogPump, cmd_logpump, follow_log,
+    log_segments, log_timestamp, open_log_writer, parse_log_record, parse_time_arg, read_log_tail,
+    record_matches, search_logs
+)
+from manager.mock_openai import MOCK_CHAT_LATENCY, MOCK_IMAGE_LATENCY, LatencyDistribution, cmd_mock_openai
+from manager.proxy import cmd_proxy, cmd_static, read_upstreams, write_upstreams
 
-BACKEND_PORT = 3001
-FRONTEND_PORT = 8080
+# Configuration
+SHUTDOWN_KILL_MARGIN = 5.0  # Extra time past the grace period before SIGKILL
+SHUTDOWN_REPORT_RE = re.compile(
+    r"Shutdown complete in ([\d.]+)s: (\d+) finished, (\d+) aborted \(PID (\d+)\)"
+)
+RELOAD_DRAIN_TIMEOUT = 120.0
+TCP_LISTEN = '0A'  # Socket state column in /proc/net/tcp
+RELOAD_POLL_INTERVAL = 0.2
+CONTROL_TIMEOUT = 5.0
 
 
 def is_port_in_use(port):
@@ -63,6 +145,70 @@ def save_pids(pids):
             f.write(f"{name}={pid}\n")
 
 
+def control_request(command, **params):
+    """
+    Send one command to the supervisor's control socket and return its reply,
+    or None when no supervisor is listening
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONTROL_TIMEOUT)
+            sock.connect(str(CONTROL_SOCKET))
+            sock.sendall(json.dumps({"command": command, **params}).encode() + b"\n")
+            reply = b""
+            while not reply.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                reply += chunk
+        return json.loads(reply)
+    except (OSError, ValueError):
+        return None
+
+
+def current_worker_ports(count):
+    """Ports of the running backend generation, falling back to the default layout"""
+    try:
+        ports = read_upstreams()
+    except (OSError, ValueError, KeyError):
+        return worker_ports(count)
+    return ports if len(ports) == count else worker_ports(count)
+
+
+def probe_backend(port=BACKEND_PORT):
+    """Readiness probe: the backend answers GET /api with 200"""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/api", timeout=1) as resp:
+            return resp.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def probe_frontend():
+    """Readiness probe: the frontend port accepts connections"""
+    try:
+        with socket.create_connection(('127.0.0.1', FRONTEND_PORT), timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def wait_until_ready(processes, probe, timeout=STARTUP_TIMEOUT):
+    """
+    Poll a readiness probe until it succeeds, any of the processes exits, or the deadline passes.
+    Returns the measured time-to-ready in seconds, or None if the processes never became ready.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    while time.monotonic() < deadline:
+        if any(process.poll() is not None for process in processes):
+            return None
+        if probe():
+            return time.monotonic() - started
+        time.sleep(READY_POLL_INTERVAL)
+    return None
+
+
 def is_process_running(pid):
     """Check if a process with given PID is running"""
     try:
@@ -72,151 +218,486 @@ def is_process_running(pid):
         return False
 
 
-def start_backend():
-    """Start the Node.js backend server"""
-    print("🚀 Starting backend server...")
-    
-    if is_port_in_use(BACKEND_PORT):
-        print(f"⚠️  Port {BACKEND_PORT} is already in use. Backend may already be running.")
-        return None
-    
-    # Check if node_modules exists
-    if not (BACKEND_DIR / "node_modules").exists():
-        print("📦 Installing backend dependencies...")
-        subprocess.run(["npm", "install"], cwd=BACKEND_DIR, check=True)
-    
-    # Open log file for writing
-    log_file = open(LOG_FILE, 'w')
-    
-    # Start the backend with logs going to file
-    process = subprocess.Popen(
-        ["node", "server.js"],
-        cwd=BACKEND_DIR,
+def backend_workers(pids):
+    """Pick the backend worker entries (backend.1, backend.2, ...) out of a PID map"""
+    return {
+        name: pid for name, pid in pids.items()
+        if name == 'backend' or name.startswith('backend.')
+    }
+
+
+def worker_ports(workers):
+    """Each backend worker listens on its own port, counting up from BACKEND_PORT"""
+    return [BACKEND_PORT + i for i in range(workers)]
+
+
+def bind_listen_socket(port):
+    """Bind a worker's port up front so a taken port fails here, before node is spawned"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('0.0.0.0', port))
+    sock.listen(511)
+    sock.set_inheritable(True)
+    return sock
+
+
+def spawn_backend_worker(port, log_file, worker_id=None):
+    """
+    Bind a worker's port and start node on it. The worker inherits the listening
+    socket; this process drops its copy once the child has it. Raises OSError if
+    the port can't be bound.
+    """
+    listen_sock = bind_listen_socket(port)
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        LISTEN_FD=str(listen_sock.fileno()),
+        SHUTDOWN_GRACE_MS=str(int(SHUTDOWN_GRACE * 1000)),
+        # Where the worker writes itself if the log pump behind its stdout goes away
+        LOG_FALLBACK_FILE=str(LOG_FILE),
+    )
+    if worker_id is not None:
+        env['WORKER_ID'] = str(worker_id)
+    with listen_sock:
+        # Start the backend with logs going to file
+        return subprocess.Popen(
+            ["node", "server.js"],
+            cwd=BACKEND_DIR,
+            env=env,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            pass_fds=(listen_sock.fileno(),),
+            preexec_fn=os.setpgrp  # Create new process group
+        )
+
+
+def spawn_frontend(log_file):
+    """Start the frontend proxy process; it balances across the ports in UPSTREAMS_FILE"""
+    return subprocess.Popen(
+        [
+            sys.executable, str(Path(__file__).absolute()), "proxy",
+            "--port", str(FRONTEND_PORT),
+            "--upstreams-file", str(UPSTREAMS_FILE),
+            "--static", str(frontend_static_root()),
+            "--images", str(IMAGES_DIR),
+        ],
+        cwd=PROJECT_ROOT,
         stdout=log_file,
         stderr=subprocess.STDOUT,
         preexec_fn=os.setpgrp  # Create new process group
     )
+
+
+def spawn_mock_openai(log_file):
+    """Start the mock OpenAI server with its default latencies and no injected failures"""
+    return subprocess.Popen(
+        [sys.executable, str(Path(__file__).absolute()), "mock-openai", "--port", str(MOCK_OPENAI_PORT)],
+        cwd=PROJECT_ROOT,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+        preexec_fn=os.setpgrp  # Create new process group
+    )
+
+
+def use_mock_openai():
+    """Point backend workers spawned from here on at the mock OpenAI server"""
+    os.environ['OPENAI_BASE_URL'] = f"http://127.0.0.1:{MOCK_OPENAI_PORT}/v1"
+    os.environ.setdefault('OPENAI_API_KEY', "mock-key")
+
+
+def dependency_hash():
+    """Fingerprint of backend/package.json and package-lock.json"""
+    digest = hashlib.sha256()
+    for name in DEPENDENCY_FILES:
+        path = BACKEND_DIR / name
+        digest.update(name.encode() + b"\0")
+        digest.update(path.read_bytes() if path.exists() else b"")
+    return digest.hexdigest()
+
+
+def installed_tree_matches_lock():
+    """
+    Whether node_modules was installed from the current lockfile, judged by the hidden
+    lockfile npm writes into node_modules (lets an existing tree be adopted without reinstalling)
+    """
+    try:
+        locked = json.loads((BACKEND_DIR / "package-lock.json").read_text())["packages"]
+        installed = json.loads((BACKEND_DIR / "node_modules" / ".package-lock.json").read_text())["packages"]
+    except (OSError, ValueError, KeyError):
+        return False
+    locked.pop("", None)  # The root project itself is not part of the installed tree
+    return locked == installed
+
+
+def ensure_backend_dependencies():
+    """
+    Install backend dependencies only when package.json/package-lock.json changed since
+    the last install (recorded in DEPENDENCY_STAMP); a matching tree costs one hash.
+    """
+    digest = dependency_hash()
+    try:
+        if DEPENDENCY_STAMP.read_text().strip() == digest:
+            return
+        reason = "package files changed"
+    except OSError:
+        if not (BACKEND_DIR / "node_modules").exists():
+            reason = "not installed"
+        elif installed_tree_matches_lock():
+            DEPENDENCY_STAMP.write_text(digest + "\n")
+            return
+        else:
+            reason = "installed tree does not match the lockfile"
     
-    # Wait a bit and check if it started
-    time.sleep(2)
-    if process.poll() is not None:
-        print("❌ Backend failed to start!")
-        log_file.close()
-        # Read and print the log
-        with open(LOG_FILE, 'r') as f:
-            print(f.read())
+    command = ["npm", "ci"] if (BACKEND_DIR / "package-lock.json").exists() else ["npm", "install"]
+    print(f"📦 Installing backend dependencies ({reason}): {' '.join(command)}")
+    started = time.monotonic()
+    subprocess.run(command, cwd=BACKEND_DIR, check=True)
+    DEPENDENCY_STAMP.write_text(digest + "\n")
+    print(f"✅ Dependencies installed in {time.monotonic() - started:.1f}s")
+
+
+def ensure_log_pump():
+    """Start the background log pump unless one is running; returns its PID"""
+    pid = get_running_pids().get('logpump')
+    if pid and is_process_running(pid):
+        return pid
+    process = subprocess.Popen(
+        [sys.executable, str(Path(__file__).absolute()), "logpump"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        preexec_fn=os.setpgrp,
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            os.close(os.open(LOG_FIFO, os.O_WRONLY | os.O_NONBLOCK))
+            return process.pid
+        except OSError:
+            time.sleep(READY_POLL_INTERVAL)
+    print("⚠️  Log pump did not start - backend output goes straight to the log file")
+    return None
+
+
+def launch_backend(workers=1):
+    """Spawn the Node.js backend workers without waiting for them"""
+    label = f"{workers} backend workers" if workers > 1 else "backend server"
+    print(f"🚀 Starting {label}...")
+    
+    ports = worker_ports(workers)
+    busy = [port for port in ports if is_port_in_use(port)]
+    if busy:
+        print(f"⚠️  Port {busy[0]} is already in use. Backend may already be running.")
         return None
     
-    print(f"✅ Backend started on http://localhost:{BACKEND_PORT} (PID: {process.pid})")
-    print(f"📄 Logs: {LOG_FILE}")
-    print(f"   View logs: python run.py logs")
-    return process.pid
+    ensure_backend_dependencies()
+    
+    processes = []
+    with open_log_writer() as log_file:
+        for worker_id, port in enumerate(ports, start=1):
+            try:
+                processes.append(spawn_backend_worker(port, log_file, worker_id if workers > 1 else None))
+            except OSError as e:
+                print(f"❌ Could not bind port {port}: {e}")
+                for process in processes:
+                    os.killpg(process.pid, signal.SIGKILL)
+                return None
+    return processes
 
 
-def start_frontend():
-    """Start a simple HTTP server for the frontend"""
-    print("🌐 Starting frontend server...")
+def launch_frontend(upstream_ports=(BACKEND_PORT,)):
+    """Spawn the frontend proxy (static files + /api load balancing) without waiting for it"""
+    print("🌐 Starting frontend proxy...")
     
     if is_port_in_use(FRONTEND_PORT):
         print(f"⚠️  Port {FRONTEND_PORT} is already in use. Frontend may already be running.")
         return None
     
-    # Create a log file for frontend (prevents pipe buffer issues)
-    frontend_log = PROJECT_ROOT / "frontend.log"
-    log_file = open(frontend_log, 'w')
+    write_upstreams(upstream_ports)
+    # Logs go to a file, not a PIPE - an undrained pipe can hang the server
+    with open(FRONTEND_LOG_FILE, 'w') as log_file:
+        return spawn_frontend(log_file)
+
+
+def launch_mock_openai():
+    """Spawn the mock OpenAI server without waiting for it"""
+    print("🧪 Starting mock OpenAI server...")
     
-    # Start Python HTTP server with logs going to file (not PIPE - which can cause hangs)
-    process = subprocess.Popen(
-        [sys.executable, "-m", "http.server", str(FRONTEND_PORT)],
-        cwd=FRONTEND_DIR,
-        stdout=log_file,
-        stderr=subprocess.STDOUT,
-        preexec_fn=os.setpgrp  # Create new process group
-    )
+    if is_port_in_use(MOCK_OPENAI_PORT):
+        print(f"⚠️  Port {MOCK_OPENAI_PORT} is already in use. Mock OpenAI may already be running.")
+        return None
     
-    # Wait a bit and check if it started
-    time.sleep(1)
-    if process.poll() is not None:
-        print("❌ Frontend server failed to start!")
-        log_file.close()
+    with open(MOCK_OPENAI_LOG_FILE, 'w') as log_file:
+        return spawn_mock_openai(log_file)
+
+
+def await_mock_openai(process):
+    """Wait for a launched mock OpenAI server to accept connections; returns time-to-ready or None"""
+    ready_in = wait_until_ready([process], lambda: is_port_in_use(MOCK_OPENAI_PORT))
+    if ready_in is None:
+        if process.poll() is None:
+            os.killpg(process.pid, signal.SIGKILL)
+        print(f"❌ Mock OpenAI server failed to start! See {MOCK_OPENAI_LOG_FILE}")
         return None
     
-    # Verify the server is actually responding
-    max_retries = 5
-    for i in range(max_retries):
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(1)
-                s.connect(('127.0.0.1', FRONTEND_PORT))
-                s.sendall(b'GET / HTTP/1.0\r\n\r\n')
-                response = s.recv(100)
-                if b'HTTP' in response:
-                    break
-        except Exception:
-            if i < max_retries - 1:
-                time.sleep(0.5)
-            else:
-                print("⚠️  Frontend started but may not be responding correctly")
+    print(f"✅ Mock OpenAI ready on http://127.0.0.1:{MOCK_OPENAI_PORT}/v1 in {ready_in:.2f}s (PID: {process.pid})")
+    return ready_in
+
+
+def await_backend(processes, ports):
+    """Wait until every launched backend worker answers; returns time-to-ready or None"""
+    pending = set(ports)
+    
+    def all_workers_ready():
+        pending.difference_update([port for port in list(pending) if probe_backend(port)])
+        return not pending
     
-    print(f"✅ Frontend started on http://localhost:{FRONTEND_PORT} (PID: {process.pid})")
+    ready_in = wait_until_ready(processes, all_workers_ready)
+    if ready_in is None:
+        if all(process.poll() is None for process in processes):
+            print(f"❌ Backend did not become ready within {STARTUP_TIMEOUT:.0f}s!")
+        else:
+            print("❌ Backend failed to start!")
+        # Take the whole worker set down rather than leave a partial backend behind
+        for process in processes:
+            if process.poll() is None:
+                os.killpg(process.pid, signal.SIGKILL)
+        # Print the end of the log
+        print(read_log_tail(BACKEND_FAILURE_LOG_LINES))
+        return None
+    
+    port_list = ", ".join(str(port) for port in ports)
+    pid_list = ", ".join(str(process.pid) for process in processes)
+    print(f"✅ Backend ready on port {port_list} in {ready_in:.2f}s (PID: {pid_list})")
+    return ready_in
+
+
+def await_frontend(process):
+    """Wait for a launched frontend to accept connections; returns time-to-ready or None"""
+    ready_in = wait_until_ready([process], probe_frontend)
+    if ready_in is None:
+        if process.poll() is None:
+            print(f"❌ Frontend proxy did not become ready within {STARTUP_TIMEOUT:.0f}s!")
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            print("❌ Frontend proxy failed to start!")
+        return None
+    
+    print(f"✅ Frontend proxy ready on http://localhost:{FRONTEND_PORT} in {ready_in:.2f}s (PID: {process.pid})")
+    return ready_in
+
+
+def start_frontend():
+    """Start the frontend proxy and wait until it is ready"""
+    process = launch_frontend()
+    if process is None or await_frontend(process) is None:
+        return None
     return process.pid
 
 
-def stop_process(name, pid):
-    """Stop a process by PID"""
-    if not is_process_running(pid):
-        print(f"ℹ️  {name} (PID: {pid}) is not running")
-        return True
+def start_all(workers=1, mock_openai=False):
+    """
+    Launch backend and frontend (and the mock OpenAI server if asked) together and
+    await their readiness in parallel.
+    Returns {name: ([pids], seconds_to_ready or None)} for everything that was launched.
+    """
+    launched = {}
+    ports = worker_ports(workers)
+    if mock_openai:
+        use_mock_openai()
+        mock = launch_mock_openai()
+        if mock:
+            launched['mockopenai'] = ([mock], partial(await_mock_openai, mock))
+    # The proxy needs no node modules: it comes up while a dependency install runs
+    frontend = launch_frontend(ports)
+    if frontend:
+        launched['frontend'] = ([frontend], partial(await_frontend, frontend))
+    backend = launch_backend(workers)
+    if backend:
+        launched['backend'] = (backend, partial(await_backend, backend, ports))
+    
+    print()
+    results = {}
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = {
+            pool.submit(waiter): name
+            for name, (_, waiter) in launched.items()
+        }
+        # Report each process as soon as it settles so one failure never waits on the other
+        for future in as_completed(futures):
+            name = futures[future]
+            processes = launched[name][0]
+            results[name] = ([process.pid for process in processes], future.result())
+    return results
+
+
+def print_startup_report(results, elapsed):
+    """Print per-process time-to-ready and flag the critical path"""
+    ready = {name: t for name, (_, t) in results.items() if t is not None}
+    critical = max(ready, key=ready.get) if ready else None
     
+    print("\n⏱️  Startup timing")
+    for name, (pids, ready_in) in results.items():
+        timing = f"{ready_in:6.2f}s" if ready_in is not None else "failed"
+        marker = "  ← critical path" if name == critical else ""
+        pid_list = ", ".join(str(pid) for pid in pids)
+        print(f"   {process_label(name):<11} {timing}  (PID: {pid_list}){marker}")
+    print(f"   {'Total':<11} {elapsed:6.2f}s")
+
+
+def wait_for_exit(pids, timeout):
+    """
+    Block until the given processes have really exited (pidfd where available,
+    polling otherwise). Returns the PIDs still running at the deadline.
+    """
+    deadline = time.monotonic() + timeout
+    pending = {pid for pid in pids if is_process_running(pid)}
+    if not hasattr(os, 'pidfd_open'):
+        while pending and time.monotonic() < deadline:
+            time.sleep(READY_POLL_INTERVAL)
+            pending = {pid for pid in pending if is_process_running(pid)}
+        return pending
+    
+    poller = select.poll()
+    by_fd = {}
     try:
-        # Try to kill the process group
-        os.killpg(os.getpgid(pid), signal.SIGTERM)
-        time.sleep(1)
-        
-        # Force kill if still running
-        if is_process_running(pid):
-            os.killpg(os.getpgid(pid), signal.SIGKILL)
-            time.sleep(0.5)
-        
-        print(f"✅ Stopped {name} (PID: {pid})")
-        return True
-    except ProcessLookupError:
-        print(f"ℹ️  {name} (PID: {pid}) was already stopped")
-        return True
-    except Exception as e:
-        print(f"❌ Failed to stop {name}: {e}")
-        return False
+        for pid in pending:
+            try:
+                fd = os.pidfd_open(pid)
+            except ProcessLookupError:
+                continue
+            by_fd[fd] = pid
+            poller.register(fd, select.POLLIN)
+        pending = set(by_fd.values())
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for fd, _ in poller.poll(remaining * 1000):
+                poller.unregister(fd)
+                pending.discard(by_fd[fd])
+    finally:
+        for fd in by_fd:
+            os.close(fd)
+    return pending
 
 
-def cmd_start():
+def shutdown_reports():
+    """Drain results the backend workers logged on their way out, keyed by PID"""
+    tail = read_log_tail()
+    return {
+        int(pid): (float(seconds), int(finished), int(aborted))
+        for seconds, finished, aborted, pid in SHUTDOWN_REPORT_RE.findall(tail)
+    }
+
+
+def stop_processes(processes, group=True):
+    """
+    Stop several processes at once: SIGTERM each process group (or just the process
+    when group=False), wait for the real exits while backend workers drain in-flight
+    requests, then SIGKILL stragglers. Takes {label: pid}; returns True if everything
+    is stopped.
+    """
+    ok = True
+    signalled = {}
+    for name, pid in processes.items():
+        if not is_process_running(pid):
+            print(f"ℹ️  {name} (PID: {pid}) is not running")
+            continue
+        try:
+            pgid = os.getpgid(pid) if group else None
+            if group:
+                os.killpg(pgid, signal.SIGTERM)
+            else:
+                os.kill(pid, signal.SIGTERM)
+            signalled[pid] = (name, pgid)
+        except ProcessLookupError:
+            print(f"ℹ️  {name} (PID: {pid}) was already stopped")
+        except OSError as e:
+            print(f"❌ Failed to stop {name}: {e}")
+            ok = False
+    if not signalled:
+        return ok
+    
+    started = time.monotonic()
+    pending = wait_for_exit(signalled, 1.0)
+    if pending:
+        print(f"⏳ Waiting up to {SHUTDOWN_GRACE:.0f}s for in-flight requests to finish...")
+        pending = wait_for_exit(pending, SHUTDOWN_GRACE + SHUTDOWN_KILL_MARGIN - (time.monotonic() - started))
+    for pid in pending:
+        name, pgid = signalled[pid]
+        print(f"⚠️  {name} (PID: {pid}) ignored SIGTERM - killing")
+        try:
+            if pgid is not None:
+                os.killpg(pgid, signal.SIGKILL)
+            else:
+                os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    if wait_for_exit(pending, 2.0):
+        ok = False
+    
+    reports = shutdown_reports()
+    for pid, (name, _) in signalled.items():
+        line = f"✅ Stopped {name} (PID: {pid})"
+        if pid in reports:
+            seconds, finished, aborted = reports[pid]
+            line += f" - drained in {seconds:.2f}s ({finished} finished, {aborted} aborted)"
+        elif pid in pending:
+            line += " - killed"
+        print(line)
+    return ok
+
+
+def stop_process(name, pid):
+    """Stop a process by PID, letting it finish in-flight requests first"""
+    return stop_processes({name: pid})
+
+
+def cmd_start(args):
     """Start both servers"""
     print("\n" + "="*50)
     print("🎬 Starting Storyboard Generator")
     print("="*50 + "\n")
     
-    pids = {}
+    workers = max(1, args.workers or 1)
+    started = time.monotonic()
+    pump_pid = ensure_log_pump()
+    results = start_all(workers, args.mock_openai)
+    elapsed = time.monotonic() - started
     
-    # Start backend
-    backend_pid = start_backend()
-    if backend_pid:
-        pids['backend'] = backend_pid
-    
-    print()
-    
-    # Start frontend
-    frontend_pid = start_frontend()
-    if frontend_pid:
-        pids['frontend'] = frontend_pid
+    pids = {'logpump': pump_pid} if pump_pid else {}
+    mock_pids, mock_ready = results.get('mockopenai', ([], None))
+    if mock_ready is not None:
+        pids['mockopenai'] = mock_pids[0]
+    backend_pids, backend_ready = results.get('backend', ([], None))
+    if backend_ready is not None:
+        for worker_id, pid in enumerate(backend_pids, start=1):
+            pids[f'backend.{worker_id}'] = pid
+    frontend_pids, frontend_ready = results.get('frontend', ([], None))
+    if frontend_ready is not None:
+        pids['frontend'] = frontend_pids[0]
     
     # Save PIDs
-    if pids:
+    if backend_workers(pids) or 'frontend' in pids:
         save_pids(pids)
+    else:
+        if 'mockopenai' in pids:
+            stop_process(process_label('mockopenai'), pids['mockopenai'])
+        if pump_pid:
+            stop_process("Log pump", pump_pid)
+    
+    if results:
+        print_startup_report(results, elapsed)
     
     print("\n" + "="*50)
-    if 'backend' in pids and 'frontend' in pids:
+    if backend_workers(pids) and 'frontend' in pids:
         print("✅ All servers started successfully!")
         print(f"\n📍 Open your browser to: http://localhost:{FRONTEND_PORT}")
         print(f"📍 Backend API: http://localhost:{BACKEND_PORT}")
+        if 'mockopenai' in pids:
+            print(f"🧪 OpenAI requests go to the mock server (log: {MOCK_OPENAI_LOG_FILE.name})")
+        print(f"📄 Backend logs: {LOG_FILE} (python run.py logs)")
         print("\n💡 To stop the servers, run: python run.py stop")
         
         # Ask if user wants to open browser
@@ -231,40 +712,95 @@ def cmd_start():
     print("="*50 + "\n")
 
 
-def kill_process_on_port(port):
-    """Kill any process running on the specified port"""
+def listening_socket_inodes(ports):
+    """Map socket inode -> port for every TCP socket listening on one of the ports (IPv4 and IPv6)"""
+    wanted = set(ports)
+    inodes = {}
+    for table in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            with open(table) as f:
+                next(f)  # Column headers
+                for line in f:
+                    fields = line.split()
+                    local_address, state, inode = fields[1], fields[3], fields[9]
+                    port = int(local_address.rsplit(':', 1)[1], 16)
+                    if state == TCP_LISTEN and port in wanted:
+                        inodes[f"socket:[{inode}]"] = port
+        except FileNotFoundError:
+            continue
+    return inodes
+
+
+def port_owners(ports):
+    """
+    Find the PIDs listening on each port: socket inodes from /proc/net/tcp(6), then one
+    pass over /proc/*/fd to see who holds them. Falls back to lsof where /proc is missing.
+    """
+    owners = {port: set() for port in ports}
+    if not os.path.exists('/proc/net/tcp'):
+        for port in ports:
+            result = subprocess.run(["lsof", "-ti", f"tcp:{port}", "-sTCP:LISTEN"], capture_output=True, text=True)
+            owners[port].update(int(pid) for pid in result.stdout.split())
+        return owners
+    
+    inodes = listening_socket_inodes(ports)
+    if not inodes:
+        return owners
+    for entry in os.scandir('/proc'):
+        if not entry.name.isdigit():
+            continue
+        fd_dir = f"/proc/{entry.name}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue  # Exited meanwhile, or not ours to inspect
+        for fd in fds:
+            try:
+                port = inodes.get(os.readlink(f"{fd_dir}/{fd}"))
+            except OSError:
+                continue
+            if port is not None:
+                owners[port].add(int(entry.name))
+    return owners
+
+
+def kill_process_on_port(port, pids=None):
+    """Stop whatever is listening on the specified port; returns True if something was stopped"""
     try:
-        # Find PIDs using the port
-        result = subprocess.run(
-            ["lsof", "-ti", f":{port}"],
-            capture_output=True,
-            text=True
-        )
-        pids = result.stdout.strip().split('\n')
-        pids = [p for p in pids if p]  # Filter empty strings
-        
-        if pids:
-            for pid in pids:
-                try:
-                    os.kill(int(pid), signal.SIGTERM)
-                    time.sleep(0.5)
-                    # Force kill if still running
-                    try:
-                        os.kill(int(pid), 0)  # Check if still running
-                        os.kill(int(pid), signal.SIGKILL)
-                    except OSError:
-                        pass  # Process already dead
-                    print(f"✅ Killed process on port {port} (PID: {pid})")
-                except (ValueError, OSError) as e:
-                    print(f"⚠️  Could not kill PID {pid}: {e}")
-            return True
-        return False
-    except Exception as e:
+        if pids is None:
+            pids = port_owners([port])[port]
+    except OSError as e:
         print(f"⚠️  Error checking port {port}: {e}")
         return False
+    if not pids:
+        return False
+    # Untracked processes may share a process group with anything, so signal only the PIDs
+    if len(pids) == 1:
+        labelled = {f"Process on port {port}": next(iter(pids))}
+    else:
+        labelled = {f"Process {i} on port {port}": pid for i, pid in enumerate(sorted(pids), start=1)}
+    return stop_processes(labelled, group=False)
+
+
+def stop_supervisor(pid=None):
+    """Ask a running supervisor to shut down and wait for it to finish"""
+    reply = control_request("stop")
+    if reply:
+        pid = reply["pid"]
+    elif pid and is_process_running(pid):
+        os.kill(pid, signal.SIGTERM)  # Control socket unreachable; the signal does the same
+    else:
+        return False
+    if wait_for_exit([pid], 1.0):
+        print(f"⏳ Supervisor is draining in-flight requests (up to {SHUTDOWN_GRACE:.0f}s)...")
+    if wait_for_exit([pid], SUPERVISOR_STOP_GRACE + 5):
+        print(f"❌ Supervisor (PID: {pid}) did not stop")
+        return False
+    print(f"✅ Stopped Supervisor (PID: {pid}) and its processes")
+    return True
 
 
-def cmd_stop():
+def cmd_stop(args=None):
     """Stop both servers"""
     print("\n" + "="*50)
     print("🛑 Stopping Storyboard Generator")
@@ -272,31 +808,45 @@ def cmd_stop():
     
     pids = get_running_pids()
     stopped_any = False
+    worker_count = max(1, len(backend_workers(pids)))
+    
+    # A supervisor stops its own children; stopping them behind its back would just get them restarted
+    if stop_supervisor(pids.pop('supervisor', None)):
+        stopped_any = True
+        pids = {name: pid for name, pid in pids.items() if is_process_running(pid)}
     
     # First, try to stop tracked processes
     if pids:
-        for name, pid in pids.items():
-            if stop_process(name.capitalize(), pid):
-                stopped_any = True
+        # The log pump goes last so it still records the workers' shutdown
+        pump_pid = pids.pop('logpump', None)
+        # Workers still draining may be waiting on the mock; it goes with the pump
+        mock_pid = pids.pop('mockopenai', None)
+        # All at once: the proxy and the workers drain side by side
+        if stop_processes({process_label(name): pid for name, pid in pids.items()}):
+            stopped_any = True
+        if mock_pid and stop_process(process_label('mockopenai'), mock_pid):
+            stopped_any = True
+        if pump_pid and stop_process(process_label('logpump'), pump_pid):
+            stopped_any = True
         
         # Remove PID file
         if PID_FILE.exists():
             PID_FILE.unlink()
     
+    ports = [(port, "backend") for port in current_worker_ports(worker_count)]
+    UPSTREAMS_FILE.unlink(missing_ok=True)
+    
     # Also kill any processes on the ports (in case they weren't tracked)
     print("🔍 Checking ports for any remaining processes...")
     
-    if is_port_in_use(BACKEND_PORT):
-        if kill_process_on_port(BACKEND_PORT):
-            stopped_any = True
-    else:
-        print(f"✅ Port {BACKEND_PORT} (backend) is free")
-        
-    if is_port_in_use(FRONTEND_PORT):
-        if kill_process_on_port(FRONTEND_PORT):
-            stopped_any = True
-    else:
-        print(f"✅ Port {FRONTEND_PORT} (frontend) is free")
+    ports.append((FRONTEND_PORT, "frontend"))
+    owners = port_owners([port for port, _ in ports if is_port_in_use(port)])
+    for port, role in ports:
+        if port in owners:
+            if kill_process_on_port(port, owners[port]):
+                stopped_any = True
+        else:
+            print(f"✅ Port {port} ({role}) is free")
     
     if not stopped_any and not pids:
         print("ℹ️  No servers were running.")
@@ -306,29 +856,302 @@ def cmd_stop():
     print("="*50 + "\n")
 
 
-def cmd_restart():
-    """Restart both servers"""
+def cmd_restart(args):
+    """Restart both servers, keeping the current worker count (and mock OpenAI) unless told otherwise"""
+    pids = get_running_pids()
+    if args.workers is None:
+        args.workers = len(backend_workers(pids)) or 1
+    args.mock_openai = args.mock_openai or 'mockopenai' in pids
     cmd_stop()
-    time.sleep(1)
-    cmd_start()
+    cmd_start(args)
+
 
+def spare_ports(count, in_use):
+    """Free ports for a new backend generation, next to the ones still serving"""
+    ports = []
+    port = BACKEND_PORT
+    while len(ports) < count:
+        if port not in in_use and port != FRONTEND_PORT and not is_port_in_use(port):
+            ports.append(port)
+        port += 1
+    return ports
 
-def cmd_status():
+
+def proxy_status():
+    """Upstream and draining worker state from the running frontend proxy, or None"""
+    url = f"http://127.0.0.1:{FRONTEND_PORT}/__proxy/status"
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def draining_ports():
+    """Ports the proxy still has requests in flight on after a switch"""
+    status = proxy_status() or {}
+    return {u["port"] for u in status.get("draining", []) if u["active"]}
+
+
+def switch_proxy(frontend_pid, ports, timeout=5.0):
+    """Point the proxy at a new set of worker ports; returns True once it reports the switch"""
+    write_upstreams(ports)
+    os.kill(frontend_pid, signal.SIGHUP)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = proxy_status()
+        if status and [u["port"] for u in status["upstreams"]] == list(ports):
+            return True
+        time.sleep(READY_POLL_INTERVAL)
+    return False
+
+
+def wait_for_drain(ports, timeout):
+    """Wait until the proxy has no requests in flight on the given ports; returns True if drained"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not draining_ports() & set(ports):
+            return True
+        time.sleep(RELOAD_POLL_INTERVAL)
+    return False
+
+
+def reload_supervised(supervisor_pid):
+    """Ask the supervisor to do the handoff and follow its progress over the control socket"""
+    print(f"🔁 Asking supervisor (PID: {supervisor_pid}) to reload the backend...")
+    started = time.time()
+    reply = control_request("reload")
+    if reply and not reply["ok"]:
+        print(f"❌ {reply['error']}")
+        return False
+    phase = None
+    while (state := control_request("status")) is not None:
+        reload = state.get("reload") or {}
+        if reload.get("at", 0) >= started and reload["phase"] != phase:
+            phase = reload["phase"]
+            if phase == "draining":
+                print(f"🔀 New workers ready in {reload['ready_in']:.2f}s - proxy switched, draining old workers...")
+            elif phase == "complete":
+                print(f"✅ Reload complete (old workers drained in {reload['drained_in']:.2f}s)")
+                return True
+            elif phase == "failed":
+                print("❌ Reload failed - the supervisor kept the old workers. Check logs: python run.py logs")
+                return False
+        time.sleep(RELOAD_POLL_INTERVAL)
+    print("❌ Supervisor exited during reload")
+    return False
+
+
+def cmd_reload(args):
+    """Blue/green backend swap behind the proxy: no request sees a refused connection"""
+    print("\n" + "="*50)
+    print("🔁 Reloading Storyboard Generator backend")
+    print("="*50 + "\n")
+    
+    supervisor = control_request("status")
+    if supervisor:
+        if args.workers is not None:
+            print("⚠️  --workers is ignored under the supervisor; restart it to change the worker count")
+        sys.exit(0 if reload_supervised(supervisor['pid']) else 1)
+    
+    pids = get_running_pids()
+    
+    frontend_pid = pids.get('frontend')
+    if not frontend_pid or not is_process_running(frontend_pid) or proxy_status() is None:
+        print("❌ The frontend proxy is not running - nothing to hand over to. Use: python run.py restart")
+        sys.exit(1)
+    
+    if 'mockopenai' in pids:
+        use_mock_openai()
+    old_workers = {name: pid for name, pid in backend_workers(pids).items() if is_process_running(pid)}
+    old_ports = current_worker_ports(len(backend_workers(pids)))
+    workers = max(1, args.workers or len(old_workers) or 1)
+    ports = spare_ports(workers, old_ports)
+    
+    started = time.monotonic()
+    print(f"🚀 Starting {workers} new backend worker{'s' if workers > 1 else ''} on port{'s' if workers > 1 else ''} "
+          f"{', '.join(map(str, ports))}...")
+    ensure_backend_dependencies()
+    # Also replaces a pump that died (the old workers then write the log file themselves)
+    pump_pid = ensure_log_pump()
+    processes = []
+    with open_log_writer() as log_file:
+        for worker_id, port in enumerate(ports, start=1):
+            try:
+                processes.append(spawn_backend_worker(port, log_file, worker_id if workers > 1 else None))
+            except OSError as e:
+                print(f"❌ Could not bind port {port}: {e}")
+                for process in processes:
+                    os.killpg(process.pid, signal.SIGKILL)
+                sys.exit(1)
+    
+    ready_in = await_backend(processes, ports)
+    if ready_in is None:
+        print("↩️  Old workers are still serving - nothing was changed")
+        sys.exit(1)
+    print(f"✅ New workers ready in {ready_in:.2f}s")
+    
+    if not switch_proxy(frontend_pid, ports):
+        print("❌ Proxy did not confirm the switch - stopping the new workers")
+        write_upstreams(old_ports)
+        os.kill(frontend_pid, signal.SIGHUP)
+        stop_processes({f"New backend worker {i}": p.pid for i, p in enumerate(processes, start=1)})
+        sys.exit(1)
+    switched = time.monotonic()
+    print("🔀 Proxy switched to the new workers")
+    
+    # Old workers stay in the PID file until they are gone, so 'stop' still finds them
+    new_pids = {f"backend.{i}": process.pid for i, process in enumerate(processes, start=1)}
+    new_pids['frontend'] = frontend_pid
+    if pump_pid:
+        new_pids['logpump'] = pump_pid
+    if 'mockopenai' in pids:
+        new_pids['mockopenai'] = pids['mockopenai']
+    save_pids({**new_pids, **{f"old.{name}": pid for name, pid in old_workers.items()}})
+    
+    print(f"⏳ Draining {len(old_workers)} old worker{'s' if len(old_workers) != 1 else ''} "
+          f"(up to {args.drain_timeout:.0f}s)...")
+    if not wait_for_drain(old_ports, args.drain_timeout):
+        print("⚠️  Drain timeout reached - stopping old workers with requests still in flight")
+    drained_in = time.monotonic() - switched
+    stop_processes({process_label(f"old.{name}"): pid for name, pid in old_workers.items()})
+    save_pids(new_pids)
+    
+    print("\n" + "="*50)
+    print(f"✅ Reload complete in {time.monotonic() - started:.2f}s "
+          f"(ready {ready_in:.2f}s, drained {drained_in:.2f}s)")
+    print("="*50 + "\n")
+
+
+def process_label(name):
+    """Human-readable name for a PID file entry ("backend.2" -> "Backend worker 2")"""
+    if name == 'logpump':
+        return "Log pump"
+    if name == 'mockopenai':
+        return "Mock OpenAI"
+    if name.startswith('old.'):
+        return f"Old {process_label(name[len('old.'):]).lower()}"
+    if name.startswith('backend.'):
+        return f"Backend worker {name.split('.', 1)[1]}"
+    return name.capitalize()
+
+
+def print_restart_history(processes=None):
+    """Show restart counts and the last exit cause recorded by the supervisor"""
+    if processes is None:
+        try:
+            processes = json.loads(SUPERVISOR_STATE_FILE.read_text()).get("processes", {})
+        except (OSError, ValueError):
+            return
+    for name, info in processes.items():
+        line = f"   {process_label(name):<17} restarts: {info['restarts']}"
+        if info.get("exits"):
+            line += f"  last exit: {info['exits'][-1]['cause']}"
+        if info.get("gave_up"):
+            line += "  (gave up)"
+        print(line)
+
+
+def cmd_status(args=None):
     """Check status of servers"""
     print("\n" + "="*50)
     print("📊 Server Status")
     print("="*50 + "\n")
     
+    supervisor = control_request("status")
+    if supervisor:
+        print_supervised_status(supervisor)
+    else:
+        print_unsupervised_status()
+    
+    if LOG_FILE.exists():
+        print(f"\n📄 Log file: {LOG_FILE}")
+        print("   View logs: python run.py logs")
+    
+    print("\n" + "="*50 + "\n")
+
+
+def print_gallery(metrics):
+    """Gallery summary from the first worker that reported one"""
+    gallery = next((m["backend"]["gallery"] for m in metrics.values() if m.get("backend")), None)
+    if gallery:
+        print(f"\n🖼️  Gallery: {gallery['works']} works ({gallery['visibleWorks']} visible), "
+              f"{gallery['images']} images, {format_bytes(gallery['fileBytes'])} index")
+
+
+def print_supervised_status(state):
+    """Status straight from the supervisor's in-memory state"""
+    reply = control_request("metrics")
+    metrics = reply["metrics"]["processes"] if reply else {}
+    processes = state["processes"]
+    
+    workers = {name: info for name, info in processes.items() if name.startswith('backend.')}
+    alive = [name for name, info in workers.items() if info["pid"]]
+    backend_status = "🔴 Stopped"
+    if workers and len(alive) == len(workers):
+        backend_status = f"🟢 Running ({len(workers)} worker{'s' if len(workers) > 1 else ''})"
+    elif alive:
+        backend_status = f"🟡 Degraded ({len(alive)}/{len(workers)} workers running)"
+    
+    first_port = next(iter(workers.values()))["port"] if workers else BACKEND_PORT
+    print(f"Backend  (port {first_port}): {backend_status}")
+    for name, info in processes.items():
+        if name in ('frontend', 'mockopenai'):
+            continue
+        if info["pid"]:
+            state_text = "🟢 running"
+        elif info["gave_up"]:
+            state_text = "🔴 gave up"
+        else:
+            state_text = "🟡 restarting" if info["restarting"] else "🔴 exited"
+        print(f"   {process_label(name):<17} port {info['port']}  PID {info['pid'] or '-':<8} {state_text}")
+        for line in describe_process_metrics(metrics.get(name, {})):
+            print(f"      {line}")
+    
+    frontend = processes.get('frontend', {})
+    frontend_status = f"🟢 Running (PID: {frontend['pid']})" if frontend.get("pid") else "🔴 Stopped"
+    print(f"Frontend proxy (port {FRONTEND_PORT}): {frontend_status}")
+    for line in describe_process_metrics(metrics.get('frontend', {})):
+        print(f"      {line}")
+    
+    mock = processes.get('mockopenai')
+    if mock:
+        print(f"Mock OpenAI (port {MOCK_OPENAI_PORT}): " + (f"🟢 Running (PID: {mock['pid']})" if mock["pid"] else "🔴 Stopped"))
+    
+    print_gallery(metrics)
+    
+    print(f"\n👀 Supervisor running (PID: {state['pid']}), backend log level: {state['log_level']}")
+    if state["reloading"]:
+        print("   🔁 Reload in progress")
+    print_restart_history(processes)
+
+
+def print_unsupervised_status():
+    """Status pieced together from the PID file and the processes themselves"""
     pids = get_running_pids()
     
-    # Check backend
+    # Check backend workers
+    workers = backend_workers(pids)
+    alive = {name: pid for name, pid in workers.items() if is_process_running(pid)}
     backend_status = "🔴 Stopped"
-    if 'backend' in pids and is_process_running(pids['backend']):
-        backend_status = f"🟢 Running (PID: {pids['backend']})"
+    if workers and len(alive) == len(workers):
+        backend_status = f"🟢 Running ({len(workers)} worker{'s' if len(workers) > 1 else ''})"
+    elif alive:
+        backend_status = f"🟡 Degraded ({len(alive)}/{len(workers)} workers running)"
     elif is_port_in_use(BACKEND_PORT):
         backend_status = "🟡 Port in use (unknown process)"
     
-    print(f"Backend  (port {BACKEND_PORT}): {backend_status}")
+    ports = current_worker_ports(len(workers))
+    baseline = collect_metrics(include_backend=False)
+    time.sleep(0.25)  # Two samples a moment apart give current CPU%, not a lifetime average
+    metrics = collect_metrics(baseline)["processes"]
+    
+    print(f"Backend  (port {ports[0] if ports else BACKEND_PORT}): {backend_status}")
+    for (name, pid), port in zip(workers.items(), ports):
+        state = "🟢 running" if name in alive else "🔴 exited"
+        print(f"   {process_label(name):<17} port {port}  PID {pid:<8} {state}")
+        for line in describe_process_metrics(metrics.get(name, {})):
+            print(f"      {line}")
     
     # Check frontend
     frontend_status = "🔴 Stopped"
@@ -337,34 +1160,112 @@ def cmd_status():
     elif is_port_in_use(FRONTEND_PORT):
         frontend_status = "🟡 Port in use (unknown process)"
     
-    print(f"Frontend (port {FRONTEND_PORT}): {frontend_status}")
+    print(f"Frontend proxy (port {FRONTEND_PORT}): {frontend_status}")
+    for line in describe_process_metrics(metrics.get('frontend', {})):
+        print(f"      {line}")
     
-    if LOG_FILE.exists():
-        print(f"\n📄 Log file: {LOG_FILE}")
-        print("   View logs: python run.py logs")
+    print_gallery(metrics)
     
-    print("\n" + "="*50 + "\n")
+    if 'mockopenai' in pids:
+        mock_status = f"🟢 Running (PID: {pids['mockopenai']})" if is_process_running(pids['mockopenai']) else "🔴 Stopped"
+        print(f"Mock OpenAI (port {MOCK_OPENAI_PORT}): {mock_status}")
+    
+    if 'logpump' in pids:
+        if is_process_running(pids['logpump']):
+            pump_status = f"🟢 Running (PID: {pids['logpump']})"
+        else:
+            pump_status = f"🔴 Stopped - workers append to {LOG_FILE.name} directly ('python run.py reload' restarts it)"
+        print(f"Log pump: {pump_status}")
+    
+    if 'supervisor' in pids and is_process_running(pids['supervisor']):
+        print(f"\n👀 Supervisor running (PID: {pids['supervisor']}) - control socket not answering")
+        print_restart_history()
+
 
+def cmd_log_level(args):
+    """Show or change the backend workers' log level without restarting them"""
+    reply = control_request("log-level", level=args.level)
+    if reply is None:
+        # No supervisor: ask the workers started by 'run.py start' directly
+        workers = backend_workers(get_running_pids())
+        ports = dict(zip(workers, current_worker_ports(len(workers))))
+        results = {name: worker_log_level(port, args.level) for name, port in ports.items()}
+        reply = {"ok": bool(results), "level": args.level, "workers": results,
+                 "error": "No backend workers are running"}
+    if not reply["ok"]:
+        print(f"❌ {reply['error']}")
+        sys.exit(1)
+    
+    levels = reply["workers"]
+    level = reply["level"] or next((value for value in levels.values() if value), "unknown")
+    print(f"🔧 Backend log level: {level}")
+    for name, value in levels.items():
+        print(f"   {process_label(name):<17} {value or '⚠️  no answer'}")
+    if args.level and not all(levels.values()):
+        sys.exit(1)
 
-def cmd_logs():
-    """View backend logs (tail -f style)"""
+
+def cmd_gallery_export(args):
+    """Save the whole gallery (hidden works included) as pretty-printed JSON"""
+    try:
+        ports = read_upstreams()
+    except (OSError, ValueError, KeyError):
+        ports = [BACKEND_PORT]
+    for port in ports:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/gallery/export", timeout=30) as response:
+                document = response.read()
+            break
+        except (urllib.error.URLError, OSError):
+            continue
+    else:
+        print("❌ No backend worker answered. Start the servers first with: python run.py start")
+        sys.exit(1)
+    
+    if args.output == '-':
+        sys.stdout.write(document.decode())
+        return
+    Path(args.output).write_bytes(document)
+    print(f"📦 Exported {len(json.loads(document)['works'])} works to {args.output}")
+
+
+def cmd_logs(args):
+    """
+    Follow backend logs (tail -F style, across rotations), or with --request/--since/
+    --until/--stage/--level/--grep search them, rotated and compressed segments included
+    """
     if not LOG_FILE.exists():
         print("❌ No log file found. Start the backend first with: python run.py start")
         return
     
+    searching = any((args.request, args.since, args.until, args.stage, args.level, args.grep))
+    if searching and not args.follow:
+        matches = search_logs(args)
+        for line in matches:
+            print(line)
+        note = f" (newest {args.limit}; use --limit to see more)" if len(matches) >= args.limit else ""
+        print(f"\n🔍 {len(matches)} matching line{'s' if len(matches) != 1 else ''}{note}")
+        return
+    
     print(f"📄 Showing logs from {LOG_FILE}")
+    if args.worker:
+        print(f"   Only lines from worker {args.worker}")
     print("   Press Ctrl+C to stop\n")
     print("="*60)
     
     try:
-        # Use tail -f to follow the log file
-        subprocess.run(["tail", "-f", str(LOG_FILE)])
+        for line in follow_log(LOG_FILE):
+            if record_matches(parse_log_record(line.rstrip('\n')), args):
+                print(line, end='', flush=True)
     except KeyboardInterrupt:
         print("\n\n✅ Stopped watching logs")
 
 
-def cmd_dev():
-    """Start backend in foreground mode (shows logs directly in terminal)"""
+def cmd_dev(args=None):
+    """
+    Start backend in foreground mode (shows logs directly in terminal). On Linux the
+    backend restarts by itself when files under backend/ change.
+    """
     print("\n" + "="*50)
     print("🎬 Starting Storyboard Generator (Dev Mode)")
     print("="*50 + "\n")
@@ -382,22 +1283,33 @@ def cmd_dev():
         print(f"⚠️  Port {BACKEND_PORT} is already in use. Backend may already be running.")
         return
     
-    # Check if node_modules exists
-    if not (BACKEND_DIR / "node_modules").exists():
-        print("📦 Installing backend dependencies...")
-        subprocess.run(["npm", "install"], cwd=BACKEND_DIR, check=True)
+    ensure_backend_dependencies()
+    
+    try:
+        watcher = BackendWatcher()
+    except OSError as e:
+        watcher = None
+        print(f"ℹ️  File watching unavailable ({e}) - restart manually after backend changes")
     
     print("🚀 Starting backend server in foreground...")
     print(f"   Frontend: http://localhost:{FRONTEND_PORT}")
     print(f"   Backend:  http://localhost:{BACKEND_PORT}")
+    if watcher:
+        print("   Watching backend/ - saving a file restarts the backend (frontend/ changes need no restart)")
     print("\n   Press Ctrl+C to stop\n")
     print("="*60 + "\n")
     
     try:
-        # Run backend in foreground - logs will show directly
-        subprocess.run(["node", "server.js"], cwd=BACKEND_DIR)
+        if watcher:
+            watcher.run()
+        else:
+            # Run backend in foreground - logs will show directly
+            subprocess.run(["node", "server.js"], cwd=BACKEND_DIR)
     except KeyboardInterrupt:
         print("\n\n🛑 Backend stopped")
+    finally:
+        if watcher:
+            watcher.close()
         # Stop frontend too
         if frontend_pid and is_process_running(frontend_pid):
             stop_process("Frontend", frontend_pid)
@@ -405,11 +1317,1466 @@ def cmd_dev():
             PID_FILE.unlink()
 
 
+# ============================================
+# DEV MODE FILE WATCHING
+# ============================================
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_ISDIR = 0x40000000
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+WATCHED_SUFFIXES = ('.js', '.mjs', '.json')
+WATCHED_NAMES = ('.env',)
+UNWATCHED_DIRS = ('node_modules', 'data')  # Dependencies, and the gallery the backend writes itself
+DEV_DEBOUNCE = 0.3      # Quiet time that ends a burst of saves
+DEV_DEBOUNCE_MAX = 2.0  # Restart anyway if saves keep coming
+
+
+class Inotify:
+    """Minimal inotify binding over ctypes (Linux only)"""
+    
+    def __init__(self):
+        libc = ctypes.CDLL(None, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available on this platform")
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.directories = {}  # watch descriptor -> directory
+    
+    def watch(self, directory, mask=WATCH_MASK):
+        wd = self._add_watch(self.fd, os.fsencode(directory), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(directory))
+        self.directories[wd] = Path(directory)
+    
+    def read(self):
+        """Pending events as (directory, name, mask)"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+            offset += length
+            if wd in self.directories:
+                events.append((self.directories[wd], name, mask))
+        return events
+    
+    def close(self):
+        os.close(self.fd)
+
+
+class BackendWatcher:
+    """
+    Runs the backend for dev mode and restarts it when backend sources change:
+    inotify wakes us on writes (no polling), bursts of saves are debounced into
+    one restart, and the edit-to-ready time is reported. The frontend proxy is
+    left alone; it picks up frontend/ edits itself through its mtime checks.
+    """
+    
+    def __init__(self):
+        self.inotify = Inotify()
+        for directory in self.source_dirs():
+            self.inotify.watch(directory)
+        self.process = None
+    
+    @staticmethod
+    def watched_dir(parent, name):
+        """Whether a subdirectory holds sources: not hidden, not dependencies or data"""
+        return not name.startswith('.') and not (Path(parent) == BACKEND_DIR and name in UNWATCHED_DIRS)
+    
+    def source_dirs(self):
+        yield BACKEND_DIR
+        for root, dirs, _ in os.walk(BACKEND_DIR):
+            dirs[:] = [d for d in dirs if self.watched_dir(root, d)]
+            for d in dirs:
+                yield Path(root) / d
+    
+    def watch_new_dir(self, directory):
+        """
+        Watch a directory created or moved in after startup, with the subdirectories it
+        already has by now. One that is gone or unreadable by then (a temp directory npm
+        or an editor made and removed again) is skipped.
+        """
+        for root, dirs, _ in os.walk(directory):
+            try:
+                self.inotify.watch(root)
+            except OSError:
+                dirs[:] = []
+                continue
+            dirs[:] = [d for d in dirs if self.watched_dir(root, d)]
+    
+    def relevant(self, directory, name, mask):
+        """Source changes only: skip editor swap files, backups and new subdirectories' contents"""
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO) and self.watched_dir(directory, name):
+                self.watch_new_dir(directory / name)
+            return False
+        return name.endswith(WATCHED_SUFFIXES) or name in WATCHED_NAMES
+    
+    def start_backend(self):
+        self.process = subprocess.Popen(["node", "server.js"], cwd=BACKEND_DIR)
+    
+    def wait_for_changes(self):
+        """Block until a burst of source changes has settled; returns (changed names, first change time)"""
+        poller = select.poll()
+        poller.register(self.inotify.fd, select.POLLIN)
+        changed = []
+        first = None
+        while True:
+            if first is None:
+                timeout = 500
+            else:
+                timeout = min(DEV_DEBOUNCE, first + DEV_DEBOUNCE_MAX - time.monotonic()) * 1000
+                if timeout <= 0:
+                    return changed, first
+            if not poller.poll(max(0, timeout)):
+                if first is not None:
+                    return changed, first
+                if self.process and self.process.poll() is not None:
+                    print(f"\n💥 Backend exited with code {self.process.returncode} "
+                          "- fix the error and save to restart", flush=True)
+                    self.process = None
+                continue
+            for directory, name, mask in self.inotify.read():
+                if self.relevant(directory, name, mask):
+                    first = first or time.monotonic()
+                    changed.append((directory / name).relative_to(BACKEND_DIR).as_posix())
+    
+    def restart(self, changed, first_change):
+        names = ", ".join(sorted(set(changed))[:5]) + (" ..." if len(set(changed)) > 5 else "")
+        print(f"\n♻️  Changed: {names} - restarting backend...", flush=True)
+        if any(Path(name).name in DEPENDENCY_FILES for name in changed):
+            ensure_backend_dependencies()
+        if self.process and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(SHUTDOWN_GRACE + SHUTDOWN_KILL_MARGIN)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.start_backend()
+        if wait_until_ready([self.process], lambda: probe_backend(BACKEND_PORT)) is None:
+            print("❌ Backend did not come back - fix the error and save to restart", flush=True)
+            return
+        print(f"✅ Backend ready {time.monotonic() - first_change:.2f}s after the edit", flush=True)
+    
+    def run(self):
+        self.start_backend()
+        while True:
+            changed, first_change = self.wait_for_changes()
+            self.restart(changed, first_change)
+    
+    def close(self):
+        if self.process and self.process.poll() is None:
+            # Ctrl+C reached node too (same terminal process group); let it finish draining
+            try:
+                self.process.wait(SHUTDOWN_GRACE + SHUTDOWN_KILL_MARGIN)
+            except (subprocess.TimeoutExpired, KeyboardInterrupt):
+                self.process.kill()
+                self.process.wait()
+        self.inotify.close()
+
+
+# ============================================
+# SUPERVISOR
+# ============================================
+
+# Mirrors railway.json: restartPolicyType ON_FAILURE, restartPolicyMaxRetries 10
+RESTART_MAX_IN_WINDOW = 10
+RESTART_WINDOW = 300.0
+RESTART_BACKOFF_BASE = 0.5
+RESTART_BACKOFF_MAX = 30.0
+RESTART_STABLE_AFTER = 30.0  # A process that ran this long resets its backoff
+SUPERVISOR_STOP_GRACE = SHUTDOWN_GRACE + SHUTDOWN_KILL_MARGIN
+
+
+def describe_exit(status):
+    """Turn a waitpid status into (cause, failed)"""
+    if os.WIFSIGNALED(status):
+        sig = os.WTERMSIG(status)
+        cause = f"killed by {signal.Signals(sig).name}"
+        if sig == signal.SIGKILL:
+            cause += " (possibly the OOM killer)"
+        return cause, True
+    code = os.WEXITSTATUS(status)
+    return f"exited with code {code}", code != 0
+
+
+def timestamp():
+    """Wall-clock time for supervisor messages"""
+    return time.strftime("%H:%M:%S")
+
+
+class SupervisedProcess:
+    """One child under supervision and its restart bookkeeping"""
+    
+    def __init__(self, name, spawn, port=None):
+        self.name = name
+        self.spawn = spawn
+        self.port = port
+        self.stop_sent_at = None      # When a retiring worker was sent SIGTERM
+        self.pid = None
+        self.pidfd = None
+        self.started_at = None
+        self.next_start = time.monotonic()
+        self.failures = 0             # Consecutive failures, drives the backoff
+        self.restarts = 0
+        self.recent_restarts = deque()
+        self.exits = []               # History of {at, cause, uptime}
+        self.gave_up = False
+
+
+class Supervisor:
+    """
+    Foreground process manager: owns the backend workers and the frontend proxy,
+    learns about exits immediately via pidfd (or SIGCHLD where pidfds are missing),
+    and restarts failed children with exponential backoff. Other run.py commands
+    talk to it over a UNIX control socket and get answers from its in-memory state.
+    """
+    
+    def __init__(self, workers, mock_openai=False):
+        self.workers = workers
+        self.log_pump = LogPump()
+        self.log_pump.start()
+        self.backend_log = open_log_writer()
+        self.frontend_log = open(FRONTEND_LOG_FILE, 'w')
+        self.ports = worker_ports(workers)
+        write_upstreams(self.ports)
+        self.children = [
+            self.backend_child(worker_id, port)
+            for worker_id, port in enumerate(self.ports, start=1)
+        ]
+        self.children.append(SupervisedProcess('frontend', partial(spawn_frontend, self.frontend_log)))
+        if mock_openai:
+            use_mock_openai()
+            self.mock_log = open(MOCK_OPENAI_LOG_FILE, 'w')
+            self.children.append(SupervisedProcess('mockopenai', partial(spawn_mock_openai, self.mock_log)))
+        self.by_fd = {}
+        self.poller = select.poll()
+        self.use_pidfd = hasattr(os, 'pidfd_open')
+        self.stopping = False
+        self.reload_requested = False
+        self.reload = None            # The blue/green handoff in progress, if any
+        self.last_reload = None       # Outcome of the last handoff, published in the state file
+        self.log_level = os.environ.get('LOG_LEVEL', 'info')
+        self.control = None           # Listening control socket
+        self.control_clients = {}     # fd -> (connection, buffered request bytes)
+        self.metrics_sample = None    # Baseline for CPU% in metrics replies
+        self.next_sample = time.monotonic()
+    
+    def backend_child(self, worker_id, port):
+        """A supervised backend worker listening on the given port"""
+        return SupervisedProcess(
+            f"backend.{worker_id}",
+            partial(spawn_backend_worker, port, self.backend_log, worker_id if self.workers > 1 else None),
+            port,
+        )
+    
+    def log(self, message):
+        print(f"[{timestamp()}] {message}", flush=True)
+    
+    def start_child(self, child):
+        """Spawn (or respawn) a child and start watching it"""
+        try:
+            process = child.spawn()
+        except OSError as e:
+            self.record_exit(child, f"failed to spawn: {e}", True)
+            return
+        child.pid = process.pid
+        child.started_at = time.monotonic()
+        child.next_start = None
+        if self.use_pidfd:
+            child.pidfd = os.pidfd_open(child.pid)
+            self.by_fd[child.pidfd] = child
+            self.poller.register(child.pidfd, select.POLLIN)
+        self.save_state()
+    
+    def reap(self, child, status):
+        """Handle a child's exit: record why, and schedule a restart if it failed"""
+        if child.pidfd is not None:
+            self.poller.unregister(child.pidfd)
+            del self.by_fd[child.pidfd]
+            os.close(child.pidfd)
+            child.pidfd = None
+        child.pid = None
+        if child.name.startswith('old.'):
+            self.children.remove(child)
+            self.log(f"👋 {process_label(child.name)} retired ({describe_exit(status)[0]})")
+            self.save_state()
+            return
+        if self.stopping:
+            return
+        cause, failed = describe_exit(status)
+        self.record_exit(child, cause, failed)
+    
+    def record_exit(self, child, cause, failed):
+        """Log an exit and apply the ON_FAILURE restart policy with backoff"""
+        uptime = time.monotonic() - child.started_at if child.started_at else 0.0
+        child.exits.append({"at": time.time(), "cause": cause, "uptime": round(uptime, 2)})
+        label = process_label(child.name)
+        if not failed:
+            self.log(f"ℹ️  {label} {cause} after {uptime:.1f}s - not restarting")
+            self.save_state()
+            return
+        
+        now = time.monotonic()
+        child.failures = 1 if uptime >= RESTART_STABLE_AFTER else child.failures + 1
+        while child.recent_restarts and now - child.recent_restarts[0] > RESTART_WINDOW:
+            child.recent_restarts.popleft()
+        if len(child.recent_restarts) >= RESTART_MAX_IN_WINDOW:
+            child.gave_up = True
+            self.log(f"❌ {label} {cause}; {RESTART_MAX_IN_WINDOW} restarts in {RESTART_WINDOW:.0f}s - giving up")
+            self.save_state()
+            return
+        
+        delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_BASE * 2 ** (child.failures - 1))
+        child.next_start = now + delay
+        child.recent_restarts.append(now)
+        child.restarts += 1
+        self.log(f"💥 {label} {cause} after {uptime:.1f}s - restarting in {delay:.1f}s (restart #{child.restarts})")
+        self.save_state()
+    
+    def reap_any(self):
+        """SIGCHLD fallback: collect every exited child without blocking"""
+        by_pid = {child.pid: child for child in self.children if child.pid}
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in by_pid:
+                self.reap(by_pid[pid], status)
+    
+    def save_state(self):
+        """Publish PIDs and restart history for status/stop"""
+        pids = {'supervisor': os.getpid()}
+        pids.update({child.name: child.pid for child in self.children if child.pid})
+        save_pids(pids)
+        state = {
+            "supervisor_pid": os.getpid(),
+            "updated_at": time.time(),
+            "processes": {
+                child.name: {
+                    "pid": child.pid,
+                    "restarts": child.restarts,
+                    "gave_up": child.gave_up,
+                    "exits": child.exits[-20:],
+                }
+                for child in self.children
+            },
+            "reload": self.last_reload,
+        }
+        SUPERVISOR_STATE_FILE.write_text(json.dumps(state, indent=2))
+    
+    def request_stop(self, signum, frame):
+        self.stopping = True
+    
+    def request_reload(self, signum, frame):
+        self.reload_requested = True
+    
+    def begin_reload(self):
+        """SIGHUP: start a new backend generation on spare ports next to the current one"""
+        self.reload_requested = False
+        if self.reload:
+            self.log("⚠️  Reload already in progress - ignoring SIGHUP")
+            return
+        ports = spare_ports(self.workers, self.ports)
+        fresh = [self.backend_child(worker_id, port) for worker_id, port in enumerate(ports, start=1)]
+        retiring = [child for child in self.children if child.name.startswith('backend.')]
+        for child in retiring:
+            child.name = f"old.{child.name}"
+            child.next_start = None   # Never restart the old generation
+        self.children.extend(fresh)
+        self.reload = {
+            "ports": ports,
+            "fresh": fresh,
+            "retiring": retiring,
+            "started_at": time.monotonic(),
+            "switched_at": None,
+        }
+        self.publish_reload("starting")
+        self.log(f"🔁 Reload: starting {len(fresh)} new backend workers on ports {', '.join(map(str, ports))}")
+        for child in fresh:
+            self.start_child(child)
+    
+    def publish_reload(self, phase, **details):
+        self.last_reload = {"phase": phase, "at": time.time(), **details}
+        self.save_state()
+    
+    def advance_reload(self):
+        """Move the handoff along: switch once the new workers answer, retire the old once drained"""
+        reload = self.reload
+        now = time.monotonic()
+        if reload["switched_at"] is None:
+            if any(child.exits for child in reload["fresh"]) or now - reload["started_at"] > STARTUP_TIMEOUT:
+                self.abort_reload()
+                return
+            if not all(probe_backend(port) for port in reload["ports"]):
+                return
+            ready_in = time.monotonic() - reload["started_at"]
+            write_upstreams(reload["ports"])
+            self.ports = reload["ports"]
+            frontend = next(child for child in self.children if child.name == 'frontend')
+            if frontend.pid:
+                os.kill(frontend.pid, signal.SIGHUP)
+            reload["switched_at"] = time.monotonic()
+            reload["ready_in"] = ready_in
+            self.log(f"🔀 Reload: new workers ready in {ready_in:.2f}s - proxy switched, draining old workers")
+            self.publish_reload("draining", ready_in=round(ready_in, 2))
+            return
+        
+        draining = draining_ports()
+        deadline_passed = now - reload["switched_at"] > RELOAD_DRAIN_TIMEOUT
+        for child in reload["retiring"]:
+            if child.pid and child.stop_sent_at is None and (
+                    deadline_passed or child.port not in draining):
+                child.stop_sent_at = now
+                os.killpg(child.pid, signal.SIGTERM)
+            elif child.pid and child.stop_sent_at and now - child.stop_sent_at > SUPERVISOR_STOP_GRACE:
+                self.log(f"⚠️  {process_label(child.name)} ignored SIGTERM - killing")
+                os.killpg(child.pid, signal.SIGKILL)
+        if all(child.pid is None for child in reload["retiring"]):
+            drained_in = now - reload["switched_at"]
+            self.log(f"✅ Reload complete: old workers drained in {drained_in:.2f}s")
+            self.publish_reload("complete", ready_in=round(reload["ready_in"], 2), drained_in=round(drained_in, 2))
+            self.reload = None
+    
+    def abort_reload(self):
+        """The new generation failed to come up: drop it and keep serving from the old one"""
+        reload = self.reload
+        self.reload = None
+        for child in reload["fresh"]:
+            self.children.remove(child)
+            if child.pid:
+                if child.pidfd is not None:
+                    self.poller.unregister(child.pidfd)
+                    del self.by_fd[child.pidfd]
+                    os.close(child.pidfd)
+                os.killpg(child.pid, signal.SIGKILL)
+                os.waitpid(child.pid, 0)
+        for child in reload["retiring"]:
+            child.name = child.name[len('old.'):]
+        self.log("❌ Reload failed: new workers did not become ready - still serving from the old ones")
+        self.publish_reload("failed")
+    
+    @staticmethod
+    def child_port(child):
+        return {'frontend': FRONTEND_PORT, 'mockopenai': MOCK_OPENAI_PORT}.get(child.name, child.port)
+    
+    def managed_processes(self):
+        """name -> (pid, port) of the running children, for collect_metrics"""
+        return {
+            child.name: (child.pid, self.child_port(child))
+            for child in self.children if child.pid
+        }
+    
+    def sample_metrics(self):
+        """Refresh the CPU baseline so metrics replies cover roughly the last second"""
+        self.metrics_sample = collect_metrics(self.metrics_sample, include_backend=False,
+                                              managed=self.managed_processes())
+        self.next_sample = time.monotonic() + TOP_INTERVAL
+    
+    def open_control_socket(self):
+        """Listen for run.py commands on CONTROL_SOCKET (owner-only permissions)"""
+        # A socket file left by a supervisor that died without cleaning up
+        CONTROL_SOCKET.unlink(missing_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            sock.bind(str(CONTROL_SOCKET))
+        except OSError as e:
+            sock.close()
+            self.log(f"⚠️  No control socket ({e}) - status/stop fall back to the PID file")
+            return
+        finally:
+            os.umask(umask)
+        sock.listen(16)
+        sock.setblocking(False)
+        self.control = sock
+        self.poller.register(sock.fileno(), select.POLLIN)
+    
+    def close_control_socket(self):
+        if self.control is None:
+            return
+        for fd in list(self.control_clients):
+            self.drop_control_client(fd)
+        self.poller.unregister(self.control.fileno())
+        self.control.close()
+        self.control = None
+        CONTROL_SOCKET.unlink(missing_ok=True)
+    
+    def accept_control(self):
+        while True:
+            try:
+                conn, _ = self.control.accept()
+            except BlockingIOError:
+                return
+            conn.setblocking(False)
+            self.control_clients[conn.fileno()] = (conn, b"")
+            self.poller.register(conn.fileno(), select.POLLIN)
+    
+    def drop_control_client(self, fd):
+        conn, _ = self.control_clients.pop(fd)
+        self.poller.unregister(fd)
+        conn.close()
+    
+    def read_control(self, fd):
+        """Buffer a client's request line; answer it once complete. One request per connection."""
+        conn, buffered = self.control_clients[fd]
+        try:
+            data = conn.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        buffered += data
+        if not data or len(buffered) > 65536:
+            self.drop_control_client(fd)
+            return
+        if b"\n" not in buffered:
+            self.control_clients[fd] = (conn, buffered)
+            return
+        try:
+            request = json.loads(buffered.split(b"\n", 1)[0])
+            reply = self.handle_control(request)
+        except ValueError as e:
+            reply = {"ok": False, "error": f"bad request: {e}"}
+        try:
+            conn.settimeout(CONTROL_TIMEOUT)
+            conn.sendall(json.dumps(reply).encode() + b"\n")
+        except OSError:
+            pass  # Client went away; nothing to tell it
+        self.drop_control_client(fd)
+    
+    def handle_control(self, request):
+        """Answer one control command from the in-memory state"""
+        command = request.get("command")
+        if command == "status":
+            return {"ok": True, **self.control_status()}
+        if command == "metrics":
+            snapshot = collect_metrics(self.metrics_sample, managed=self.managed_processes())
+            return {"ok": True, "metrics": snapshot}
+        if command == "stop":
+            self.log("🛑 Stop requested over the control socket")
+            self.stopping = True
+            return {"ok": True, "pid": os.getpid()}
+        if command == "reload":
+            if self.reload:
+                return {"ok": False, "error": "A reload is already in progress"}
+            self.reload_requested = True
+            return {"ok": True}
+        if command == "log-level":
+            return self.change_log_level(request.get("level"))
+        return {"ok": False, "error": f"Unknown command: {command}"}
+    
+    def control_status(self):
+        now = time.monotonic()
+        return {
+            "pid": os.getpid(),
+            "workers": self.workers,
+            "log_level": self.log_level,
+            "reload": self.last_reload,
+            "reloading": self.reload is not None,
+            "processes": {
+                child.name: {
+                    "pid": child.pid,
+                    "port": self.child_port(child),
+                    "uptime": round(now - child.started_at, 2) if child.pid else None,
+                    "restarts": child.restarts,
+                    "restarting": child.pid is None and child.next_start is not None,
+                    "gave_up": child.gave_up,
+                    "exits": child.exits[-5:],
+                }
+                for child in self.children
+            },
+        }
+    
+    def change_log_level(self, level):
+        """Report, or set on every worker, the backend log level; restarted workers inherit it"""
+        workers = [child for child in self.children if child.name.startswith('backend.') and child.pid]
+        if level is None:
+            return {"ok": True, "level": self.log_level,
+                    "workers": {child.name: worker_log_level(child.port) for child in workers}}
+        if level not in LOG_LEVELS:
+            return {"ok": False, "error": f"Unknown level {level!r} (choose from {', '.join(LOG_LEVELS)})"}
+        self.log_level = level
+        os.environ['LOG_LEVEL'] = level  # Picked up by spawn_backend_worker for restarts and reloads
+        applied = {child.name: worker_log_level(child.port, level) for child in workers}
+        self.log(f"🔧 Backend log level set to {level}")
+        return {"ok": True, "level": level, "workers": applied}
+    
+    def run(self):
+        """Supervise until SIGINT/SIGTERM or until every child has given up"""
+        wake_r, wake_w = os.pipe()
+        os.set_blocking(wake_r, False)
+        os.set_blocking(wake_w, False)
+        signal.set_wakeup_fd(wake_w)
+        self.poller.register(wake_r, select.POLLIN)
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGHUP, self.request_reload)
+        if not self.use_pidfd:
+            signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        self.open_control_socket()
+        
+        mode = "pidfd" if self.use_pidfd else "SIGCHLD"
+        self.log(f"👀 Supervising {len(self.children)} processes (exit notifications via {mode})")
+        try:
+            while not self.stopping:
+                if self.reload_requested:
+                    self.begin_reload()
+                if self.reload:
+                    self.advance_reload()
+                now = time.monotonic()
+                for child in self.children:
+                    if child.pid is None and child.next_start is not None and child.next_start <= now:
+                        self.start_child(child)
+                        verb = "Restarted" if child.restarts else "Started"
+                        if child.pid:
+                            self.log(f"🚀 {verb} {process_label(child.name)} (PID: {child.pid})")
+                if all(child.pid is None and child.next_start is None for child in self.children):
+                    self.log("❌ No processes left to supervise")
+                    return 1
+                
+                if time.monotonic() >= self.next_sample:
+                    self.sample_metrics()
+                wake_at = [c.next_start for c in self.children if c.pid is None and c.next_start is not None]
+                wake_at.append(self.next_sample)
+                if self.reload:
+                    wake_at.append(time.monotonic() + RELOAD_POLL_INTERVAL)
+                timeout = max(0, (min(wake_at) - time.monotonic()) * 1000)
+                for fd, _ in self.poller.poll(timeout):
+                    if fd == wake_r:
+                        while True:
+                            try:
+                                if not os.read(wake_r, 512):
+                                    break
+                            except BlockingIOError:
+                                break
+                        if not self.use_pidfd:
+                            self.reap_any()
+                    elif fd in self.by_fd:
+                        child = self.by_fd[fd]
+                        _, status = os.waitpid(child.pid, 0)
+                        self.reap(child, status)
+                    elif self.control and fd == self.control.fileno():
+                        self.accept_control()
+                    elif fd in self.control_clients:
+                        self.read_control(fd)
+            return 0
+        finally:
+            self.shutdown()
+            signal.set_wakeup_fd(-1)
+            os.close(wake_r)
+            os.close(wake_w)
+    
+    def shutdown(self):
+        """Stop every child: SIGTERM, wait for real exits, SIGKILL stragglers"""
+        self.stopping = True
+        self.close_control_socket()
+        running = [child for child in self.children if child.pid]
+        labels = {child.pid: process_label(child.name) for child in running}
+        if running:
+            self.log(f"🛑 Stopping {len(running)} processes...")
+        for child in running:
+            try:
+                os.killpg(child.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + SUPERVISOR_STOP_GRACE
+        while running and time.monotonic() < deadline:
+            for child in list(running):
+                pid, status = os.waitpid(child.pid, os.WNOHANG)
+                if pid:
+                    self.reap(child, status)
+                    running.remove(child)
+            time.sleep(0.05)
+        for child in running:
+            self.log(f"⚠️  {process_label(child.name)} ignored SIGTERM - killing")
+            os.killpg(child.pid, signal.SIGKILL)
+            os.waitpid(child.pid, 0)
+            self.reap(child, 0)
+        for pid, (seconds, finished, aborted) in shutdown_reports().items():
+            if pid in labels:
+                self.log(f"✅ {labels[pid]} drained in {seconds:.2f}s ({finished} finished, {aborted} aborted)")
+        self.save_state()
+        if PID_FILE.exists():
+            PID_FILE.unlink()
+        self.backend_log.close()
+        self.log_pump.stop()
+
+
+def cmd_supervise(args):
+    """Run backend workers and frontend proxy in the foreground, restarting them on failure"""
+    print("\n" + "="*50)
+    print("🎬 Supervising Storyboard Generator")
+    print("="*50 + "\n")
+    
+    workers = max(1, args.workers or 1)
+    ports = worker_ports(workers) + [FRONTEND_PORT] + ([MOCK_OPENAI_PORT] if args.mock_openai else [])
+    busy = [port for port in ports if is_port_in_use(port)]
+    if busy:
+        print(f"⚠️  Port {busy[0]} is already in use. Stop the running servers first: python run.py stop")
+        sys.exit(1)
+    ensure_backend_dependencies()
+    
+    print(f"📍 Frontend: http://localhost:{FRONTEND_PORT}")
+    print(f"📄 Backend logs: {LOG_FILE}")
+    print("   Press Ctrl+C to stop\n")
+    sys.exit(Supervisor(workers, args.mock_openai).run())
+
+# ============================================
+# LATENCY REPORT
+# ============================================
+
+# (stage, succeeded, pattern) for the timed lines the backend logs; failures capture the error message
+REPORT_PATTERNS = [
+    ('storyboard', True, re.compile(r'Storyboard complete in ([\d.]+)s')),
+    ('storyboard', False, re.compile(r'Error processing storyboard request after ([\d.]+)s: (.*)')),
+    ('plan', True, re.compile(r'Generated \d+ scenes in ([\d.]+)s')),
+    ('plan', False, re.compile(r'Error planning scenes after ([\d.]+)s: (.*)')),
+    ('image', True, re.compile(r'Image generated for scene \S+ in ([\d.]+)s')),
+    ('image', False, re.compile(r'Error generating image for scene \S+ after ([\d.]+)s: (.*)')),
+    ('download', True, re.compile(r'Saved: \S+ in ([\d.]+)s')),
+    ('download', False, re.compile(r'Failed to download scene \d+ after ([\d.]+)s: (.*)')),
+]
+REPORT_STAGES = ('storyboard', 'plan', 'image', 'download')
+# First match wins; anything else is "other"
+ERROR_CLASSES = [
+    ('rate_limit', re.compile(r'rate.?limit|429', re.I)),
+    ('auth', re.compile(r'api key|401|unauthori[sz]ed|incorrect.*key', re.I)),
+    ('content_policy', re.compile(r'content.?policy|safety|rejected', re.I)),
+    ('timeout', re.compile(r'timed? ?out|timeout|ETIMEDOUT', re.I)),
+    ('connection', re.compile(r'connection|ECONNRESET|ECONNREFUSED|ENOTFOUND|socket hang up', re.I)),
+    ('bad_response', re.compile(r'JSON|Invalid .*structure', re.I)),
+    ('http_error', re.compile(r'HTTP \d{3}|status code', re.I)),
+]
+REPORT_BUCKETS = {'1m': 60, '5m': 300, '15m': 900, '1h': 3600, '1d': 86400}
+
+
+def forward_lines(segment):
+    """Lines of a log segment, oldest first, streamed"""
+    opener = gzip.open if segment.name.endswith('.gz') else open
+    with opener(segment, 'rb') as f:
+        for line in f:
+            yield line.decode('utf-8', 'replace').rstrip('\n')
+
+
+def error_class(message):
+    for name, pattern in ERROR_CLASSES:
+        if pattern.search(message):
+            return name
+    return 'other'
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def build_report(since=None, until=None, bucket_seconds=3600):
+    """
+    One streaming pass over every segment, oldest first: latency percentiles of
+    successful runs per stage, success/failure counts per error class, and
+    storyboards finished per time bucket.
+    """
+    durations = {stage: [] for stage in REPORT_STAGES}
+    outcomes = {stage: {"ok": 0, "failed": 0, "errors": {}} for stage in REPORT_STAGES}
+    throughput = {}
+    first = last = None
+    for segment in log_segments() + [LOG_FILE]:
+        try:
+            for line in forward_lines(segment):
+                if 'in ' not in line and 'after ' not in line:
+                    continue  # Cheap pre-filter: every timed line says "in Xs" or "after Xs"
+                record = parse_log_record(line)
+                stamp = record['time']
+                if (since and (not stamp or stamp < since)) or (until and (not stamp or stamp > until)):
+                    continue
+                for stage, succeeded, pattern in REPORT_PATTERNS:
+                    match = pattern.search(record['message'])
+                    if not match:
+                        continue
+                    seconds = float(match.group(1))
+                    outcome = outcomes[stage]
+                    if succeeded:
+                        outcome["ok"] += 1
+                        durations[stage].append(seconds)
+                    else:
+                        outcome["failed"] += 1
+                        cls = error_class(match.group(2))
+                        outcome["errors"][cls] = outcome["errors"].get(cls, 0) + 1
+                    if stage == 'storyboard' and stamp:
+                        epoch = time.mktime(time.strptime(stamp[:19], '%Y-%m-%d %H:%M:%S'))
+                        start = log_timestamp(epoch - epoch % bucket_seconds)[:16]
+                        slot = throughput.setdefault(start, {"ok": 0, "failed": 0})
+                        slot["ok" if succeeded else "failed"] += 1
+                    if stamp:
+                        first = first or stamp
+                        last = stamp
+                    break
+        except FileNotFoundError:
+            continue  # Compressed or pruned mid-scan
+    
+    stages = {}
+    for stage in REPORT_STAGES:
+        values = sorted(durations[stage])
+        outcome = outcomes[stage]
+        total = outcome["ok"] + outcome["failed"]
+        stages[stage] = {
+            "count": total,
+            "ok": outcome["ok"],
+            "failed": outcome["failed"],
+            "success_rate": round(outcome["ok"] / total, 4) if total else None,
+            "p50": percentile(values, 0.50),
+            "p90": percentile(values, 0.90),
+            "p99": percentile(values, 0.99),
+            "max": values[-1] if values else None,
+            "errors": dict(sorted(outcome["errors"].items(), key=lambda item: -item[1])),
+        }
+    return {
+        "from": first,
+        "to": last,
+        "bucket_seconds": bucket_seconds,
+        "stages": stages,
+        "throughput": [{"start": start, **counts} for start, counts in sorted(throughput.items())],
+    }
+
+
+def print_report(report):
+    """Terminal tables for `report`"""
+    def fmt(value):
+        return f"{value:.2f}s" if value is not None else "-"
+    
+    print("\n" + "="*50)
+    print("📈 Latency Report")
+    print("="*50 + "\n")
+    if report["from"]:
+        print(f"Window: {report['from'][:19]} → {report['to'][:19]}\n")
+    print(f"{'STAGE':<12}{'COUNT':>7}{'OK':>7}{'FAIL':>6}{'SUCCESS':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'MAX':>9}")
+    for stage, row in report["stages"].items():
+        rate = f"{row['success_rate'] * 100:.1f}%" if row["success_rate"] is not None else "-"
+        print(f"{stage:<12}{row['count']:>7}{row['ok']:>7}{row['failed']:>6}{rate:>9}"
+              f"{fmt(row['p50']):>9}{fmt(row['p90']):>9}{fmt(row['p99']):>9}{fmt(row['max']):>9}")
+    
+    failures = [(stage, cls, n) for stage, row in report["stages"].items() for cls, n in row["errors"].items()]
+    if failures:
+        print(f"\n{'FAILURES':<12}{'CLASS':<18}{'COUNT':>6}{'SHARE':>8}")
+        for stage, cls, n in failures:
+            share = n / report["stages"][stage]["count"] * 100
+            print(f"{stage:<12}{cls:<18}{n:>6}{share:>7.1f}%")
+    
+    if report["throughput"]:
+        peak = max(slot["ok"] + slot["failed"] for slot in report["throughput"])
+        bucket = next(name for name, seconds in REPORT_BUCKETS.items() if seconds == report["bucket_seconds"])
+        print(f"\n{'STORYBOARDS PER ' + bucket:<22}{'OK':>5}{'FAIL':>6}")
+        for slot in report["throughput"]:
+            bar = "█" * max(1, round(30 * (slot["ok"] + slot["failed"]) / peak))
+            print(f"{slot['start']:<22}{slot['ok']:>5}{slot['failed']:>6}  {bar}")
+    if not any(row["count"] for row in report["stages"].values()):
+        print("\nℹ️  No timed storyboard activity found in the logs")
+    print("\n" + "="*50 + "\n")
+
+
+def cmd_report(args):
+    """Latency percentiles, error classes and throughput from the backend logs"""
+    if not LOG_FILE.exists() and not log_segments():
+        print("❌ No log file found. Start the backend first with: python run.py start")
+        sys.exit(1)
+    report = build_report(args.since, args.until, REPORT_BUCKETS[args.bucket])
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+# ============================================
+# METRICS
+# ============================================
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+TOP_INTERVAL = 1.0
+
+
+def process_stats(pid):
+    """RSS, CPU time, threads, open fds and uptime of a process from /proc, or None"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces and parentheses; fields resume after the last ')'
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f"/proc/{pid}/status") as f:
+            status = dict(line.split(':', 1) for line in f if ':' in line)
+        with open('/proc/uptime') as f:
+            system_uptime = float(f.read().split()[0])
+    except (OSError, IndexError):
+        return None
+    try:
+        fds = len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        fds = None  # Not ours to inspect
+    return {
+        "rss_bytes": int(status.get("VmRSS", "0 kB").split()[0]) * 1024,
+        "threads": int(status["Threads"]),
+        "fds": fds,
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+        "uptime_seconds": round(system_uptime - int(fields[19]) / CLOCK_TICKS, 2),
+    }
+
+
+def backend_metrics(port):
+    """The worker's own view (event-loop lag, in-flight jobs, gallery), or None"""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/metrics", timeout=1) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def worker_log_level(port, level=None):
+    """A worker's log level, after changing it if a level is given; None if it did not answer"""
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/api/log-level",
+        data=json.dumps({"level": level}).encode() if level else None,
+        headers={"Content-Type": "application/json"},
+        method="PUT" if level else "GET",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=1) as response:
+            return json.loads(response.read())["level"]
+    except (urllib.error.URLError, OSError, ValueError, KeyError):
+        return None
+
+
+def collect_metrics(previous=None, include_backend=True, managed=None):
+    """
+    One snapshot of every managed process. CPU% is measured against the previous
+    snapshot when there is one, otherwise averaged over the process lifetime.
+    `managed` maps name -> (pid, port); by default the processes come from the PID file.
+    """
+    now = time.time()
+    if managed is None:
+        pids = get_running_pids()
+        workers = backend_workers(pids)
+        ports = dict(zip(workers, current_worker_ports(len(workers))))
+        ports.update({name: FRONTEND_PORT for name in pids if name == 'frontend'})
+    else:
+        pids = {name: pid for name, (pid, _) in managed.items()}
+        workers = backend_workers(pids)
+        ports = {name: port for name, (_, port) in managed.items()}
+    before = (previous or {}).get("processes", {})
+    
+    processes = {}
+    for name, pid in pids.items():
+        entry = {"label": process_label(name), "pid": pid, "port": ports.get(name)}
+        stats = process_stats(pid)
+        entry["running"] = stats is not None
+        if stats:
+            entry.update(stats)
+            last = before.get(name)
+            if last and last["pid"] == pid and "cpu_seconds" in last:
+                busy, wall = stats["cpu_seconds"] - last["cpu_seconds"], now - previous["at"]
+            else:
+                busy, wall = stats["cpu_seconds"], stats["uptime_seconds"]
+            entry["cpu_percent"] = round(100 * busy / wall, 1) if wall > 0 else 0.0
+            if include_backend and name in workers:
+                entry["backend"] = backend_metrics(ports[name])
+        processes[name] = entry
+    
+    proxy = proxy_status() if include_backend and 'frontend' in pids else None
+    return {"at": now, "processes": processes, "proxy": proxy}
+
+
+def format_bytes(size):
+    """1536 -> '1.5 KB'"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_duration(seconds):
+    """3725 -> '1h02m'"""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    if seconds < 86400:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 86400}d{seconds % 86400 // 3600:02d}h"
+
+
+def describe_process_metrics(entry):
+    """Metric lines shown under a process in `status`"""
+    if not entry.get("running"):
+        return []
+    fds = entry["fds"] if entry["fds"] is not None else "?"
+    lines = [
+        f"RSS {format_bytes(entry['rss_bytes'])}  CPU {entry['cpu_percent']:.1f}%  "
+        f"threads {entry['threads']}  fds {fds}  up {format_duration(entry['uptime_seconds'])}"
+    ]
+    backend = entry.get("backend")
+    if backend:
+        lag = backend["eventLoopLagMs"]
+        jobs = backend["storyboards"]
+        lines.append(
+            f"loop lag {lag['mean']:.1f}ms (p99 {lag['p99']:.1f}ms)  in-flight {backend['inFlightRequests']}  "
+            f"storyboards {jobs['active']} active / {jobs['completed']} done / {jobs['failed']} failed"
+        )
+    return lines
+
+
+def render_top(snapshot):
+    """The `top` screen for one snapshot"""
+    lines = [
+        f"📊 Storyboard Generator - {time.strftime('%H:%M:%S', time.localtime(snapshot['at']))}"
+        f"  (Ctrl+C to quit)",
+        "",
+        f"{'PROCESS':<26}{'PID':>8}{'PORT':>6}{'CPU%':>7}{'RSS':>11}{'THR':>5}{'FDS':>6}{'UP':>8}"
+        f"{'LAG p99':>9}{'INFL':>6}{'JOBS':>6}",
+    ]
+    gallery = None
+    for entry in snapshot["processes"].values():
+        if not entry["running"]:
+            lines.append(f"{entry['label']:<26}{entry['pid']:>8}{entry['port'] or '':>6}   🔴 not running")
+            continue
+        backend = entry.get("backend") or {}
+        lag = f"{backend['eventLoopLagMs']['p99']:.1f}ms" if backend else "-"
+        lines.append(
+            f"{entry['label']:<26}{entry['pid']:>8}{entry['port'] or '':>6}{entry['cpu_percent']:>7.1f}"
+            f"{format_bytes(entry['rss_bytes']):>11}{entry['threads']:>5}{entry['fds'] if entry['fds'] is not None else '?':>6}"
+            f"{format_duration(entry['uptime_seconds']):>8}{lag:>9}"
+            f"{backend.get('inFlightRequests', '-'):>6}{backend['storyboards']['active'] if backend else '-':>6}"
+        )
+        gallery = backend.get("gallery", gallery)
+    if not snapshot["processes"]:
+        lines.append("🔴 No servers running (start them with: python run.py start)")
+    if gallery:
+        lines += ["", f"🖼️  Gallery: {gallery['works']} works ({gallery['visibleWorks']} visible), "
+                      f"{gallery['images']} images, {format_bytes(gallery['fileBytes'])} index"]
+    proxy = snapshot.get("proxy")
+    if proxy:
+        upstreams = "  ".join(
+            f":{u['port']} {'🟢' if u['healthy'] else '🔴'} {u['active']} active" for u in proxy["upstreams"]
+        )
+        lines += ["", f"🔀 Proxy upstreams: {upstreams or 'none'}"]
+        if proxy["draining"]:
+            lines.append("   Draining: " + "  ".join(f":{u['port']} {u['active']} active" for u in proxy["draining"]))
+    return "\n".join(lines)
+
+
+def cmd_top(args):
+    """Refreshing view of process and backend metrics (or JSON lines with --json)"""
+    previous = collect_metrics(include_backend=False)
+    shown = 0
+    try:
+        while args.count is None or shown < args.count:
+            time.sleep(args.interval)
+            # The supervisor, when running, answers from its own periodic samples
+            reply = control_request("metrics")
+            snapshot = reply["metrics"] if reply else collect_metrics(previous)
+            previous = snapshot
+            shown += 1
+            if args.json:
+                print(json.dumps(snapshot), flush=True)
+            else:
+                # Home the cursor and clear, like top(1)
+                print("\033[H\033[2J" + render_top(snapshot), flush=True)
+    except KeyboardInterrupt:
+        print()
+
+
+# ============================================
+# CAPACITY
+# ============================================
+
+CAPACITY_DEFAULT_SLO = "gallery:p99<100"
+CAPACITY_MAX_ERROR_RATE = 1.0  # Percent of requests
+CAPACITY_SATURATION = 0.9      # Completing fewer than this share of the arrivals means a queue is building
+CAPACITY_SAMPLE_INTERVAL = 0.5
+SLO_RE = re.compile(r'^(?:(\w+):)?(p[\d.]+|max)\s*<\s*([\d.]+)\s*(ms|s)?$')
+
+
+def parse_slo(value):
+    """'gallery:p99<100' -> ('gallery', 'p99', 100.0); no operation means all of them, limits are in ms"""
+    match = SLO_RE.match(value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"bad SLO {value!r} (expected e.g. gallery:p99<100 or p99.9<1s)")
+    operation, percentile, limit, unit = match.groups()
+    operation = operation or 'all'
+    if operation != 'all' and operation not in LOADTEST_OPERATIONS:
+        raise argparse.ArgumentTypeError(
+            f"unknown operation {operation!r} (choose from all, {', '.join(LOADTEST_OPERATIONS)})")
+    if percentile != 'max' and percentile not in dict(LOADTEST_PERCENTILES):
+        raise argparse.ArgumentTypeError(
+            f"unknown percentile {percentile!r} (choose from {', '.join(dict(LOADTEST_PERCENTILES))}, max)")
+    return operation, percentile, float(limit) * (1000 if unit == 's' else 1)
+
+
+def describe_slo(slo):
+    operation, percentile, limit = slo
+    return f"{operation} {percentile} < {format_latency(limit)}"
+
+
+def capacity_processes():
+    """name -> pid of the backend workers and the proxy, from the supervisor or the PID file"""
+    reply = control_request("status")
+    if reply:
+        pids = {name: info["pid"] for name, info in reply["processes"].items() if info["pid"]}
+    else:
+        pids = get_running_pids()
+    return {name: pid for name, pid in pids.items() if name == 'frontend' or name in backend_workers(pids)}
+
+
+class CapacityFinder:
+    """
+    Step load: open-loop LoadTest runs at rising arrival rates until a step breaks
+    an SLO, errors too often or stops keeping up. The knee is the last step that held.
+    Backend and proxy CPU/RSS come from /proc while each step runs.
+    """
+    
+    def __init__(self, args):
+        self.args = args
+        self.processes = capacity_processes()
+        self.steps = []
+    
+    def step_args(self, rate):
+        return argparse.Namespace(
+            target=self.args.target, mix=self.args.mix, concurrency=self.args.concurrency, rate=rate,
+            duration=self.args.step_duration, timeout=self.args.timeout, keep=self.args.keep,
+        )
+    
+    def sample(self):
+        return {name: process_stats(pid) for name, pid in self.processes.items()}
+    
+    def resources(self, before, after, peak_rss, wall):
+        """Summed CPU% and peak RSS of the backend workers, and the proxy's CPU%"""
+        def cpu(names):
+            busy = sum(after[name]["cpu_seconds"] - before[name]["cpu_seconds"]
+                       for name in names if before.get(name) and after.get(name))
+            return round(100 * busy / wall, 1) if wall > 0 else 0.0
+        workers = [name for name in self.processes if name != 'frontend']
+        return {
+            "backend_cpu_percent": cpu(workers) if workers else None,
+            "backend_rss_bytes": sum(peak_rss.get(name, 0) for name in workers) if workers else None,
+            "proxy_cpu_percent": cpu(['frontend']) if 'frontend' in self.processes else None,
+        }
+    
+    def breaches(self, results, rate):
+        """Why a step did not hold (empty if it did)"""
+        reasons = []
+        for slo in self.args.slo:
+            operation, percentile, limit = slo
+            row = results["total"] if operation == 'all' else results["operations"][operation]
+            value = row["latency_ms"][percentile]
+            if value is None:
+                reasons.append(f"{describe_slo(slo)}: no successful requests")
+            elif value >= limit:
+                reasons.append(f"{describe_slo(slo)}: {format_latency(value)}")
+        total = results["total"]
+        if total["requests"]:
+            error_rate = 100 * total["failed"] / total["requests"]
+            if error_rate > self.args.max_error_rate:
+                reasons.append(f"errors {error_rate:.1f}% > {self.args.max_error_rate:g}%")
+            # Compared with the arrivals actually sent, so Poisson noise does not count as saturation
+            offered = total["requests"] / self.args.step_duration
+            if total["throughput"] < CAPACITY_SATURATION * offered:
+                reasons.append(f"saturated: {total['throughput']:.1f} of {offered:.1f} req/s completed")
+        return reasons
+    
+    async def run_step(self, rate):
+        test = LoadTest(self.step_args(rate))
+        await test.prepare()
+        before = self.sample()
+        peak_rss = {}
+        started = time.monotonic()
+        load = asyncio.create_task(test.open_loop(started + self.args.step_duration))
+        while not load.done():
+            for name, stats in self.sample().items():
+                if stats:
+                    peak_rss[name] = max(peak_rss.get(name, 0), stats["rss_bytes"])
+            await asyncio.wait({load}, timeout=CAPACITY_SAMPLE_INTERVAL)
+        await load
+        test.elapsed = time.monotonic() - started
+        after = self.sample()
+        if test.published and not self.args.keep:
+            await test.cleanup()
+        results = test.results()
+        step = {
+            "rate": rate,
+            "requests": results["total"]["requests"],
+            "throughput": results["total"]["throughput"],
+            "error_percent": round(100 * results["total"]["failed"] / results["total"]["requests"], 2)
+                             if results["total"]["requests"] else 0.0,
+            "latency_ms": results["total"]["latency_ms"],
+            "operations": {name: row["latency_ms"] for name, row in results["operations"].items()},
+            **self.resources(before, after, peak_rss, test.elapsed),
+        }
+        step["breaches"] = self.breaches(results, rate)
+        return step
+    
+    async def run(self, on_step=None):
+        rate = self.args.start
+        while rate <= self.args.max_rate:
+            step = await self.run_step(rate)
+            self.steps.append(step)
+            if on_step:
+                on_step(step)
+            if step["breaches"]:
+                break
+            rate += self.args.step
+    
+    def results(self):
+        held = [step for step in self.steps if not step["breaches"]]
+        broken = next((step for step in self.steps if step["breaches"]), None)
+        return {
+            "target": self.args.target,
+            "mix": self.args.mix,
+            "slo": [describe_slo(slo) for slo in self.args.slo],
+            "max_error_percent": self.args.max_error_rate,
+            "step_duration": self.args.step_duration,
+            "steps": self.steps,
+            "max_sustainable_rate": held[-1]["rate"] if held else None,
+            "max_sustainable_throughput": held[-1]["throughput"] if held else None,
+            "broke_at": broken["rate"] if broken else None,
+        }
+
+
+def format_capacity_step(step, slo_columns):
+    """One row of the capacity table"""
+    def resource(value, fmt):
+        return fmt(value) if value is not None else "-"
+    latencies = [
+        step["latency_ms"][percentile] if operation == 'all' else step["operations"][operation][percentile]
+        for operation, percentile in slo_columns
+    ]
+    verdict = "❌ " + "; ".join(step["breaches"]) if step["breaches"] else "✅"
+    return (
+        f"{step['rate']:>8g}{step['throughput']:>10.1f}{step['error_percent']:>7.1f}%"
+        + "".join(f"{format_latency(value):>12}" for value in latencies)
+        + f"{resource(step['backend_cpu_percent'], lambda v: f'{v:.0f}%'):>9}"
+        + f"{resource(step['backend_rss_bytes'], format_bytes):>11}"
+        + f"{resource(step['proxy_cpu_percent'], lambda v: f'{v:.0f}%'):>8}"
+        + f"  {verdict}"
+    )
+
+
+def capacity_header(slo_columns):
+    return (
+        f"{'RATE':>8}{'ACHIEVED':>10}{'ERRORS':>8}"
+        + "".join(f"{(op + ' ' + pct).upper():>12}" for op, pct in slo_columns)
+        + f"{'BE CPU':>9}{'BE RSS':>11}{'PROXY':>8}"
+    )
+
+
+def print_capacity(results, slo_columns):
+    """Summary for `capacity` after the per-step table"""
+    print("\n" + "="*50)
+    print("📈 Capacity")
+    print("="*50 + "\n")
+    print(f"SLO: {', '.join(results['slo'])}, errors ≤ {results['max_error_percent']:g}%\n")
+    if results["max_sustainable_rate"] is None:
+        print(f"❌ Already broken at the first step ({results['broke_at']:g} req/s) - lower --start")
+    elif results["broke_at"] is None:
+        print(f"✅ Held every step up to {results['max_sustainable_rate']:g} req/s - raise --max-rate to find the knee")
+    else:
+        print(f"🎯 Max sustainable throughput: {results['max_sustainable_throughput']:.1f} req/s "
+              f"(held at {results['max_sustainable_rate']:g} req/s, broke at {results['broke_at']:g} req/s)")
+        knee = next(step for step in results["steps"] if step["breaches"])
+        for reason in knee["breaches"]:
+            print(f"   • {reason}")
+    print("\n" + "="*50 + "\n")
+
+
+def cmd_capacity(args):
+    """Ramp the open-loop arrival rate until the SLO breaks; report the last rate that held"""
+    args.slo = args.slo or [parse_slo(CAPACITY_DEFAULT_SLO)]
+    for operation, _, _ in args.slo:
+        if operation != 'all' and operation not in args.mix:
+            print(f"❌ The SLO is on '{operation}', which is not in --mix")
+            sys.exit(1)
+    finder = CapacityFinder(args)
+    # One latency column per (operation, percentile) the SLOs watch
+    slo_columns = list(dict.fromkeys(slo[:2] for slo in args.slo))
+    
+    def show(step):
+        if not args.json:
+            print(format_capacity_step(step, slo_columns), flush=True)
+    
+    if not args.json:
+        if 'storyboard' in args.mix:
+            print("⚠️  The mix includes storyboard requests - each one calls the OpenAI API")
+        print(f"📈 Stepping {args.target} from {args.start:g} req/s by {args.step:g} every {args.step_duration:g}s...")
+        if not any(name != 'frontend' for name in finder.processes):
+            print("ℹ️  No backend processes found locally - CPU and RSS are not reported")
+        print()
+        print(capacity_header(slo_columns))
+    try:
+        asyncio.run(finder.run(show))
+    except (RuntimeError, OSError) as e:
+        print(f"❌ Capacity run could not continue: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Capacity run interrupted")
+        if not finder.steps:
+            sys.exit(130)
+    results = finder.results()
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_capacity(results, slo_columns)
+
+
 def print_usage():
     """Print usage information"""
     print(__doc__)
 
 
+def build_parser():
+    """Command-line options for each subcommand"""
+    parser = argparse.ArgumentParser(prog="run.py", add_help=False)
+    subparsers = parser.add_subparsers(dest="command")
+    
+    for name in ("start", "restart", "reload", "supervise"):
+        sub = subparsers.add_parser(name)
+        sub.add_argument(
+            "--workers", type=int, nargs="?", const=os.cpu_count() or 1, default=None,
+            help="Number of backend processes (bare --workers means one per CPU core)"
+        )
+    for name in ("start", "restart", "supervise"):
+        subparsers.choices[name].add_argument(
+            "--mock-openai", action="store_true",
+            help=f"Also run the mock OpenAI server (port {MOCK_OPENAI_PORT}) and point the backend at it"
+        )
+    subparsers.choices["reload"].add_argument(
+        "--drain-timeout", type=float, default=RELOAD_DRAIN_TIMEOUT,
+        help="Max seconds to wait for in-flight requests on the old workers"
+    )
+    subparsers.add_parser("stop")
+    subparsers.add_parser("status")
+    log_level = subparsers.add_parser("log-level")
+    log_level.add_argument("level", nargs="?", choices=LOG_LEVELS, help="New minimum level (omit to show it)")
+    gallery_export = subparsers.add_parser("gallery-export")
+    gallery_export.add_argument("--output", "-o", default="gallery-export.json", help="File to write ('-' for stdout)")
+    report = subparsers.add_parser("report")
+    report.add_argument("--since", type=parse_time_arg, help="Start time: 15m, 2h, 1d, 14:30 or 2026-01-31 14:30")
+    report.add_argument("--until", type=parse_time_arg, help="End time, same formats as --since")
+    report.add_argument("--bucket", choices=REPORT_BUCKETS, default="1h", help="Throughput bucket size")
+    report.add_argument("--json", action="store_true", help="Print the report as JSON")
+    top = subparsers.add_parser("top")
+    top.add_argument("--json", action="store_true", help="Print one JSON snapshot per line instead of a screen")
+    top.add_argument("--interval", type=float, default=TOP_INTERVAL, help="Seconds between refreshes")
+    top.add_argument("--count", type=int, default=None, help="Stop after this many refreshes")
+    logs = subparsers.add_parser("logs")
+    logs.add_argument("--worker", type=int, help="Only show lines from this backend worker")
+    logs.add_argument("--request", help="Only lines logged while handling this request id (X-Request-Id)")
+    logs.add_argument("--since", type=parse_time_arg, help="Start time: 15m, 2h, 1d, 14:30 or 2026-01-31 14:30")
+    logs.add_argument("--until", type=parse_time_arg, help="End time, same formats as --since")
+    logs.add_argument("--stage", help="Only lines from this request stage (plan, images, respond, publish)")
+    logs.add_argument("--level", choices=LOG_LEVELS, help="Minimum level")
+    logs.add_argument("--grep", type=re.compile, help="Regular expression the message must match")
+    logs.add_argument("--limit", type=int, default=LOG_SEARCH_LIMIT, help="Max lines a search returns")
+    logs.add_argument("-f", "--follow", action="store_true", help="Keep following with the filters applied")
+    loadtest = subparsers.add_parser("loadtest")
+    loadtest.add_argument("--target", default=f"http://127.0.0.1:{FRONTEND_PORT}",
+                          help="Server to load (default: the frontend proxy)")
+    loadtest.add_argument("--concurrency", "-c", type=int, default=10,
+                          help="Concurrent users (closed loop) or connections (open loop)")
+    loadtest.add_argument("--rate", type=float, default=None,
+                          help="Open loop: arrivals per second, regardless of responses")
+    loadtest.add_argument("--duration", "-d", type=float, default=30.0, help="Seconds to send requests for")
+    loadtest.add_argument("--mix", type=parse_mix, default=parse_mix(LOADTEST_DEFAULT_MIX),
+                          help=f"Weighted operations from {', '.join(LOADTEST_OPERATIONS)} (default: {LOADTEST_DEFAULT_MIX})")
+    loadtest.add_argument("--timeout", type=float, default=LOADTEST_TIMEOUT, help="Per-request timeout in seconds")
+    loadtest.add_argument("--keep", action="store_true", help="Keep works published during the test")
+    loadtest.add_argument("--json", action="store_true", help="Print the results as JSON")
+    capacity = subparsers.add_parser("capacity")
+    capacity.add_argument("--target", default=f"http://127.0.0.1:{FRONTEND_PORT}",
+                          help="Server to load (default: the frontend proxy)")
+    capacity.add_argument("--slo", type=parse_slo, action="append",
+                          help=f"Latency objective, repeatable (default: {CAPACITY_DEFAULT_SLO})")
+    capacity.add_argument("--max-error-rate", type=float, default=CAPACITY_MAX_ERROR_RATE,
+                          help=f"Highest acceptable error percentage (default: {CAPACITY_MAX_ERROR_RATE:g})")
+    capacity.add_argument("--start", type=float, default=10.0, help="First arrival rate in req/s")
+    capacity.add_argument("--step", type=float, default=10.0, help="Rate added per step in req/s")
+    capacity.add_argument("--max-rate", type=float, default=1000.0, help="Stop stepping past this rate")
+    capacity.add_argument("--step-duration", type=float, default=15.0, help="Seconds per step")
+    capacity.add_argument("--concurrency", "-c", type=int, default=64, help="Connections shared by the arrivals")
+    capacity.add_argument("--mix", type=parse_mix, default=parse_mix(LOADTEST_DEFAULT_MIX),
+                          help=f"Weighted operations, as for loadtest (default: {LOADTEST_DEFAULT_MIX})")
+    capacity.add_argument("--timeout", type=float, default=LOADTEST_TIMEOUT, help="Per-request timeout in seconds")
+    capacity.add_argument("--keep", action="store_true", help="Keep works published during the run")
+    capacity.add_argument("--json", action="store_true", help="Print the results as JSON")
+    mock = subparsers.add_parser("mock-openai")
+    mock.add_argument("--port", type=int, default=MOCK_OPENAI_PORT)
+    mock.add_argument("--chat-latency", type=LatencyDistribution, default=LatencyDistribution(MOCK_CHAT_LATENCY),
+                      help=f"Scene-plan delay distribution (default: {MOCK_CHAT_LATENCY})")
+    mock.add_argument("--image-latency", type=LatencyDistribution, default=LatencyDistribution(MOCK_IMAGE_LATENCY),
+                      help=f"Image delay distribution (default: {MOCK_IMAGE_LATENCY})")
+    mock.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    mock.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    mock.add_argument("--content-filter-rate", type=float, default=0.0,
+                      help="Fraction of image requests rejected by the (mock) safety system")
+    mock.add_argument("--seed", type=int, default=None, help="Seed for reproducible latencies and failures")
+    subparsers.add_parser("dev")
+    subparsers.add_parser("logpump")
+    subparsers.add_parser("build")
+    proxy = subparsers.add_parser("proxy")
+    proxy.add_argument("--port", type=int, default=FRONTEND_PORT)
+    proxy.add_argument("--upstreams", default="", help="Comma-separated backend worker ports")
+    proxy.add_argument("--upstreams-file", default=None,
+                       help="JSON file with the worker ports, re-read on SIGHUP (overrides --upstreams)")
+    proxy.add_argument("--static", default=str(FRONTEND_DIR), help="Directory served for non-API paths")
+    proxy.add_argument("--images", default=None, help="Serve /images from this directory instead of the backend")
+    static = subparsers.add_parser("static")
+    static.add_argument("--port", type=int, default=FRONTEND_PORT)
+    static.add_argument("--root", default=str(FRONTEND_DIR))
+    static.add_argument("--images", default=None, help="Also serve /images from this directory")
+    return parser
+
+
+COMMANDS = {
+    "start": cmd_start,
+    "stop": cmd_stop,
+    "restart": cmd_restart,
+    "reload": cmd_reload,
+    "status": cmd_status,
+    "log-level": cmd_log_level,
+    "gallery-export": cmd_gallery_export,
+    "top": cmd_top,
+    "report": cmd_report,
+    "loadtest": cmd_loadtest,
+    "capacity": cmd_capacity,
+    "mock-openai": cmd_mock_openai,
+    "logs": cmd_logs,
+    "dev": cmd_dev,
+    "logpump": cmd_logpump,
+    "supervise": cmd_supervise,
+    "build": cmd_build,
+    "proxy": cmd_proxy,
+    "static": cmd_static,
+}
+
+
 def main():
     if len(sys.argv) < 2:
         print_usage()
@@ -417,20 +2784,11 @@ def main():
     
     command = sys.argv[1].lower()
     
-    if command == "start":
-        cmd_start()
-    elif command == "stop":
-        cmd_stop()
-    elif command == "restart":
-        cmd_restart()
-    elif command == "status":
-        cmd_status()
-    elif command == "logs":
-        cmd_logs()
-    elif command == "dev":
-        cmd_dev()
-    elif command in ["-h", "--help", "help"]:
+    if command in ["-h", "--help", "help"]:
         print_usage()
+    elif command in COMMANDS:
+        args = build_parser().parse_args([command] + sys.argv[2:])
+        COMMANDS[command](args)
     else:
         print(f"Unknown command: {command}")
         print_usage()
@@ -439,4 +2797,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,50 @@
+"""Dev mode watcher: picking up directories created while it runs"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import run
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), "inotify is Linux only")
+class WatchNewDirTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        # Only the inotify side; __init__ would watch the real backend/
+        self.watcher = run.BackendWatcher.__new__(run.BackendWatcher)
+        self.watcher.inotify = run.Inotify()
+        self.addCleanup(self.watcher.inotify.close)
+
+    def watched(self):
+        return set(self.watcher.inotify.directories.values())
+
+    def test_subdirectories_made_before_the_watch_are_watched(self):
+        new = self.dir / "routes"
+        (new / "admin" / "v2").mkdir(parents=True)
+        (new / ".cache").mkdir()
+        self.assertFalse(self.watcher.relevant(self.dir, "routes", run.IN_CREATE | run.IN_ISDIR))
+        self.assertEqual(self.watched(), {new, new / "admin", new / "admin" / "v2"})
+
+    def test_a_directory_already_gone_is_skipped(self):
+        gone = self.dir / "npm-tmp"
+        gone.mkdir()
+        os.rmdir(gone)
+        self.assertFalse(self.watcher.relevant(self.dir, "npm-tmp", run.IN_CREATE | run.IN_ISDIR))
+        self.assertEqual(self.watched(), set())
+
+    def test_an_unreadable_directory_is_skipped(self):
+        def denied(directory):
+            raise PermissionError(13, "Permission denied", str(directory))
+
+        self.watcher.inotify.watch = denied
+        (self.dir / "locked").mkdir()
+        self.assertFalse(self.watcher.relevant(self.dir, "locked", run.IN_MOVED_TO | run.IN_ISDIR))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""Load-test latency histogram: bucket precision, percentiles, merging and the display table"""
+
+import math
+import random
+import unittest
+
+from manager import loadtest
+
+
+def exact_percentile(values_us, fraction):
+    ordered = sorted(values_us)
+    return ordered[max(1, math.ceil(fraction * len(ordered))) - 1] / 1000
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_empty(self):
+        histogram = loadtest.LatencyHistogram()
+        self.assertIsNone(histogram.percentile(0.5))
+        self.assertEqual(sum(count for _, count in histogram.table()), 0)
+
+    def test_small_values_are_exact(self):
+        histogram = loadtest.LatencyHistogram()
+        for us in range(1, 128):
+            histogram.record(us / 1_000_000)
+        self.assertEqual(len(histogram.counts), 127)
+        self.assertEqual(histogram.percentile(0.5), 64 / 1000)
+        self.assertEqual(histogram.percentile(1.0), 127 / 1000)
+
+    def test_bucket_bounds_contain_the_value(self):
+        for value in (0, 1, 127, 128, 129, 1000, 65_535, 10**6, 123_456_789):
+            lower, upper = loadtest.LatencyHistogram.bucket_bounds(value)
+            self.assertLessEqual(lower, value)
+            self.assertLessEqual(value, upper)
+            self.assertLessEqual(upper - lower, max(0, value) / 64)
+
+    def test_percentiles_within_precision(self):
+        rng = random.Random(7)
+        # Long-tailed, like real request latencies: 1ms to about a minute
+        values = [int(rng.lognormvariate(11, 1.5)) + 1000 for _ in range(20_000)]
+        histogram = loadtest.LatencyHistogram()
+        for us in values:
+            histogram.record(us / 1_000_000)
+        self.assertEqual(histogram.total, len(values))
+        self.assertEqual(histogram.max, max(values))
+        for fraction in (0.5, 0.9, 0.99, 0.999, 1.0):
+            exact = exact_percentile(values, fraction)
+            reported = histogram.percentile(fraction)
+            # Reported as the bucket's upper bound: never below, at most 1/64 above
+            self.assertGreaterEqual(reported, exact, fraction)
+            self.assertLessEqual(reported, exact * 1.016, fraction)
+        self.assertEqual(histogram.percentile(1.0), max(values) / 1000)
+        # Constant memory: a few hundred buckets for 20,000 values
+        self.assertLess(len(histogram.counts), 1000)
+
+    def test_merge_matches_recording_into_one(self):
+        rng = random.Random(3)
+        values = [rng.uniform(0.001, 5) for _ in range(5000)]
+        whole = loadtest.LatencyHistogram()
+        parts = [loadtest.LatencyHistogram() for _ in range(4)]
+        for i, seconds in enumerate(values):
+            whole.record(seconds)
+            parts[i % 4].record(seconds)
+        merged = loadtest.LatencyHistogram()
+        for part in parts:
+            merged.merge(part)
+        self.assertEqual(merged.counts, whole.counts)
+        self.assertEqual((merged.total, merged.max), (whole.total, whole.max))
+
+    def test_table(self):
+        histogram = loadtest.LatencyHistogram()
+        for seconds in (0.0005, 0.0015, 0.0015, 0.003, 0.25, 45, 120):
+            histogram.record(seconds)
+        table = dict(histogram.table())
+        self.assertEqual(list(table)[:-1], list(loadtest.HISTOGRAM_TABLE_BOUNDS_MS))
+        self.assertEqual(table[1], 1)
+        self.assertEqual(table[2], 2)
+        self.assertEqual(table[5], 1)
+        self.assertEqual(table[500], 1)
+        self.assertEqual(table[60000], 1)
+        self.assertEqual(table[None], 1)
+        self.assertEqual(sum(table.values()), histogram.total)
+
+
+class OperationStatsTest(unittest.TestCase):
+    def test_summary(self):
+        stats = loadtest.OperationStats()
+        for ms in range(1, 101):
+            stats.record(ms / 1000)
+        stats.record(2.0, error="timeout")
+        stats.record(0.1, error="http_500")
+        stats.record(0.1, error="http_500")
+        summary = stats.summary(elapsed=10)
+        self.assertEqual((summary["requests"], summary["ok"], summary["failed"]), (103, 100, 3))
+        self.assertEqual(list(summary["errors"].items()), [("http_500", 2), ("timeout", 1)])
+        self.assertEqual(summary["throughput"], 10.0)
+        self.assertAlmostEqual(summary["latency_ms"]["max"], 100.0)
+        # Failed requests don't count towards latency
+        self.assertEqual(sum(summary["histogram_us"].values()), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
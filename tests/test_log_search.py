@@ -0,0 +1,133 @@
+"""`logs` search: reading segments backwards and walking rotated (and gzipped) segments"""
+
+import argparse
+import gzip
+import os
+import re
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from manager import logs
+
+
+def search_args(**overrides):
+    args = dict(worker=None, request=None, since=None, until=None, stage=None,
+                level=None, grep=None, limit=logs.LOG_SEARCH_LIMIT)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def stamp(minute):
+    return f"2026-01-31 10:{minute:02d}:00.000"
+
+
+def epoch(minute):
+    return time.mktime(time.strptime(stamp(minute)[:19], '%Y-%m-%d %H:%M:%S'))
+
+
+class ReverseLinesTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def test_plain_newest_first(self):
+        path = self.dir / "backend.log"
+        path.write_bytes(b"one\ntwo\n\nfour\n")
+        self.assertEqual(list(logs.reverse_lines(path)), ["four", "", "two", "one"])
+
+    def test_plain_without_final_newline(self):
+        path = self.dir / "backend.log"
+        path.write_bytes("one\ntwo é".encode())
+        self.assertEqual(list(logs.reverse_lines(path)), ["two é", "one"])
+
+    def test_empty_file(self):
+        path = self.dir / "backend.log"
+        path.touch()
+        self.assertEqual(list(logs.reverse_lines(path)), [])
+
+    def test_gzipped_segment(self):
+        path = self.dir / "backend.log.20260131-100000.gz"
+        with gzip.open(path, 'wb') as f:
+            f.write(b"one\ntwo\nthree\n")
+        self.assertEqual(list(logs.reverse_lines(path)), ["three", "two", "one"])
+
+
+class SearchLogsTest(unittest.TestCase):
+    """
+    Three files, oldest first: a gzipped segment (10:00-10:09), one still waiting for
+    compression (10:10-10:19) and the live log (10:20-10:29), one line a minute
+    """
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.log = Path(tmp.name) / "backend.log"
+        self.gz = self.log.with_name("backend.log.20260131-101000.gz")
+        self.plain = self.log.with_name("backend.log.20260131-102000")
+        self.write(self.gz, range(0, 10))
+        self.write(self.plain, range(10, 20))
+        self.write(self.log, range(20, 30))
+        # Leftovers of an interrupted compression and unrelated files are not segments
+        self.log.with_name("backend.log.20260131-103000.gz.tmp").write_bytes(b"junk")
+        self.log.with_name("backend.log.old").write_bytes(b"junk")
+
+    def write(self, path, minutes):
+        lines = []
+        for minute in minutes:
+            worker = minute % 2 + 1
+            request = f"req{minute // 5}"
+            level = "[error] " if minute % 7 == 0 else ""
+            lines.append(f"{stamp(minute)} [w{worker}] [r:{request}/image] {level}event {minute}\n")
+        data = "".join(lines).encode()
+        if path.name.endswith('.gz'):
+            with gzip.open(path, 'wb') as f:
+                f.write(data)
+        else:
+            path.write_bytes(data)
+        os.utime(path, (epoch(max(minutes)), epoch(max(minutes))))
+
+    def messages(self, lines):
+        return [logs.parse_log_record(line)['message'] for line in lines]
+
+    def test_segments_in_rotation_order(self):
+        self.assertEqual(logs.log_segments(self.log), [self.gz, self.plain])
+
+    def test_segment_order_comes_from_the_name_not_the_mtime(self):
+        # Gzipped after the newer segment was rotated, and a second rotation within one second
+        os.utime(self.gz, None)
+        again = self.log.with_name("backend.log.20260131-102000-01.gz")
+        self.write(again, range(20, 21))
+        os.utime(again, (0, 0))
+        self.assertEqual(logs.log_segments(self.log), [self.gz, self.plain, again])
+
+    def test_matches_across_segments_oldest_first(self):
+        matches = logs.search_logs(search_args(level='error'), self.log)
+        self.assertEqual(self.messages(matches), ["event 0", "event 7", "event 14", "event 21", "event 28"])
+
+    def test_request_spanning_a_rotation(self):
+        matches = logs.search_logs(search_args(request='req3'), self.log)
+        self.assertEqual(self.messages(matches), [f"event {m}" for m in range(15, 20)])
+        matches = logs.search_logs(search_args(request='req4', worker=1), self.log)
+        self.assertEqual(self.messages(matches), ["event 20", "event 22", "event 24"])
+
+    def test_limit_keeps_the_newest(self):
+        matches = logs.search_logs(search_args(grep=re.compile(r'event'), limit=3), self.log)
+        self.assertEqual(self.messages(matches), ["event 27", "event 28", "event 29"])
+
+    def test_since_and_until(self):
+        matches = logs.search_logs(search_args(since=stamp(18), until=stamp(21)), self.log)
+        self.assertEqual(self.messages(matches), ["event 18", "event 19", "event 20", "event 21"])
+
+    def test_since_never_opens_older_segments(self):
+        # Unreadable if it were opened: the search has to stop on the segment's mtime
+        self.gz.write_bytes(b"not gzip")
+        os.utime(self.gz, (epoch(9), epoch(9)))
+        matches = logs.search_logs(search_args(since=stamp(12)), self.log)
+        self.assertEqual(self.messages(matches), [f"event {m}" for m in range(12, 30)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""Build-step minifiers: what they drop, what they must leave alone, and how fast"""
+
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from manager import build
+from manager.config import FRONTEND_DIR
+
+
+class MinifyCssTest(unittest.TestCase):
+    def test_drops_comments_and_whitespace(self):
+        source = """
+            /* header */
+            .card  >  .title ,  h1 {
+                margin : 0 auto ;
+                color: red;   /* trailing */
+            }
+        """
+        self.assertEqual(build.minify_css(source), ".card>.title,h1{margin :0 auto;color:red}")
+
+    def test_strings_are_untouched(self):
+        source = '.q::before { content: "/* not a comment */  two  spaces"; font-family: \'A  B\' }'
+        minified = build.minify_css(source)
+        self.assertIn('"/* not a comment */  two  spaces"', minified)
+        self.assertIn("'A  B'", minified)
+
+    def test_keeps_spaces_that_separate_tokens(self):
+        self.assertEqual(build.minify_css("@media (max-width: 600px) { a { border: 1px solid #000 } }"),
+                         "@media (max-width:600px){a{border:1px solid #000}}")
+
+    def test_repo_stylesheets_shrink(self):
+        for name in ("style.css", "gallery.css"):
+            source = (FRONTEND_DIR / name).read_text()
+            minified = build.minify_css(source)
+            self.assertLess(len(minified), len(source), name)
+            self.assertEqual(minified.count("{"), minified.count("}"), name)
+
+
+class MinifyJsTest(unittest.TestCase):
+    def test_drops_comments_and_indentation_but_keeps_line_breaks(self):
+        source = "// header\nfunction f(a) {\n    /* block */\n    return a   + 1  // tail\n}\n\n\nf(1)\n"
+        self.assertEqual(build.minify_js(source), "function f(a) {\nreturn a + 1\n}\nf(1)\n")
+
+    def test_strings_templates_and_regexes_are_untouched(self):
+        source = (
+            'const s = "a // b /* c */";\n'
+            "const t = `x ${ {k: '/* y */'}.k }  // z`;\n"
+            "const r = /\\/\\/[a-z]+ \\/* /g;\n"
+        )
+        self.assertEqual(build.minify_js(source), source)
+
+    def test_tells_division_from_regex(self):
+        # After a value '/' divides; after an operator or keyword it starts a regex
+        source = "x = a / b / c\ny = (a) / 2\nz = n[0] / 2\nreturn /a b/.test(s)\nif (typeof /x y/ === 'object') w = 1\n"
+        self.assertEqual(build.minify_js(source), source)
+        # A '//' inside what is really a regex must not be taken for a comment
+        self.assertEqual(build.minify_js("f(/\\/\\//, 1)\n"), "f(/\\/\\//, 1)\n")
+
+    def test_is_linear(self):
+        source = (FRONTEND_DIR / "app.js").read_text()
+        started = time.perf_counter()
+        build.minify_js(source)
+        once = time.perf_counter() - started
+        started = time.perf_counter()
+        build.minify_js(source * 16)
+        sixteen = time.perf_counter() - started
+        # Quadratic scanning took seconds for app.js alone and 256x as long for this
+        self.assertLess(sixteen, max(1.0, once * 64))
+
+    @unittest.skipUnless(shutil.which("node"), "needs node to parse the output")
+    def test_repo_scripts_stay_valid(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ("app.js", "gallery.js"):
+                out = Path(tmp) / name
+                out.write_text(build.minify_js((FRONTEND_DIR / name).read_text()))
+                result = subprocess.run(["node", "--check", str(out)], capture_output=True, text=True)
+                self.assertEqual(result.returncode, 0, f"{name}: {result.stderr}")
+
+
+if __name__ == '__main__':
+    unittest.main()
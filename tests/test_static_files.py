@@ -0,0 +1,186 @@
+"""Static file engine: ETags, conditional requests, byte ranges and precompressed variants"""
+
+import asyncio
+import gzip
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+from pathlib import Path
+
+from manager import proxy
+from manager.build import IMMUTABLE_CACHE_CONTROL
+
+
+class ParseRangeTest(unittest.TestCase):
+    def test_closed_open_and_suffix_ranges(self):
+        self.assertEqual(proxy.parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(proxy.parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(proxy.parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(proxy.parse_range("bytes=-500", 100), (0, 99))
+        self.assertEqual(proxy.parse_range("bytes=50-500", 100), (50, 99))
+
+    def test_unsatisfiable_ranges(self):
+        self.assertEqual(proxy.parse_range("bytes=100-", 100), 'unsatisfiable')
+        self.assertEqual(proxy.parse_range("bytes=9-3", 100), 'unsatisfiable')
+        self.assertEqual(proxy.parse_range("bytes=-0", 100), 'unsatisfiable')
+
+    def test_ignored_ranges(self):
+        self.assertIsNone(proxy.parse_range("bytes=0-1,5-6", 100))  # Multipart: full body instead
+        self.assertIsNone(proxy.parse_range("items=0-1", 100))
+        self.assertIsNone(proxy.parse_range("bytes=a-b", 100))
+
+
+class StaticFilesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "site"
+        self.root.mkdir()
+        (self.root / "index.html").write_bytes(b"<h1>home</h1>")
+        self.text = b"0123456789abcdefghij"
+        (self.root / "notes.txt").write_bytes(self.text)
+        (self.root / "app.0123456789.js").write_bytes(b"console.log(1)\n")
+        # Past the in-memory limit, so it goes out with sendfile
+        self.large = os.urandom(proxy.STATIC_CACHE_MAX_FILE + 4096)
+        (self.root / "large.bin").write_bytes(self.large)
+        (Path(self.tmp.name) / "secret.txt").write_bytes(b"outside the root")
+        self.server = await asyncio.start_server(
+            proxy.ReverseProxy([], self.root).handle_client, '127.0.0.1', 0
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.tmp.cleanup()
+
+    async def get(self, path, method="GET", **headers):
+        """One request on a fresh connection; returns (status, headers dict, body)"""
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        lines = [f"{method} {path} HTTP/1.1", "Host: test", "Connection: close"]
+        lines += [f"{name.replace('_', '-')}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        start_line, header_list = await proxy.read_http_head(reader)
+        response_headers = {name.lower(): value for name, value in header_list}
+        status = int(start_line.split()[1])
+        body = await reader.read()
+        writer.close()
+        return status, response_headers, body
+
+    async def test_full_response_headers(self):
+        status, headers, body = await self.get("/notes.txt")
+        self.assertEqual((status, body), (200, self.text))
+        self.assertEqual(headers["content-length"], str(len(self.text)))
+        self.assertEqual(headers["accept-ranges"], "bytes")
+        self.assertEqual(headers["cache-control"], "no-cache")
+        self.assertRegex(headers["etag"], r'^"[0-9a-f]{24}"$')
+        self.assertIn("last-modified", headers)
+        self.assertEqual(headers["content-type"], "text/plain")
+
+    async def test_directory_index_and_hashed_assets(self):
+        status, _, body = await self.get("/")
+        self.assertEqual((status, body), (200, b"<h1>home</h1>"))
+        _, headers, _ = await self.get("/app.0123456789.js")
+        self.assertEqual(headers["cache-control"], IMMUTABLE_CACHE_CONTROL)
+
+    async def test_head_has_headers_only(self):
+        status, headers, body = await self.get("/notes.txt", method="HEAD")
+        self.assertEqual((status, body), (200, b""))
+        self.assertEqual(headers["content-length"], str(len(self.text)))
+
+    async def test_missing_and_traversal_are_404(self):
+        self.assertEqual((await self.get("/nope.txt"))[0], 404)
+        self.assertEqual((await self.get("/../secret.txt"))[0], 404)
+        self.assertEqual((await self.get("/%2e%2e/secret.txt"))[0], 404)
+
+    async def test_if_none_match(self):
+        _, headers, _ = await self.get("/notes.txt")
+        etag = headers["etag"]
+        status, headers, body = await self.get("/notes.txt", If_None_Match=etag)
+        self.assertEqual((status, body), (304, b""))
+        self.assertEqual(headers["etag"], etag)
+        self.assertEqual((await self.get("/notes.txt", If_None_Match=f'"other", {etag}'))[0], 304)
+        self.assertEqual((await self.get("/notes.txt", If_None_Match="*"))[0], 304)
+        self.assertEqual((await self.get("/notes.txt", If_None_Match='"other"'))[0], 200)
+
+    async def test_etag_changes_with_the_file(self):
+        _, before, _ = await self.get("/notes.txt")
+        (self.root / "notes.txt").write_bytes(b"rewritten")
+        status, after, body = await self.get("/notes.txt", If_None_Match=before["etag"])
+        self.assertEqual((status, body), (200, b"rewritten"))
+        self.assertNotEqual(after["etag"], before["etag"])
+
+    async def test_byte_ranges(self):
+        status, headers, body = await self.get("/notes.txt", Range="bytes=2-5")
+        self.assertEqual((status, body), (206, b"2345"))
+        self.assertEqual(headers["content-range"], f"bytes 2-5/{len(self.text)}")
+        self.assertEqual(headers["content-length"], "4")
+        self.assertEqual((await self.get("/notes.txt", Range="bytes=-3"))[2], b"hij")
+        self.assertEqual((await self.get("/notes.txt", Range="bytes=15-"))[2], b"fghij")
+
+        status, headers, body = await self.get("/notes.txt", Range="bytes=50-60")
+        self.assertEqual(status, 416)
+        self.assertEqual(headers["content-range"], f"bytes */{len(self.text)}")
+
+        status, _, body = await self.get("/notes.txt", Range="bytes=0-1,4-5")
+        self.assertEqual((status, body), (200, self.text))
+
+    async def test_if_range(self):
+        _, headers, _ = await self.get("/notes.txt")
+        status, _, body = await self.get("/notes.txt", Range="bytes=0-3", If_Range=headers["etag"])
+        self.assertEqual((status, body), (206, b"0123"))
+        # The client's copy is outdated: it gets the whole new file, not a piece of it
+        status, _, body = await self.get("/notes.txt", Range="bytes=0-3", If_Range='"stale"')
+        self.assertEqual((status, body), (200, self.text))
+
+    async def test_large_files_and_their_ranges(self):
+        status, headers, body = await self.get("/large.bin")
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.large)
+        status, headers, body = await self.get("/large.bin", Range="bytes=1000-200999")
+        self.assertEqual(status, 206)
+        self.assertEqual(body, self.large[1000:201000])
+        _, again, _ = await self.get("/large.bin")
+        self.assertEqual(again["etag"], headers["etag"])
+
+    async def test_precompressed_variant(self):
+        gz = gzip.compress(self.text)
+        (self.root / "notes.txt.gz").write_bytes(gz)
+        status, headers, body = await self.get("/notes.txt", Accept_Encoding="br, gzip")
+        self.assertEqual((status, body), (200, gz))
+        self.assertEqual(headers["content-encoding"], "gzip")
+        self.assertEqual(headers["vary"], "Accept-Encoding")
+        status, headers, body = await self.get("/notes.txt", Accept_Encoding="gzip;q=0")
+        self.assertEqual((body, headers.get("content-encoding")), (self.text, None))
+
+        # A variant older than the file it was made from is out of date and not used
+        past = time.time() - 60
+        os.utime(self.root / "notes.txt.gz", (past, past))
+        _, headers, body = await self.get("/notes.txt", Accept_Encoding="gzip")
+        self.assertEqual((body, headers.get("content-encoding")), (self.text, None))
+
+    async def test_missing_variants_are_not_looked_up_again(self):
+        loads = []
+        load = proxy.load_static_entry
+
+        def counting_load(path):
+            loads.append(Path(path).name)
+            return load(path)
+
+        with mock.patch.object(proxy, 'load_static_entry', counting_load):
+            for _ in range(3):
+                status, headers, body = await self.get("/notes.txt", Accept_Encoding="gzip, br")
+                self.assertEqual((status, body, headers.get("content-encoding")), (200, self.text, None))
+            self.assertEqual(sorted(loads), ["notes.txt", "notes.txt.br", "notes.txt.gz"])
+
+            # A new version of the file looks for its siblings again
+            gz = gzip.compress(b"rewritten")
+            (self.root / "notes.txt").write_bytes(b"rewritten")
+            (self.root / "notes.txt.gz").write_bytes(gz)
+            status, headers, body = await self.get("/notes.txt", Accept_Encoding="gzip, br")
+            self.assertEqual((body, headers["content-encoding"]), (gz, "gzip"))
+
+
+if __name__ == '__main__':
+    unittest.main()